@@ -0,0 +1,184 @@
+"""
+Offline benchmark of the chunking strategies: index size, indexing throughput and
+retrieval recall@k, to pick the cheapest strategy that retrieves well enough.
+
+Each strategy chunks the same labeled dataset, which is indexed in a local document store
+(see `common.local_store`) and queried by BM25; recall@k is the share of questions with
+a chunk containing their answer in the top k. Reported per strategy:
+
+- chunks and average words per chunk
+- embedding tokens: what embedding the chunks would cost (tiktoken's count if installed,
+  else an estimate)
+- index size on disk, without embeddings
+- cleaning and splitting, and indexing throughput, in MB/s
+- recall@k and retrieval latency
+
+The default dataset is synthetic: text and markdown documents with facts stated over a
+paragraph ("Project X was reviewed ..." opens it, "The budget owner of the project is Y."
+closes it), asked about by questions that name X and are answered by Y, so a strategy that
+cuts paragraphs apart loses recall.
+`--dataset DIR` uses a local one instead: .txt and .md files, and a questions.jsonl with a
+{"question": ..., "answer": ...} object per line, the answer being a text a relevant chunk
+contains.
+
+Usage (from backend/):
+
+    python benchmarks/bench_chunking.py --documents 200 --strategies word:250:30 sentence:250:30 token:320:40
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from haystack import Document
+from haystack.components.converters import MarkdownToDocument
+from haystack.dataclasses import ByteStream
+
+from common.local_store import LocalDocumentStore
+from indexing.chunking import DocumentChunker, TokenCounter
+from indexing.preprocessors import FastDocumentCleaner
+from synthetic import make_markdown, make_text, make_words
+
+MIME_TYPES = {".txt": "text/plain", ".md": "text/markdown"}
+
+
+def make_fact(i: int, rng: random.Random) -> Tuple[str, str, str, str]:
+    """The two sentences stating a fact, the question about it and its answer."""
+    project, owner = f"project{i:05d}", f"owner{i:05d}"
+    topic = make_words(rng, 2)
+    opening = f"{project.capitalize()} was reviewed by the {topic} team last quarter."
+    closing = f"The budget owner of the project is {owner}."
+    return opening, closing, f"Who is the budget owner of {project}?", owner
+
+def insert_fact(text: str, opening: str, closing: str, rng: random.Random) -> str:
+    """Opens a random paragraph with the fact and closes it with its answer."""
+    paragraphs = text.split("\n\n")
+    candidates = [i for i, paragraph in enumerate(paragraphs) if not paragraph.startswith("#")]
+    i = rng.choice(candidates)
+    paragraphs[i] = f"{opening} {paragraphs[i]} {closing}"
+    return "\n\n".join(paragraphs)
+
+def synthetic_dataset(n_documents: int, facts_per_document: int, seed: int) -> Tuple[List[Tuple[str, bytes]], List[dict]]:
+    rng = random.Random(seed)
+    files, questions = [], []
+    for d in range(n_documents):
+        markdown = d % 2 == 1
+        text = make_markdown(rng, 6, 300) if markdown else make_text(rng, 8, 150)
+        for f in range(facts_per_document):
+            opening, closing, question, answer = make_fact(d * facts_per_document + f, rng)
+            text = insert_fact(text, opening, closing, rng)
+            questions.append({"question": question, "answer": answer})
+        files.append((f"doc_{d:05d}{'.md' if markdown else '.txt'}", text.encode()))
+    return files, questions
+
+def load_dataset(directory: Path) -> Tuple[List[Tuple[str, bytes]], List[dict]]:
+    files = [(path.name, path.read_bytes()) for path in sorted(directory.rglob("*")) if path.suffix in MIME_TYPES]
+    with open(directory / "questions.jsonl") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    return files, questions
+
+def to_documents(files: List[Tuple[str, bytes]]) -> List[Document]:
+    """Documents as the indexing pipeline converts them, with their `file_type` meta."""
+    converter = MarkdownToDocument(progress_bar=False)
+    documents = []
+    for name, contents in files:
+        file_type = MIME_TYPES[Path(name).suffix]
+        meta = {"file_path": name, "file_type": file_type}
+        if file_type == "text/markdown":
+            documents.extend(converter.run(sources=[ByteStream(contents)], meta=[meta])["documents"])
+        else:
+            documents.append(Document(content=contents.decode("utf-8"), meta=meta))
+    return documents
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def parse_strategy(spec: str) -> Dict:
+    """Parses "strategy:length:overlap", followed by ",mime/type=strategy" for each per-type strategy."""
+    spec, *overrides = spec.split(",")
+    split_by, length, overlap = spec.split(":")
+    split_by_type = dict(override.split("=") for override in overrides)
+    return dict(split_by=split_by, split_by_type=split_by_type, split_length=int(length), split_overlap=int(overlap))
+
+def evaluate(spec: str, documents: List[Document], questions: List[dict], top_k: int, megabytes: float) -> Dict:
+    params = parse_strategy(spec)
+    chunker, cleaner = DocumentChunker(**params), FastDocumentCleaner()
+    start = time.perf_counter()
+    # In the order of the indexing pipeline: structure-aware strategies split before cleaning
+    if params["split_by"] == "word" and all(strategy == "word" for strategy in params["split_by_type"].values()):
+        chunks = chunker.run(documents=cleaner.run(documents=documents)["documents"])["documents"]
+    else:
+        chunks = cleaner.run(documents=chunker.run(documents=documents)["documents"])["documents"]
+    split_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalDocumentStore(tmp)
+        start = time.perf_counter()
+        store.write_documents(chunks)
+        index_seconds = time.perf_counter() - start
+        index_bytes = directory_size(Path(tmp))
+
+        hits = 0
+        start = time.perf_counter()
+        for question in questions:
+            retrieved = store.bm25_retrieval(question["question"], top_k=top_k)
+            hits += any(question["answer"] in (doc.content or "") for doc in retrieved)
+        retrieval_seconds = time.perf_counter() - start
+        store.reset_connections()
+
+    return {
+        "strategy": spec,
+        "chunks": len(chunks),
+        "avg_words": round(sum(len(chunk.content.split()) for chunk in chunks) / max(len(chunks), 1), 1),
+        "embedding_tokens": sum(TokenCounter().count([chunk.content for chunk in chunks])),
+        "index_mb": round(index_bytes / (1024 * 1024), 2),
+        "split_mb_s": round(megabytes / split_seconds, 1),
+        "index_mb_s": round(megabytes / index_seconds, 1),
+        f"recall@{top_k}": round(hits / max(len(questions), 1), 3),
+        "retrieval_ms": round(retrieval_seconds * 1000 / max(len(questions), 1), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, help="Directory of .txt/.md files and questions.jsonl")
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic documents")
+    parser.add_argument("--facts", type=int, default=3, help="Facts (and questions) per synthetic document")
+    parser.add_argument(
+        "--strategies", nargs="+",
+        default=["word:250:30", "sentence:250:30", "recursive:250:30", "token:320:40", "word:100:20", "sentence:100:20"],
+        help="strategy:length:overlap, with ',mime/type=strategy' for per-type strategies",
+    )
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.dataset:
+        files, questions = load_dataset(args.dataset)
+    else:
+        files, questions = synthetic_dataset(args.documents, args.facts, args.seed)
+    documents = to_documents(files)
+    megabytes = sum(len(doc.content.encode()) for doc in documents) / (1024 * 1024)
+    print(f"{len(documents)} documents, {megabytes:.1f} MB, {len(questions)} questions\n")
+
+    results = [evaluate(spec, documents, questions, args.top_k, megabytes) for spec in args.strategies]
+    columns = list(results[0])
+    print("  ".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]!s:>16}" for column in columns))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+End-to-end benchmark of the indexing and query services.
+
+Runs both FastAPI apps in-process against local stand-ins: a fake OpenAI-compatible
+server with configurable latency (fake_openai.py) and the in-memory document store
+(DOCUMENT_STORE=memory, or the local store with --document-store local). It bulk uploads a synthetic corpus of text, markdown and PDF
+files, lists files, and runs concurrent searches. It then reports latency percentiles,
+throughput and peak RSS.
+
+Usage (from backend/):
+
+    python benchmarks/bench_e2e.py --output baseline.json
+    # ... change code ...
+    python benchmarks/bench_e2e.py --output current.json --compare baseline.json
+
+With --compare, the exit status is 1 if any scenario's p95 latency rose or throughput
+fell by more than --tolerance (default 15%).
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from fake_openai import FakeOpenAIServer
+from synthetic import make_corpus, make_queries
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+def summarize(latencies: List[float], elapsed: float, units: int, errors: int) -> Dict[str, float]:
+    ms = np.array(latencies) * 1000.0
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else 0.0,
+        "p95_ms": float(np.percentile(ms, 95)) if len(ms) else 0.0,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else 0.0,
+        "throughput": units / elapsed if elapsed > 0 else 0.0,
+        "elapsed_s": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def failed(response) -> bool:
+    """Non-200 responses, and degraded searches (e.g. without the LLM): they answer 200 without doing the work measured."""
+    if response.status_code != 200:
+        return True
+    body = response.json()
+    return isinstance(body, dict) and bool(body.get("degraded"))
+
+async def run_concurrently(concurrency: int, jobs: List, send) -> tuple:
+    """
+    Runs `send(job)` for every job with at most `concurrency` in flight; returns (latencies, errors, elapsed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(job):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(job)
+            latencies.append(time.perf_counter() - start)
+            if failed(response):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(job) for job in jobs))
+    return latencies, errors, time.perf_counter() - start
+
+async def run_benchmark(args) -> Dict:
+    import httpx
+    from indexing.main import app as indexing_app
+    from query.main import app as query_app
+
+    results = {}
+    files = make_corpus(args.seed, args.files, args.pdf_pages)
+    batches = [files[i:i + args.upload_batch] for i in range(0, len(files), args.upload_batch)]
+    total_mb = sum(len(contents) for _, contents in files) / (1024 * 1024)
+
+    indexing = httpx.AsyncClient(transport=httpx.ASGITransport(app=indexing_app), base_url="http://indexing")
+    query = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=query_app), base_url="http://query", timeout=120.0
+    )
+    async with indexing, query:
+        latencies, errors, elapsed = await run_concurrently(
+            args.upload_concurrency,
+            batches,
+            lambda batch: indexing.post("/files", files=[("files", (name, data)) for name, data in batch]),
+        )
+        results["upload"] = summarize(latencies, elapsed, len(files), errors)
+        results["upload"]["mb_per_s"] = total_mb / elapsed
+
+        latencies, errors, elapsed = await run_concurrently(
+            1, range(args.list_requests), lambda _: indexing.get("/files")
+        )
+        results["list_files"] = summarize(latencies, elapsed, args.list_requests, errors)
+
+        queries = make_queries(args.seed, args.searchers * args.queries_per_searcher)
+        latencies, errors, elapsed = await run_concurrently(
+            args.searchers, queries, lambda q: query.post("/search", json={"query": q, "mode": args.search_mode})
+        )
+        results["search"] = summarize(latencies, elapsed, len(queries), errors)
+
+    return results
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\n{'scenario':<12} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scenario, metrics in current["results"].items():
+        base = baseline["results"].get(scenario)
+        if not base:
+            continue
+        for metric, higher_is_worse in (("p95_ms", True), ("throughput", False), ("peak_rss_mb", True)):
+            old, new = base[metric], metrics[metric]
+            change = (new - old) / old if old else 0.0
+            regressed = change > tolerance if higher_is_worse else change < -tolerance
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{scenario:<12} {metric:<12} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+            if regressed:
+                regressions.append(f"{scenario}.{metric}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=60, help="Synthetic files to upload")
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--upload-batch", type=int, default=5, help="Files per upload request")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--list-requests", type=int, default=20)
+    parser.add_argument("--searchers", type=int, default=50, help="Concurrent search clients")
+    parser.add_argument("--queries-per-searcher", type=int, default=4)
+    parser.add_argument(
+        "--search-mode", choices=["generative", "extractive", "retrieve"], default="generative",
+        help="Search mode; extractive and retrieve don't call the LLM"
+    )
+    parser.add_argument(
+        "--document-store", choices=["memory", "local"], default="memory",
+        help="Document store backend; local keeps its index in the temporary file storage"
+    )
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        embedding_latency_ms=args.embedding_latency_ms, llm_latency_ms=args.llm_latency_ms, jitter=args.jitter
+    ).start()
+    storage = tempfile.TemporaryDirectory(prefix="bench-files-")
+
+    # Configure the services before they are imported
+    os.environ.update({
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": server.url,
+        "OPENAI_HTTP2": "false",
+        "USE_OPENAI_EMBEDDER": "true",
+        "DOCUMENT_STORE": args.document_store,
+        "FILE_STORAGE_PATH": storage.name,
+        "INDEX_ON_STARTUP": "false",
+        "PIPELINES_FROM_YAML": "false",
+        "LOG_LEVEL": "WARNING",
+        "HAYSTACK_LOG_LEVEL": "WARNING",
+    })
+
+    try:
+        results = asyncio.run(run_benchmark(args))
+    finally:
+        server.stop()
+        storage.cleanup()
+
+    report = {"config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+              "results": results, "upstream_requests": server.requests}
+
+    print(f"{'scenario':<12} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'per s':>8} {'rss MB':>8}")
+    for scenario, m in results.items():
+        print(f"{scenario:<12} {m['requests']:>8} {m['errors']:>6} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} "
+              f"{m['p99_ms']:>9.1f} {m['throughput']:>8.1f} {m['peak_rss_mb']:>8.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Load-test benchmark for query embedding micro-batching.
+
+Simulates N concurrent users embedding queries against an embedder backend with a fixed
+per-call overhead and a small per-text cost, with a bounded number of calls in flight
+(a CPU-bound SentenceTransformers model or a rate-limited OpenAI account).
+Compares one-call-per-query against `BatchingTextEmbedder`.
+
+Usage (from backend/):
+
+    python benchmarks/bench_embedding_batching.py --users 64 --queries 20
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import argparse
+import threading
+import time
+from typing import List
+
+from haystack import component
+
+from query.batching import BatchingTextEmbedder
+
+
+@component
+class SimulatedTextEmbedder:
+    def __init__(self, call_latency_ms: float, per_text_ms: float, backend_concurrency: int):
+        self.call_latency = call_latency_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.slots = threading.Semaphore(backend_concurrency)
+        self.calls = 0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        with self.slots:
+            self.calls += 1
+            time.sleep(self.call_latency + self.per_text * len(texts))
+        return [[float(len(text))] for text in texts]
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        return {"embedding": self.embed([text])[0]}
+
+
+def run_load(embedder, users: int, queries: int) -> float:
+    barrier = threading.Barrier(users)
+
+    def user(i):
+        barrier.wait()
+        for q in range(queries):
+            embedder.run(text=f"user {i} query {q}")
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=20, help="Queries per user")
+    parser.add_argument("--call-latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-text-ms", type=float, default=0.5)
+    parser.add_argument("--backend-concurrency", type=int, default=4)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    total = args.users * args.queries
+    print(f"{args.users} concurrent users x {args.queries} queries = {total} embeddings")
+
+    direct = SimulatedTextEmbedder(args.call_latency_ms, args.per_text_ms, args.backend_concurrency)
+    elapsed = run_load(direct, args.users, args.queries)
+    direct_qps = total / elapsed
+    print(f"unbatched: {elapsed:7.2f}s  {direct_qps:8.1f} queries/s  {direct.calls} backend calls")
+
+    backend = SimulatedTextEmbedder(args.call_latency_ms, args.per_text_ms, args.backend_concurrency)
+    batching = BatchingTextEmbedder(
+        embedder=backend, max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms
+    )
+    # Let the batcher call the simulated backend with the whole batch
+    batching.batcher.batch_fn = backend.embed
+    elapsed = run_load(batching, args.users, args.queries)
+    batched_qps = total / elapsed
+    print(f"batched:   {elapsed:7.2f}s  {batched_qps:8.1f} queries/s  {backend.calls} backend calls")
+
+    print(f"speedup:   {batched_qps / direct_qps:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
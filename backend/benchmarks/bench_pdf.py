@@ -0,0 +1,76 @@
+"""
+Benchmark of PDF conversion throughput, in pages per second.
+
+Converts a synthetic PDF corpus with haystack's PyPDFToDocument and with
+ParallelPDFToDocument using one process, several processes, and a warm page cache
+(and the pymupdf backend, if installed).
+
+Usage (from backend/):
+
+    python benchmarks/bench_pdf.py --files 20 --pages 50 --workers 4
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import argparse
+import random
+import tempfile
+import time
+
+from haystack.components.converters import PyPDFToDocument
+
+from indexing.pdf_converter import ParallelPDFToDocument, pymupdf_import
+from synthetic import make_pdf, make_text
+
+
+def measure(name: str, converter, sources, total_pages: int):
+    start = time.perf_counter()
+    documents = converter.run(sources=sources)["documents"]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed:>8.2f}s {total_pages / elapsed:>10.1f} pages/s {len(documents):>8} docs")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50, help="Pages per file")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    total_pages = args.files * args.pages
+
+    with tempfile.TemporaryDirectory(prefix="bench-pdf-") as tmp:
+        sources = []
+        for i in range(args.files):
+            path = Path(tmp) / f"doc_{i:04d}.pdf"
+            path.write_bytes(make_pdf([make_text(rng, 4, 120) for _ in range(args.pages)]))
+            sources.append(path)
+        print(f"{args.files} files, {total_pages} pages\n")
+
+        measure("PyPDFToDocument", PyPDFToDocument(), sources, total_pages)
+        measure("pypdf, 1 process", ParallelPDFToDocument(max_workers=1), sources, total_pages)
+
+        parallel = ParallelPDFToDocument(max_workers=args.workers)
+        # Start the worker processes outside the measurement
+        parallel.run(sources=sources[:1])
+        measure(f"pypdf, {args.workers} processes", parallel, sources, total_pages)
+        parallel.close()
+
+        cached = ParallelPDFToDocument(max_workers=args.workers, cache_dir=str(Path(tmp) / "cache"))
+        cached.run(sources=sources)
+        measure("pypdf, warm page cache", cached, sources, total_pages)
+        cached.close()
+
+        if pymupdf_import.is_successful():
+            measure("pymupdf, 1 process", ParallelPDFToDocument(backend="pymupdf", max_workers=1), sources, total_pages)
+        else:
+            print("pymupdf not installed, skipping its backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of document cleaning and splitting throughput, in MB/s.
+
+Compares haystack's DocumentCleaner and DocumentSplitter with FastDocumentCleaner and
+FastDocumentSplitter on large synthetic documents (pages separated by form feeds, with
+irregular whitespace and blank lines, as PDF converters produce), and checks that both
+produce the same documents.
+
+Usage (from backend/):
+
+    python benchmarks/bench_preprocessing.py --documents 10 --pages 300
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import argparse
+import random
+import time
+
+from haystack import Document
+from haystack.components.preprocessors import DocumentCleaner, DocumentSplitter
+
+from indexing.preprocessors import FastDocumentCleaner, FastDocumentSplitter
+from synthetic import make_text
+
+
+def make_page(rng: random.Random) -> str:
+    lines = make_text(rng, 4, 120).replace(". ", ".\n").split("\n")
+    noise = ["", "  ", "\t", " \n"]
+    return "\n".join(f"{rng.choice(noise)}{line}{rng.choice(noise)}" for line in lines)
+
+def measure(name: str, component, documents, megabytes: float, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = component.run(documents=documents)["documents"]
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<24} {best * 1000:>9.1f} ms {megabytes / best:>9.1f} MB/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=300, help="Pages per document")
+    parser.add_argument("--split-length", type=int, default=250)
+    parser.add_argument("--split-overlap", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [
+        Document(content="\f".join(make_page(rng) for _ in range(args.pages)), meta={"file_path": f"doc_{i}.pdf"})
+        for i in range(args.documents)
+    ]
+    megabytes = sum(len(doc.content.encode()) for doc in documents) / (1024 * 1024)
+    print(f"{args.documents} documents, {megabytes:.1f} MB\n")
+
+    cleaned = measure("DocumentCleaner", DocumentCleaner(), documents, megabytes, args.repeat)
+    fast_cleaned = measure("FastDocumentCleaner", FastDocumentCleaner(), documents, megabytes, args.repeat)
+    assert [doc.id for doc in cleaned] == [doc.id for doc in fast_cleaned], "Cleaners differ"
+
+    split_args = dict(split_by="word", split_length=args.split_length, split_overlap=args.split_overlap)
+    megabytes = sum(len(doc.content.encode()) for doc in cleaned) / (1024 * 1024)
+    splits = measure("DocumentSplitter", DocumentSplitter(**split_args), cleaned, megabytes, args.repeat)
+    fast_splits = measure("FastDocumentSplitter", FastDocumentSplitter(**split_args), cleaned, megabytes, args.repeat)
+    assert [(doc.id, doc.meta) for doc in splits] == [(doc.id, doc.meta) for doc in fast_splits], "Splitters differ"
+    print(f"\n{len(splits)} splits, outputs identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the OpenAI API, for benchmarks and tests.
+
+Serves `/v1/embeddings` and `/v1/chat/completions` (streamed as server-sent events when
+requested, with a final usage chunk) with configurable latency. Embeddings are deterministic hashed bag-of-words vectors, so texts sharing words
+have similar embeddings and retrieval behaves sensibly.
+
+Usage (from backend/):
+
+    python benchmarks/fake_openai.py --port 8089 --embedding-latency-ms 20 --llm-latency-ms 500
+
+then point the services at it with OPENAI_BASE_URL=http://localhost:8089/v1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+WORD_RE = re.compile(r"\w+")
+
+
+def hashed_embedding(text: str, dim: int) -> List[float]:
+    vector = [0.0] * dim
+    for word in WORD_RE.findall(text.lower()):
+        h = zlib.crc32(word.encode())
+        vector[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server.count(self.path)
+        if self.path.endswith("/embeddings"):
+            server.sleep(server.embedding_latency_ms)
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            dim = body.get("dimensions") or server.dim
+            tokens = sum(len(WORD_RE.findall(text)) for text in inputs)
+            return self._send(200, {
+                "object": "list",
+                "model": body.get("model", "fake-embedding"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": hashed_embedding(text, dim)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        if self.path.endswith("/chat/completions"):
+            server.sleep(server.llm_latency_ms)
+            prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+            prompt_tokens = len(WORD_RE.findall(prompt))
+            answer = f"Fake answer based on {prompt_tokens} prompt tokens."
+            completion_tokens = len(WORD_RE.findall(answer))
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            if body.get("stream"):
+                include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+                return self._send_stream(body.get("model", "fake-llm"), answer, usage if include_usage else None)
+            return self._send(200, {
+                "id": f"chatcmpl-{random.getrandbits(32):08x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-llm"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, answer: str, usage):
+        """Streams the answer a word per chunk, then the usage chunk if requested, as OpenAI does."""
+        base = {
+            "id": f"chatcmpl-{random.getrandbits(32):08x}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        words = answer.split(" ")
+        chunks = [
+            {**base, "choices": [{
+                "index": 0,
+                "delta": {"role": "assistant", "content": word if i == 0 else f" {word}"},
+                "finish_reason": None,
+            }]}
+            for i, word in enumerate(words)
+        ]
+        chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if usage is not None:
+            chunks.append({**base, "choices": [], "usage": usage})
+
+        # Without a length, the end of the stream is the end of the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        embedding_latency_ms: float = 0.0,
+        llm_latency_ms: float = 0.0,
+        jitter: float = 0.0,
+        dim: int = 1536,
+    ):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.embedding_latency_ms = embedding_latency_ms
+        self.llm_latency_ms = llm_latency_ms
+        self.jitter = jitter
+        self.dim = dim
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def sleep(self, latency_ms: float):
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000.0 * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter, e.g. 0.2 for +/-20%%")
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        args.host, args.port, args.embedding_latency_ms, args.llm_latency_ms, args.jitter, args.dim
+    )
+    print(f"Fake OpenAI API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
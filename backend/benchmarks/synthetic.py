@@ -0,0 +1,121 @@
+"""
+Synthetic corpus generation for benchmarks: plain text, markdown and PDF files
+built from a fixed vocabulary, plus queries drawn from the generated documents.
+"""
+import random
+import textwrap
+from pathlib import Path
+from typing import List, Tuple
+
+VOCABULARY = (
+    "system service index query document search latency throughput cluster node shard replica "
+    "embedding vector model token prompt answer context retrieval ranking score filter metadata "
+    "upload file page section report revenue quarter growth customer market product release "
+    "policy security access network storage memory cache process thread worker request response "
+    "error timeout retry budget cost deployment container kubernetes pipeline stage batch stream"
+).split()
+
+
+def make_words(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(n_words))
+
+def make_text(rng: random.Random, n_paragraphs: int = 5, words_per_paragraph: int = 120) -> str:
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        words = make_words(rng, words_per_paragraph).split()
+        sentences = [" ".join(words[i:i + 15]).capitalize() + "." for i in range(0, len(words), 15)]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+def make_markdown(rng: random.Random, n_sections: int = 4, words_per_section: int = 150) -> str:
+    sections = []
+    for i in range(n_sections):
+        title = make_words(rng, 3).title()
+        sections.append(f"## {i + 1}. {title}\n\n{make_text(rng, 2, words_per_section // 2)}")
+    return f"# {make_words(rng, 4).title()}\n\n" + "\n\n".join(sections) + "\n"
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: List[str], indirect_font_parts: bool = False) -> bytes:
+    """
+    Builds a minimal valid PDF with one text page per entry in `pages`. With
+    `indirect_font_parts`, the font's widths and descriptor are indirect objects, as in
+    most real PDFs.
+    """
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog = add(b"")  # placeholder, filled in below
+    pages_obj = add(b"")
+    if indirect_font_parts:
+        widths = add(b"[" + b" ".join([b"556"] * 95) + b"]")
+        descriptor = add(
+            b"<< /Type /FontDescriptor /FontName /Helvetica /Flags 32 /ItalicAngle 0 /Ascent 718 "
+            b"/Descent -207 /CapHeight 718 /StemV 88 /FontBBox [-166 -225 1000 931] >>"
+        )
+        font = add(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /FirstChar 32 /LastChar 126 "
+            b"/Widths %d 0 R /FontDescriptor %d 0 R >>" % (widths, descriptor)
+        )
+    else:
+        font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for text in pages:
+        lines = [line for paragraph in text.split("\n") for line in (textwrap.wrap(paragraph, 90) or [""])]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 790 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines[:64]]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_obj, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+def make_corpus(seed: int, n_files: int, pdf_pages: int = 5) -> List[Tuple[str, bytes]]:
+    """Returns (filename, contents) pairs, cycling through text, markdown and PDF files."""
+    rng = random.Random(seed)
+    files = []
+    for i in range(n_files):
+        kind = i % 3
+        if kind == 0:
+            files.append((f"doc_{i:05d}.txt", make_text(rng).encode()))
+        elif kind == 1:
+            files.append((f"doc_{i:05d}.md", make_markdown(rng).encode()))
+        else:
+            files.append((f"doc_{i:05d}.pdf", make_pdf([make_text(rng, 3, 100) for _ in range(pdf_pages)])))
+    return files
+
+def write_corpus(directory: Path, files: List[Tuple[str, bytes]]) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, contents in files:
+        path = directory / name
+        path.write_bytes(contents)
+        paths.append(path)
+    return paths
+
+def make_queries(seed: int, n_queries: int) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What does the report say about {make_words(rng, 3)}?" for _ in range(n_queries)]
@@ -1,16 +1,29 @@
 from fastapi import FastAPI
+from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+from typing import Sequence
+
+from common.metrics import collect_metrics
+from common.tenants import TENANT_HEADER
+
+# Headers of the query service's rate limiting, allowed for every service
+API_KEY_HEADER = "X-API-Key"
+PRIORITY_HEADER = "X-Priority"
 
 
 logger = logging.getLogger(__name__)
 
 def create_api(
-        title: str, lifespan: callable
+        title: str, lifespan: callable, middleware: Sequence[Middleware] = ()
 ) -> FastAPI:
-    """Creates FastAPI app with common settings"""
+    """Creates FastAPI app with common settings, and the given service-specific middleware inside CORS"""
     app = FastAPI(title=title, lifespan=lifespan)
-    
+
+    # Added first so that CORS wraps them: their error responses get CORS headers too
+    for m in middleware:
+        app.add_middleware(m.cls, *m.args, **m.kwargs)
+
     # Add CORS middleware - same for all services:
     # Edit 'allow_origins' to include the domains where your frontend is hosted.
     # This is necessary if your frontend is hosted on a different domain than the API.
@@ -28,7 +41,13 @@ def create_api(
             "Accept",
             "Origin",
             "X-Requested-With",
+            TENANT_HEADER,
+            API_KEY_HEADER,
+            PRIORITY_HEADER,
+            "If-None-Match",
         ],
+        # Read by the frontend to revalidate the files list
+        expose_headers=["ETag"],
     )
 
     @app.get("/")
@@ -60,4 +79,14 @@ def create_api(
             "status": "ok"
         }
 
+    @app.get("/metrics")
+    async def metrics():
+        """
+        Metrics endpoint exposing internal counters and resource utilization.
+
+        Returns:
+            dict: A dictionary with one entry per registered metrics provider.
+        """
+        return collect_metrics()
+
     return app
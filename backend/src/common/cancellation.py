@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+# Interval between checks for a disconnected client or an expired deadline while a search runs
+DISCONNECT_POLL_SECONDS = 0.1
+
+# Why a search was cancelled
+DISCONNECT, DEADLINE = "disconnect", "deadline"
+
+
+class SearchCancelledError(Exception):
+    """The client of a search disconnected, or its deadline expired, before it finished."""
+
+    def __init__(self, reason: str, stage: Optional[str] = None):
+        message = "the client disconnected" if reason == DISCONNECT else "its deadline expired"
+        super().__init__(f"Search cancelled, {message}" + (f" (at {stage})" if stage else ""))
+        self.reason = reason
+        self.stage = stage
+
+
+class Cancellation:
+    """Cancellation state of a running search, checked by its stages and HTTP calls."""
+
+    def __init__(self, timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.deadline = clock() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+        self.stage: Optional[str] = None
+        # LLM output received before the search was cancelled, in streamed chunks (about a token each)
+        self.streamed_chunks = 0
+        self._event = threading.Event()
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self.cancelled_at = self.clock()
+            self._event.set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, None without one."""
+        return None if self.deadline is None else self.deadline - self.clock()
+
+    def is_cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and self.remaining() <= 0:
+            self.cancel(DEADLINE)
+        return self._event.is_set()
+
+    def check(self, stage: str):
+        if self.is_cancelled():
+            if self.stage is None:
+                self.stage = stage
+            raise SearchCancelledError(self.reason, stage)
+
+
+# Cancellation of the search running in this thread, if any
+_current: ContextVar[Optional[Cancellation]] = ContextVar("search_cancellation", default=None)
+
+def current_cancellation() -> Optional[Cancellation]:
+    return _current.get()
+
+def is_cancelled() -> bool:
+    cancellation = _current.get()
+    return cancellation is not None and cancellation.is_cancelled()
+
+def check_cancelled(stage: str):
+    """Raises SearchCancelledError if the running search is cancelled; called around each stage."""
+    cancellation = _current.get()
+    if cancellation is not None:
+        cancellation.check(stage)
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left to the running search, to bound the timeouts of its calls; None if unbounded."""
+    cancellation = _current.get()
+    return None if cancellation is None else cancellation.remaining()
+
+def count_streamed_chunk(chunk):
+    """Streaming callback of the LLM: the output received so far is wasted if the search is cancelled."""
+    cancellation = _current.get()
+    if cancellation is not None:
+        cancellation.streamed_chunks += 1
+
+
+class CancellationStats:
+    """Searches cancelled, and the work spent on them for nobody."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reasons: Counter = Counter()
+        self._stages: Counter = Counter()
+        self._counts = {"finished_after_cancel": 0, "wasted_ms": 0.0, "stop_delay_ms": 0.0, "llm_chunks_discarded": 0}
+
+    def record(self, cancellation: Cancellation, elapsed_ms: float, stop_delay_ms: float, finished: bool):
+        with self._lock:
+            self._reasons[cancellation.reason] += 1
+            self._stages[cancellation.stage or "finished"] += 1
+            self._counts["finished_after_cancel"] += finished
+            self._counts["wasted_ms"] += elapsed_ms
+            self._counts["stop_delay_ms"] += stop_delay_ms
+            self._counts["llm_chunks_discarded"] += cancellation.streamed_chunks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cancelled = sum(self._reasons.values())
+            return {
+                "cancelled": cancelled,
+                "by_reason": dict(self._reasons),
+                # Stage each search stopped at; "finished" if it ran to the end anyway
+                "stopped_at": dict(self._stages),
+                **{key: round(value, 1) for key, value in self._counts.items()},
+                # Time from the cancellation to the search actually stopping
+                "avg_stop_delay_ms": round(self._counts["stop_delay_ms"] / cancelled, 1) if cancelled else None,
+            }
+
+_stats = CancellationStats()
+
+def cancellation_stats() -> Dict[str, Any]:
+    return _stats.stats()
+
+
+async def run_cancellable(request: Request, timeout: Optional[float], fn: Callable[..., Any], *args) -> Any:
+    """
+    Runs a blocking search in a worker thread, cancelling it if the client disconnects or
+    `timeout` seconds pass (no deadline if None or 0). A cancelled search stops before its
+    next stage, and streamed LLM output stops being read; SearchCancelledError is raised
+    then. A search that finishes anyway returns its result.
+    """
+    cancellation = Cancellation(timeout)
+    start = cancellation.clock()
+
+    def run():
+        token = _current.set(cancellation)
+        try:
+            return fn(*args)
+        finally:
+            _current.reset(token)
+
+    task = asyncio.ensure_future(run_in_threadpool(run))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            break
+        # Once cancelled, the thread is still waited for, so that it is not left running unaccounted
+        if not cancellation.is_cancelled() and await request.is_disconnected():
+            cancellation.cancel(DISCONNECT)
+
+    if cancellation.reason is not None:
+        end = cancellation.clock()
+        _stats.record(
+            cancellation,
+            elapsed_ms=(end - start) * 1000,
+            stop_delay_ms=(end - cancellation.cancelled_at) * 1000,
+            finished=task.exception() is None,
+        )
+    return task.result()
@@ -3,6 +3,7 @@ import sys
 
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 from pydantic import (
     Field,
@@ -13,21 +14,203 @@ from pydantic import (
 
 
 class Settings(BaseSettings):
+    document_store: str = Field(
+        default="opensearch",
+        description="Document store backend: 'opensearch', 'local' (files in the file storage path, for small "
+        "deployments) or 'memory' (tests and benchmarks)"
+    )
     opensearch_host: str = Field(default="http://localhost:9200", description="OpenSearch host URL")
     opensearch_user: str = Field(default="admin", description="OpenSearch username")
     opensearch_password: str = Field(default="admin", description="OpenSearch password")
+    opensearch_pool_maxsize: int = Field(
+        default=20, description="Maximum number of kept-alive connections per OpenSearch host"
+    )
+    opensearch_timeout: float = Field(default=30.0, description="OpenSearch request timeout in seconds")
+    opensearch_max_retries: int = Field(default=3, description="Retries for failed OpenSearch requests")
+    opensearch_retry_on_timeout: bool = Field(default=True, description="Retry OpenSearch requests that time out")
+    opensearch_http_compress: bool = Field(default=False, description="Gzip-compress OpenSearch request bodies")
+    opensearch_knn_engine: str = Field(
+        default="lucene",
+        description="k-NN engine for new indices; 'lucene' and 'faiss' support efficient (pre-)filtering"
+    )
+    default_tenant: str = Field(
+        default="default", description="Tenant of requests without an X-Tenant-ID header; keeps the 'default' index"
+    )
+    tenant_index_prefix: str = Field(default="tenant-", description="Prefix of the per-tenant OpenSearch indices")
+    tenant_api_key_hashes: Dict[str, List[str]] = Field(
+        default={},
+        description="SHA-256 hex digests of the API keys (X-API-Key header) allowed to use each tenant other than "
+        "the default one; tenants without keys can't be used"
+    )
+    max_cached_tenants: int = Field(
+        default=32, description="Tenants whose pipelines and caches are kept in memory per service process"
+    )
     generator: str = Field(default="openai", description="Generator to use (currently openai only)")
     openai_api_key: str | None = Field(default=None, description="OpenAI API key")
+    openai_base_url: str | None = Field(default=None, description="Base URL of an OpenAI-compatible API")
+    openai_timeout: float = Field(default=30.0, description="Deadline in seconds for each OpenAI call attempt")
+    openai_connect_timeout: float = Field(default=5.0, description="Connect timeout in seconds for OpenAI calls")
+    openai_max_retries: int = Field(default=2, description="Retries with exponential backoff for failed OpenAI calls")
+    openai_max_connections: int = Field(default=50, description="Size of the shared OpenAI connection pool")
+    openai_keepalive_expiry: float = Field(default=30.0, description="Seconds to keep idle OpenAI connections open")
+    openai_http2: bool = Field(default=True, description="Use HTTP/2 for OpenAI calls")
+    openai_hedge_delay_ms: float | None = Field(
+        default=None, description="Send a duplicate OpenAI request if no response after this delay (disabled if unset)"
+    )
     use_openai_embedder: bool = Field(default=True, description="Use OpenAI embedder")
+    embedding_batch_max_size: int = Field(
+        default=32, description="Maximum number of queries embedded in one call (1 disables batching)"
+    )
+    embedding_batch_max_delay_ms: float = Field(
+        default=5.0, description="Maximum time in milliseconds to wait for more queries before embedding a batch"
+    )
+    retriever_top_k: int = Field(default=10, description="Candidates fetched from each retriever")
+    reranker_enabled: bool = Field(default=False, description="Rerank retrieved documents with a cross-encoder")
+    reranker_model: str = Field(
+        default="cross-encoder/ms-marco-MiniLM-L-6-v2", description="Cross-encoder model used for reranking"
+    )
+    reranker_top_k: int = Field(default=5, description="Documents kept after reranking")
+    reranker_latency_budget_ms: float = Field(
+        default=300.0, description="Reranking time budget; fused ranking is used when it is exceeded"
+    )
     tokenizers_parallelism: bool = Field(default=False, description="Use tokenizers parallelism")
     log_level: str = Field(default="INFO", description="Logging level")
     haystack_log_level: str = Field(default="INFO", description="Haystack logging level")
+    log_format: str = Field(default="json", description="Log line format: 'json' (structured) or 'text'")
+    log_sample_rate: float = Field(
+        default=1.0, description="Fraction of per-request log records (e.g. one per search) that are kept"
+    )
+    log_max_field_chars: int = Field(default=1000, description="Longer JSON log values are truncated")
+    log_payloads: bool = Field(
+        default=False, description="Log full payloads (responses, pipeline results, file lists) at DEBUG level"
+    )
     index_on_startup: bool = Field(default=True, description="Always index files on startup")
+    pdf_backend: str = Field(default="pypdf", description="PDF text extraction library: 'pypdf' or 'pymupdf'")
+    pdf_workers: int = Field(default=0, description="Processes extracting PDF pages in parallel (0 = one per CPU)")
+    pdf_page_cache_dir: Path | None = Field(
+        default=Path(__file__).resolve().parent.parent / "cache",
+        description="Directory for the cache of extracted PDF page text (disabled if empty)"
+    )
+    chunking_strategy: str = Field(
+        default="word", description="Chunking strategy: 'word', 'sentence', 'recursive' (by structure) or 'token'"
+    )
+    chunking_strategies: Dict[str, str] = Field(
+        default={}, description='Chunking strategy per MIME type, e.g. {"text/markdown": "recursive"}'
+    )
+    chunk_size: int = Field(default=250, description="Chunk size, in words (in tokens for the 'token' strategy)")
+    chunk_overlap: int = Field(default=30, description="Overlap between consecutive chunks, in the same unit")
+    near_duplicate_mode: str = Field(
+        default="off", description="Near-duplicate chunks: 'off', 'skip' (not indexed) or 'link' (indexed unembedded)"
+    )
+    near_duplicate_threshold: float = Field(
+        default=0.9, description="Estimated Jaccard similarity at which a chunk is a near duplicate"
+    )
+    near_duplicate_index_path: Path = Field(
+        default=Path(__file__).resolve().parent.parent / "cache" / "near_duplicates.sqlite",
+        description="Path to the persistent near-duplicate (MinHash LSH) index"
+    )
+    indexing_profile: bool = Field(
+        default=False, description="Profile indexing runs: time, CPU and memory per stage and per MIME type"
+    )
+    indexing_profile_dir: Path = Field(
+        default=Path(__file__).resolve().parent.parent / "profiles",
+        description="Directory for indexing profile reports"
+    )
+    query_port: int = Field(default=8002, description="Port the query service listens on")
+    query_workers: int = Field(default=0, description="Query service worker processes (0 = one per available CPU)")
+    query_worker_concurrency: int | None = Field(
+        default=None, description="Maximum concurrent requests per query worker (excess requests get a 503)"
+    )
+    query_graceful_timeout: int = Field(
+        default=60, description="Seconds a query worker gets to finish in-flight requests on shutdown"
+    )
+    search_timeout_seconds: float = Field(
+        default=120.0, description="Deadline of a search: its remaining stages and calls are cancelled after it (0 = none)"
+    )
+    llm_streaming: bool = Field(
+        default=False, description="Stream LLM answers, so that the generation of a cancelled search is stopped midway"
+    )
+    rate_limit_enabled: bool = Field(default=False, description="Limit search requests and LLM tokens per client")
+    rate_limit_backend: str = Field(
+        default="memory", description="Rate limit state: 'memory' (per worker) or 'file' (shared by the workers of a host)"
+    )
+    rate_limit_state_path: Path = Field(
+        default=Path(__file__).resolve().parent.parent / "cache" / "rate_limits.sqlite",
+        description="State file of the 'file' rate limit backend"
+    )
+    rate_limit_requests_per_minute: float = Field(default=60, description="Interactive searches per client per minute")
+    rate_limit_burst: int = Field(default=20, description="Interactive searches a client may send at once")
+    rate_limit_batch_requests_per_minute: float = Field(
+        default=120, description="Batch lane (X-Priority: batch) searches per client per minute"
+    )
+    rate_limit_batch_burst: int = Field(default=10, description="Batch lane searches a client may send at once")
+    rate_limit_batch_concurrency: int = Field(
+        default=2, description="Batch lane searches running at once per worker; others wait for a slot"
+    )
+    rate_limit_llm_tokens_per_minute: int = Field(
+        default=20000, description="LLM tokens per client per minute (0 = no token budget)"
+    )
+    rate_limit_api_key_hashes: List[str] = Field(
+        default=[], description="SHA-256 hex digests of the API keys identifying clients; other keys are ignored"
+    )
+    rate_limit_trust_proxy: bool = Field(
+        default=False,
+        description="Identify clients without an API key by the X-Real-IP header set by the proxy; only enable it "
+        "when the query service is reachable through the proxy alone"
+    )
+    breaker_enabled: bool = Field(
+        default=False,
+        description="Guard the embedder, document store and LLM calls of searches with circuit breakers: searches "
+        "then degrade to keyword retrieval, or no answer, instead of failing"
+    )
+    breaker_failure_rate: float = Field(
+        default=0.5, description="Share of failed or slower than SLO calls, over the window, that opens a breaker"
+    )
+    breaker_window: int = Field(default=20, description="Recent calls of a dependency its breaker judges it by")
+    breaker_min_calls: int = Field(default=5, description="Calls needed in the window before a breaker may open")
+    breaker_open_seconds: float = Field(
+        default=30.0, description="Seconds an open breaker rejects calls before letting a probe call through"
+    )
+    breaker_embedder_slo_ms: float = Field(default=1000.0, description="Latency SLO of query embedding calls")
+    breaker_document_store_slo_ms: float = Field(default=1000.0, description="Latency SLO of document store searches")
+    breaker_llm_slo_ms: float = Field(default=15000.0, description="Latency SLO of LLM calls")
+    session_ttl_seconds: float = Field(
+        default=1800.0, description="Seconds a search session is kept after its last question"
+    )
+    session_backend: str = Field(
+        default="file", description="Search sessions: 'memory' (per worker) or 'file' (shared by the workers of a host)"
+    )
+    session_state_path: Path = Field(
+        default=Path(__file__).resolve().parent.parent / "cache" / "sessions.sqlite",
+        description="State file of the 'file' session backend"
+    )
+    session_max_sessions: int = Field(default=10000, description="Search sessions kept")
+    session_max_turns: int = Field(default=5, description="Previous turns of a session included in the prompt")
+    session_history_chars: int = Field(
+        default=400, description="Characters of each previous answer included in the prompt"
+    )
+    session_reuse_min_coverage: float = Field(
+        default=0.6,
+        description="Share of a follow-up question's terms found in the previous turn's documents to answer from them "
+        "again without retrieving (above 1 always retrieves)"
+    )
+    session_reuse_min_similarity: float = Field(
+        default=0.9,
+        description="Cosine similarity of a follow-up question's embedding to the previous turn's query or documents "
+        "to answer from them again when too few of its terms are found in them (above 1 never reuses by similarity)"
+    )
     pipelines_from_yaml: bool = Field(default=False, description="Load pipelines from YAML files")
     pipelines_dir: Path = Field(
         default=Path(__file__).resolve().parent.parent / "pipelines",
         description="Path to pipelines directory"
     )
+    pipeline_cache_dir: Path | None = Field(
+        default=Path(__file__).resolve().parent.parent / "cache" / "pipelines",
+        description="Directory caching parsed pipeline definitions by content hash (disabled if empty)"
+    )
+    pipeline_reload_interval: float = Field(
+        default=2.0, description="Seconds between checks for changed pipeline YAML files (0 disables hot reloading)"
+    )
     file_storage_path: Path = Field(
         default=Path(__file__).resolve().parent.parent / "files",
         description="Path to file storage"
@@ -41,6 +224,51 @@ class Settings(BaseSettings):
             )
         return self
 
+    @field_validator('session_backend')
+    @classmethod
+    def validate_session_backend(cls, v: str) -> str:
+        if v not in ('memory', 'file'):
+            raise ValueError("Invalid session backend. Must be one of: memory, file")
+        return v
+
+    @field_validator('rate_limit_backend')
+    @classmethod
+    def validate_rate_limit_backend(cls, v: str) -> str:
+        if v not in ('memory', 'file'):
+            raise ValueError("Invalid rate limit backend. Must be one of: memory, file")
+        return v
+
+    @field_validator('breaker_failure_rate')
+    @classmethod
+    def validate_breaker_failure_rate(cls, v: float) -> float:
+        if not 0 < v <= 1:
+            raise ValueError("Invalid breaker failure rate. Must be in (0, 1]")
+        return v
+
+    @field_validator('chunking_strategy')
+    @classmethod
+    def validate_chunking_strategy(cls, v: str) -> str:
+        if v not in ('word', 'sentence', 'recursive', 'token'):
+            raise ValueError("Invalid chunking strategy. Must be one of: word, sentence, recursive, token")
+        return v
+
+    @field_validator('chunking_strategies')
+    @classmethod
+    def validate_chunking_strategies(cls, v: Dict[str, str]) -> Dict[str, str]:
+        for mime_type, strategy in v.items():
+            if strategy not in ('word', 'sentence', 'recursive', 'token'):
+                raise ValueError(
+                    f"Invalid chunking strategy for {mime_type}. Must be one of: word, sentence, recursive, token"
+                )
+        return v
+
+    @field_validator('log_format')
+    @classmethod
+    def validate_log_format(cls, v: str) -> str:
+        if v.lower() not in ('json', 'text'):
+            raise ValueError("Invalid log format. Must be one of: json, text")
+        return v.lower()
+
     @field_validator('log_level', 'haystack_log_level')
     @classmethod
     def validate_log_level(cls, v: str) -> str:
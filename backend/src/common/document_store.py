@@ -1,17 +1,346 @@
+import copy
 import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from haystack.components.retrievers.in_memory import InMemoryBM25Retriever, InMemoryEmbeddingRetriever
+from haystack.dataclasses import Document
+from haystack.document_stores.errors import DocumentStoreError
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack.document_stores.types import DuplicatePolicy
+from haystack_integrations.components.retrievers.opensearch import OpenSearchBM25Retriever, OpenSearchEmbeddingRetriever
 from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
+from opensearchpy.helpers import bulk, scan
+from common.cancellation import remaining_seconds
 from common.config import settings
+from common.local_store import LOCAL_INDEX_DIR, LocalBM25Retriever, LocalDocumentStore, LocalEmbeddingRetriever
+from common.tenants import is_default_tenant, tenant_index
+
+
+class PooledOpenSearchDocumentStore(OpenSearchDocumentStore):
+    """
+    OpenSearchDocumentStore whose client is shared by every component using the store.
+
+    The base class checks that the index exists on every access to `client`, adding a
+    round trip to each search; here the check runs once. Connections are kept alive
+    and reused up to `pool_maxsize` per host instead of urllib3's default of one, so
+    concurrent searches don't renegotiate TLS for every request. Searches made for a
+    query with a deadline time out at that deadline.
+
+    `async_client` offers the same connection settings for use from async endpoints
+    (requires `opensearch-py[async]`).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client_lock = threading.Lock()
+        self._index_ready = False
+        self._async_client = None
+
+    @property
+    def client(self):
+        if not self._index_ready:
+            with self._client_lock:
+                if not self._index_ready:
+                    client = super().client
+                    self._index_ready = True
+                    return client
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            try:
+                from opensearchpy import AsyncOpenSearch
+            except ImportError as e:
+                raise ImportError(
+                    "The async OpenSearch client requires aiohttp. Install it with 'pip install opensearch-py[async]'"
+                ) from e
+
+            kwargs = dict(self._kwargs)
+            # The aiohttp connection names the pool size differently
+            if "pool_maxsize" in kwargs:
+                kwargs["maxsize"] = kwargs.pop("pool_maxsize")
+            self._async_client = AsyncOpenSearch(
+                hosts=self._hosts,
+                http_auth=self._http_auth,
+                use_ssl=self._use_ssl,
+                verify_certs=self._verify_certs,
+                timeout=self._timeout,
+                **kwargs,
+            )
+        return self._async_client
+
+    def with_index(self, index: str) -> "PooledOpenSearchDocumentStore":
+        """Returns a store for another index (e.g. a tenant's) sharing this store's connections."""
+        client = self.client
+        store = copy.copy(self)
+        store._index = index
+        store._client = client
+        store._client_lock = threading.Lock()
+        store._index_ready = False
+        return store
+
+    def _search_documents(self, **kwargs) -> List[Document]:
+        # A search's requests time out at its deadline, rather than after the configured timeout
+        remaining = remaining_seconds()
+        timeout = {} if remaining is None else {"request_timeout": max(min(remaining, self._timeout or remaining), 0.001)}
+        res = self.client.search(index=self._index, body=kwargs, **timeout)
+        return [self._deserialize_document(hit) for hit in res["hits"]["hits"]]
+
+    def reset_connections(self):
+        """Drops the clients so that new connections are opened, e.g. in a forked worker process."""
+        self._client = None
+        self._async_client = None
+        self._index_ready = False
+
+    def close(self):
+        """Closes the connections of the store's client, e.g. when a reloaded pipeline replaces it."""
+        if self._client is not None:
+            self._client.close()
+        self.reset_connections()
+
+    async def count_documents_async(self) -> int:
+        res = await self.async_client.count(index=self._index)
+        return res["count"]
+
+    async def search_documents_async(self, **body) -> List[Document]:
+        """Async counterpart of the store's search helper; `body` is an OpenSearch query body."""
+        res = await self.async_client.search(index=self._index, body=body)
+        return [self._deserialize_document(hit) for hit in res["hits"]["hits"]]
+
+    async def close_async(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Returns connection pool utilization per OpenSearch host."""
+        if self._client is None:
+            return {"connections": []}
+
+        connections = []
+        for connection in self._client.transport.connection_pool.connections:
+            pool = getattr(connection, "pool", None)
+            if pool is None or pool.pool is None:
+                continue
+            # urllib3 pre-fills its queue with None placeholders: taken slots are in use,
+            # non-None entries are idle kept-alive connections
+            maxsize = pool.pool.maxsize
+            connections.append({
+                "host": connection.host,
+                "maxsize": maxsize,
+                "in_use": maxsize - pool.pool.qsize(),
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None),
+                "opened": pool.num_connections,
+                "requests": pool.num_requests,
+            })
+        return {"connections": connections}
+
+
+# Metadata fields filterable at query time, mapped explicitly rather than left to dynamic mapping
+METADATA_MAPPINGS = {
+    "file_path": {"type": "keyword"},
+    "file_name": {"type": "keyword"},
+    "file_type": {"type": "keyword"},
+    "uploaded_at": {"type": "date"},
+    "tenant": {"type": "keyword"},
+}
+
+# k-NN engines supporting efficient filtering, that is applying filters during the approximate search
+EFFICIENT_FILTERING_ENGINES = ("lucene", "faiss")
 
+def index_mappings(embedding_dim: int, method: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "properties": {
+            "embedding": {"type": "knn_vector", "index": True, "dimension": embedding_dim, "method": method},
+            "content": {"type": "text"},
+            **METADATA_MAPPINGS,
+        },
+        "dynamic_templates": [
+            {"strings": {"match_mapping_type": "string", "mapping": {"type": "keyword"}}}
+        ],
+    }
 
-def initialize_document_store():
-    embedding_dim = 1536 if settings.use_openai_embedder else 768
+# In-memory and local stores live in the process: services created in the same process share one per tenant
+_in_memory_stores: Dict[str, InMemoryDocumentStore] = {}
+_local_stores: Dict[str, LocalDocumentStore] = {}
+_in_memory_lock = threading.Lock()
 
-    return OpenSearchDocumentStore(
+def embedding_dimension() -> int:
+    """Dimension of the embeddings of the configured embedder."""
+    return 1536 if settings.use_openai_embedder else 768
+
+def initialize_document_store(tenant: Optional[str] = None):
+    """Returns the document store of a tenant (the default tenant if None), each tenant in its own index."""
+    embedding_dim = embedding_dimension()
+
+    if settings.document_store == "memory":
+        with _in_memory_lock:
+            index = tenant_index(tenant)
+            if index not in _in_memory_stores:
+                _in_memory_stores[index] = InMemoryDocumentStore()
+            return _in_memory_stores[index]
+
+    if settings.document_store == "local":
+        with _in_memory_lock:
+            index = tenant_index(tenant)
+            if index not in _local_stores:
+                _local_stores[index] = LocalDocumentStore(
+                    path=settings.file_storage_path / LOCAL_INDEX_DIR / index, embedding_dim=embedding_dim
+                )
+            return _local_stores[index]
+
+    if settings.document_store != "opensearch":
+        raise ValueError(f"Invalid document store: {settings.document_store}")
+
+    method = {"name": "hnsw", "engine": settings.opensearch_knn_engine, "space_type": "cosinesimil"}
+    return PooledOpenSearchDocumentStore(
         hosts=settings.opensearch_host,
         http_auth=(settings.opensearch_user, settings.opensearch_password),
         use_ssl=True,
         verify_certs=False,  # You might want to set this to True in production
         ssl_assert_hostname=False,  # You might want to set this to True in production
         ssl_show_warn=False,
+        index=tenant_index(tenant),
         embedding_dim=embedding_dim,
+        method=method,
+        mappings=index_mappings(embedding_dim, method),
+        timeout=settings.opensearch_timeout,
+        pool_maxsize=settings.opensearch_pool_maxsize,
+        max_retries=settings.opensearch_max_retries,
+        retry_on_timeout=settings.opensearch_retry_on_timeout,
+        http_compress=settings.opensearch_http_compress,
     )
+
+def tenant_document_store(document_store, tenant: Optional[str]):
+    """
+    Returns the document store of a tenant, given the default tenant's store.
+
+    OpenSearch tenant stores share the connection pool of the default store rather
+    than opening one per tenant.
+    """
+    if is_default_tenant(tenant):
+        return document_store
+    if isinstance(document_store, PooledOpenSearchDocumentStore):
+        return document_store.with_index(tenant_index(tenant))
+    return initialize_document_store(tenant)
+
+def create_retrievers(document_store, top_k: int = 10):
+    """Returns the (BM25 retriever, embedding retriever) pair matching the document store backend."""
+    if isinstance(document_store, InMemoryDocumentStore):
+        return (
+            InMemoryBM25Retriever(document_store=document_store, top_k=top_k),
+            InMemoryEmbeddingRetriever(document_store=document_store, top_k=top_k),
+        )
+    if isinstance(document_store, LocalDocumentStore):
+        return (
+            LocalBM25Retriever(document_store=document_store, top_k=top_k),
+            LocalEmbeddingRetriever(document_store=document_store, top_k=top_k),
+        )
+    method = getattr(document_store, "_method", None) or {}
+    return (
+        OpenSearchBM25Retriever(document_store=document_store, top_k=top_k),
+        OpenSearchEmbeddingRetriever(
+            document_store=document_store,
+            top_k=top_k,
+            # Pre-filter inside the k-NN search instead of discarding hits after it
+            efficient_filtering=method.get("engine") in EFFICIENT_FILTERING_ENGINES,
+        ),
+    )
+
+def delete_documents_by_file(document_store, file_path: str) -> int:
+    """Deletes all chunks of a file, matched on their `file_path` meta; returns how many were deleted."""
+    if isinstance(document_store, OpenSearchDocumentStore):
+        # One server-side delete-by-query instead of fetching and deleting ids
+        response = document_store.client.delete_by_query(
+            index=document_store._index,
+            body={"query": {"term": {"file_path": file_path}}},
+            refresh=True,
+            conflicts="proceed",
+        )
+        return response["deleted"]
+
+    documents = document_store.filter_documents(
+        filters={"field": "meta.file_path", "operator": "==", "value": file_path}
+    )
+    document_store.delete_documents([doc.id for doc in documents])
+    return len(documents)
+
+def document_ids_by_file(document_store, file_path: str) -> List[str]:
+    """Ids of all chunks of a file, matched on their `file_path` meta."""
+    if isinstance(document_store, OpenSearchDocumentStore):
+        # Scrolled without the chunks' contents and embeddings
+        return [
+            hit["_id"] for hit in scan(
+                document_store.client,
+                index=document_store._index,
+                query={"query": {"term": {"file_path": file_path}}, "_source": False},
+            )
+        ]
+
+    documents = document_store.filter_documents(
+        filters={"field": "meta.file_path", "operator": "==", "value": file_path}
+    )
+    return [doc.id for doc in documents]
+
+def iter_documents(document_store, batch_size: int = 1000) -> Iterator[List[Document]]:
+    """Yields all the documents of a store with their embeddings, in batches; OpenSearch indices are scrolled."""
+    if isinstance(document_store, OpenSearchDocumentStore):
+        batch = []
+        for hit in scan(
+            document_store.client, index=document_store._index, query={"query": {"match_all": {}}}, size=batch_size
+        ):
+            batch.append(Document.from_dict(hit["_source"]))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    documents = document_store.filter_documents()
+    for start in range(0, len(documents), batch_size):
+        yield documents[start:start + batch_size]
+
+@contextmanager
+def bulk_loading(document_store):
+    """
+    Block of bulk writes: OpenSearch doesn't refresh the index until it ends, when it's
+    refreshed once; other stores are unaffected.
+    """
+    if not isinstance(document_store, OpenSearchDocumentStore):
+        yield
+        return
+
+    client, index = document_store.client, document_store._index
+    current = client.indices.get_settings(index=index, name="index.refresh_interval")
+    refresh_interval = current.get(index, {}).get("settings", {}).get("index", {}).get("refresh_interval")
+    client.indices.put_settings(index=index, body={"index": {"refresh_interval": "-1"}})
+    try:
+        yield
+    finally:
+        # None restores the default interval
+        client.indices.put_settings(index=index, body={"index": {"refresh_interval": refresh_interval}})
+        client.indices.refresh(index=index)
+
+def bulk_write_documents(document_store, documents: List[Document]) -> int:
+    """
+    Writes documents, overwriting those with the same ids; returns how many were written.
+    OpenSearch writes don't wait for a refresh (see bulk_loading).
+    """
+    if isinstance(document_store, OpenSearchDocumentStore):
+        written, errors = bulk(
+            client=document_store.client,
+            actions=({"_op_type": "index", "_id": doc.id, "_source": doc.to_dict()} for doc in documents),
+            index=document_store._index,
+            refresh=False,
+            raise_on_error=False,
+            max_chunk_bytes=document_store._max_chunk_bytes,
+        )
+        if errors:
+            raise DocumentStoreError(f"Failed to write {len(errors)} documents to OpenSearch: {errors[:3]}")
+        return written
+
+    return document_store.write_documents(documents, policy=DuplicatePolicy.OVERWRITE)
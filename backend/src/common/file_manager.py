@@ -7,16 +7,18 @@ sys.path.append(str(src_path))
 import logging
 import os
 import tempfile
-from typing import List
+from typing import List, Optional
 
 from common.config import settings
+from common.local_store import LOCAL_INDEX_DIR
+from common.tenants import TENANTS_DIR
 
 
 logger = logging.getLogger(__name__)
 
 class FileManager:
-    def __init__(self):
-        self.path_to_files = settings.file_storage_path
+    def __init__(self, path_to_files: Optional[Path] = None):
+        self.path_to_files = Path(path_to_files or settings.file_storage_path)
         self.path_to_uploads = self.path_to_files / "uploads"
         self.files: List[str] = [] # List of file _names_
         self.file_paths: List[str] = [] # List of file _paths_
@@ -31,14 +33,18 @@ class FileManager:
     def add_files_and_paths(self) -> List[str]:
         self.files: List[str] = []
         self.file_paths: List[str] = []
-        for root, _, filenames in os.walk(self.path_to_files):
+        for root, dirnames, filenames in os.walk(self.path_to_files):
+            # Other tenants' files, and local document store indices, are stored below the default tenant's directory
+            if root == str(self.path_to_files):
+                dirnames[:] = [name for name in dirnames if name not in (TENANTS_DIR, LOCAL_INDEX_DIR)]
             for filename in filenames:
                 if not filename.startswith('.'):
                     full_path = os.path.join(root, filename)
                     if os.path.isfile(full_path):
                         self.files.append(filename)
                         self.file_paths.append(full_path)
-        logger.info(f"File paths: {self.file_paths}")
+        if settings.log_payloads:
+            logger.debug("File paths", extra={"file_paths": self.file_paths})
         logger.info(f"Found {len(self.files)} files")
         return self.files
 
@@ -49,16 +55,35 @@ class FileManager:
 
         final_full_path = os.path.join(self.path_to_uploads, filename)
 
-        def update_file_list(file_list, item):
-            if item in file_list:
-                file_list.remove(item)
-            file_list.append(item)
-
-        update_file_list(self.files, filename)
-        update_file_list(self.file_paths, final_full_path)
+        # Keep files and file_paths aligned: drop any previous entry for this name, wherever it was stored
+        for index in reversed([i for i, name in enumerate(self.files) if name == filename]):
+            del self.files[index]
+            del self.file_paths[index]
+        self.files.append(filename)
+        self.file_paths.append(final_full_path)
 
         logger.debug(f"Saving {temp_full_path} to {final_full_path}")
 
         os.replace(temp_full_path, final_full_path)
 
         return final_full_path
+
+    def get_file_path(self, filename: str) -> Optional[str]:
+        for name, full_path in zip(self.files, self.file_paths):
+            if name == filename:
+                return full_path
+        return None
+
+    def delete_file(self, filename: str) -> str:
+        full_path = self.get_file_path(filename)
+        if full_path is None:
+            raise FileNotFoundError(f"File not found: {filename}")
+
+        logger.debug(f"Deleting {full_path}")
+        os.remove(full_path)
+
+        index = self.file_paths.index(full_path)
+        del self.files[index]
+        del self.file_paths[index]
+
+        return full_path
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from common.cancellation import check_cancelled, current_cancellation
+from common.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+HEDGED_METHODS = ("POST",)
+
+class HedgingTransport(httpx.BaseTransport):
+    """
+    httpx transport that hedges slow requests to cut tail latency.
+
+    If no response has arrived `hedge_delay_ms` after a request was sent, an identical
+    request is sent and whichever response arrives first is returned. The other response
+    is closed when it completes. Hedging at most doubles the number of requests, so it
+    should only be enabled when the extra load on the upstream API is acceptable.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, hedge_delay_ms: float):
+        self.transport = transport
+        self.hedge_delay = hedge_delay_ms / 1000.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so the transport is safe to build before a process forks
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix="openai-hedge")
+        return self._executor
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in HEDGED_METHODS:
+            return self.transport.handle_request(request)
+
+        # Load the body so it can be sent twice
+        request.read()
+        executor = self._get_executor()
+        primary = executor.submit(self.transport.handle_request, request)
+        done, _ = wait([primary], timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        logger.debug(f"Hedging request to {request.url} after {self.hedge_delay * 1000:.0f} ms")
+        hedge = executor.submit(self.transport.handle_request, request)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner = next((f for f in done if f.exception() is None), None)
+        if winner is None:
+            # The first request to finish failed: use whatever the other one returns
+            winner = hedge if primary in done else primary
+            return winner.result()
+
+        loser = hedge if winner is primary else primary
+        loser.add_done_callback(_close_response)
+        return winner.result()
+
+    def close(self):
+        self.transport.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class AsyncHedgingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `HedgingTransport`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, hedge_delay_ms: float):
+        self.transport = transport
+        self.hedge_delay = hedge_delay_ms / 1000.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in HEDGED_METHODS:
+            return await self.transport.handle_async_request(request)
+
+        await request.aread()
+        primary = asyncio.ensure_future(self.transport.handle_async_request(request))
+        done, _ = await asyncio.wait([primary], timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(self.transport.handle_async_request(request))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class CancellableTransport(httpx.BaseTransport):
+    """
+    httpx transport bounding requests made for a search by the search's cancellation.
+
+    Request timeouts are cut to the time left before the search's deadline. Streamed
+    responses (server-sent events, e.g. a streamed completion) stop being read once the
+    search is cancelled: the connection is closed, which ends the generation upstream,
+    and SearchCancelledError is raised. Requests made outside of a search are unchanged.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        cancellation = current_cancellation()
+        if cancellation is None:
+            return self.transport.handle_request(request)
+
+        remaining = cancellation.remaining()
+        if remaining is not None:
+            # At least a millisecond: past the deadline the request times out at once
+            remaining = max(remaining, 0.001)
+            timeouts = request.extensions.get("timeout", {})
+            request.extensions["timeout"] = {
+                name: remaining if value is None else min(value, remaining) for name, value in timeouts.items()
+            }
+        response = self.transport.handle_request(request)
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            response.stream = _CancellableStream(response.stream)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class _CancellableStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream):
+        self.stream = stream
+
+    def __iter__(self):
+        for chunk in self.stream:
+            try:
+                check_cancelled("llm_stream")
+            except Exception:
+                self.stream.close()
+                raise
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def _http_options(http2: bool, max_connections: int, keepalive_expiry: float) -> dict:
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested for OpenAI calls but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+    # Keep every pooled connection alive between calls
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    }
+
+def create_openai_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    timeout: float = 30.0,
+    connect_timeout: float = 5.0,
+    max_retries: int = 2,
+    max_connections: int = 50,
+    keepalive_expiry: float = 30.0,
+    http2: bool = True,
+    hedge_delay_ms: Optional[float] = None,
+) -> OpenAI:
+    """
+    Creates an OpenAI client backed by a pooled, kept-alive httpx client.
+
+    `timeout` is the deadline for each attempt; failed attempts are retried up to
+    `max_retries` times with exponential backoff by the OpenAI SDK. Calls made for a
+    search are also bounded by its deadline, and streamed ones stop if it is cancelled.
+    """
+    options = _http_options(http2, max_connections, keepalive_expiry)
+    transport = httpx.HTTPTransport(**options)
+    if hedge_delay_ms:
+        transport = HedgingTransport(transport, hedge_delay_ms)
+    transport = CancellableTransport(transport)
+    http_client = httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries, http_client=http_client)
+
+def create_async_openai_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    timeout: float = 30.0,
+    connect_timeout: float = 5.0,
+    max_retries: int = 2,
+    max_connections: int = 50,
+    keepalive_expiry: float = 30.0,
+    http2: bool = True,
+    hedge_delay_ms: Optional[float] = None,
+) -> AsyncOpenAI:
+    """Async counterpart of `create_openai_client`, for use from async endpoints."""
+    options = _http_options(http2, max_connections, keepalive_expiry)
+    transport = httpx.AsyncHTTPTransport(**options)
+    if hedge_delay_ms:
+        transport = AsyncHedgingTransport(transport, hedge_delay_ms)
+    http_client = httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries, http_client=http_client)
+
+def _client_settings() -> dict:
+    return {
+        "api_key": settings.openai_api_key,
+        "base_url": settings.openai_base_url,
+        "timeout": settings.openai_timeout,
+        "connect_timeout": settings.openai_connect_timeout,
+        "max_retries": settings.openai_max_retries,
+        "max_connections": settings.openai_max_connections,
+        "keepalive_expiry": settings.openai_keepalive_expiry,
+        "http2": settings.openai_http2,
+        "hedge_delay_ms": settings.openai_hedge_delay_ms,
+    }
+
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> OpenAI:
+    """Returns the process-wide OpenAI client configured from settings."""
+    global _client
+    if _client is None:
+        _client = create_openai_client(**_client_settings())
+    return _client
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Returns the process-wide async OpenAI client configured from settings."""
+    global _async_client
+    if _async_client is None:
+        _async_client = create_async_openai_client(**_client_settings())
+    return _async_client
+
+def is_shared_client(client) -> bool:
+    """Whether a client is one of the process-wide ones, which stay open for the life of the process."""
+    return client is not None and (client is _client or client is _async_client)
+
+def use_shared_client(component):
+    """
+    Points an OpenAI Haystack component (generator or embedder) at the shared client,
+    so all components reuse one connection pool. Returns the component.
+    """
+    component.client = get_openai_client()
+    return component
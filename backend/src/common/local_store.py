@@ -0,0 +1,511 @@
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+from haystack.utils.filters import document_matches_filter
+
+
+logger = logging.getLogger(__name__)
+
+# Directory of the local indices, below the file storage path; not listed as uploaded files
+LOCAL_INDEX_DIR = ".index"
+
+# Like OpenSearch's standard analyzer: lowercased unicode words
+_TOKEN = re.compile(r"\w+")
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class _Snapshot:
+    """
+    The documents and embeddings of a store as of one version. A published snapshot is never
+    changed, so that searches use it without holding the store's lock; writes and reloads
+    change a copy and publish it.
+    """
+
+    def __init__(self):
+        self.version = -1  # -1 until loaded
+        self.generation = 0
+        self.next_row = 0
+        self.documents: Dict[int, Document] = {}  # by key
+        self.keys: Dict[str, int] = {}  # key by document id
+        self.lengths: Dict[int, int] = {}  # BM25 document lengths
+        self.rows: Dict[int, int] = {}  # embedding row by key, for documents with an embedding
+        self.total_length = 0
+        self.matrix: Optional[np.ndarray] = None
+        self.row_keys = np.empty(0, dtype=np.int64)  # key by embedding row, -1 if free
+        self._filter_cache: "OrderedDict[bytes, FrozenSet[int]]" = OrderedDict()
+        self._filter_lock = threading.Lock()
+
+    def copy(self) -> "_Snapshot":
+        copy = _Snapshot()
+        copy.version, copy.generation, copy.next_row = self.version, self.generation, self.next_row
+        # Documents are shared: only the ones changed since are parsed again
+        copy.documents, copy.keys = dict(self.documents), dict(self.keys)
+        copy.lengths, copy.rows = dict(self.lengths), dict(self.rows)
+        copy.total_length = self.total_length
+        copy.matrix, copy.row_keys = self.matrix, self.row_keys.copy()
+        return copy
+
+    def add(self, key: int, doc: Document, length: int, row: Optional[int]):
+        self.documents[key] = doc
+        self.keys[doc.id] = key
+        self.lengths[key] = length
+        self.total_length += length
+        if row is not None:
+            self.rows[key] = row
+            self.row_keys[row] = key
+
+    def remove(self, key: int):
+        doc = self.documents.pop(key, None)
+        if doc is None:
+            return
+        del self.keys[doc.id]
+        self.total_length -= self.lengths.pop(key)
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.row_keys[row] = -1
+
+    def with_embedding(self, doc: Document) -> Document:
+        row = self.rows.get(self.keys[doc.id])
+        return replace(doc, embedding=self.matrix[row].tolist() if row is not None else None)
+
+    def matching_keys(self, filters: Optional[Dict[str, Any]]) -> FrozenSet[int]:
+        if not filters:
+            return frozenset(self.documents)
+        cache_key = orjson.dumps(filters, option=orjson.OPT_SORT_KEYS, default=str)
+        with self._filter_lock:
+            keys = self._filter_cache.get(cache_key)
+            if keys is not None:
+                self._filter_cache.move_to_end(cache_key)
+                return keys
+        keys = frozenset(key for key, doc in self.documents.items() if document_matches_filter(filters, doc))
+        with self._filter_lock:
+            self._filter_cache[cache_key] = keys
+            if len(self._filter_cache) > 64:
+                self._filter_cache.popitem(last=False)
+        return keys
+
+
+class LocalDocumentStore:
+    """
+    Document store kept in a directory of the local file system, for small deployments and tests.
+
+    Documents and a BM25 inverted index (term postings) are stored in sqlite; embeddings,
+    normalized, in a file of float32 rows mapped into memory, so that a vector search is a
+    single matrix product over the mapped rows. Filters use Haystack's filter syntax and
+    semantics, like the OpenSearch store, and are applied before ranking.
+
+    Several processes may use the same directory, e.g. the indexing service writing and the
+    query workers reading. Every commit bumps a version, recorded on the documents it wrote
+    and on the keys it deleted, so that a store loads only the changes since its snapshot.
+    Searches run concurrently, each thread in a read transaction of its own sqlite connection,
+    while writes are serialized by sqlite. Rows of deleted documents are reclaimed by
+    rewriting the embeddings file once they outnumber the live ones.
+    """
+
+    def __init__(self, path: str, embedding_dim: int = 768, bm25_k1: float = 1.2, bm25_b: float = 0.75):
+        self.path = Path(path)
+        self.embedding_dim = embedding_dim
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        # Held by writes and reloads only
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._snapshot = _Snapshot()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path / "store.sqlite"), timeout=30.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Created under the write lock, as other threads and processes may be creating it too
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents "
+                "(key INTEGER PRIMARY KEY, id TEXT UNIQUE, length INTEGER, row INTEGER, data BLOB, version INTEGER)"
+            )
+            if "version" not in {column[1] for column in conn.execute("PRAGMA table_info(documents)")}:
+                conn.execute("ALTER TABLE documents ADD COLUMN version INTEGER DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_version ON documents (version)")
+            conn.execute("CREATE TABLE IF NOT EXISTS deleted (key INTEGER, version INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS deleted_version ON deleted (version)")
+            conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT, key INTEGER, tf INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings (term)")
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_key ON postings (key)")
+            conn.execute("COMMIT")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def reset_connections(self):
+        """Closes the database and unmaps the embeddings, e.g. in a forked worker process; they reopen on use."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
+            self._snapshot = _Snapshot()
+
+    # State
+
+    @staticmethod
+    def _setting(conn: sqlite3.Connection, name: str, default: int = 0) -> int:
+        row = conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_setting(conn: sqlite3.Connection, name: str, value: int):
+        conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, value))
+
+    def _embeddings_path(self, generation: int) -> Path:
+        return self.path / f"embeddings-{generation}.f32"
+
+    def _map_embeddings(self, snapshot: _Snapshot):
+        """Maps the rows of the snapshot's embeddings file, if it grew since it was mapped."""
+        path = self._embeddings_path(snapshot.generation)
+        capacity = path.stat().st_size // (4 * self.embedding_dim) if path.exists() else 0
+        if capacity == len(snapshot.row_keys):
+            # A read-only shared mapping also sees rows written to the file later
+            return
+        snapshot.matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(capacity, self.embedding_dim)) if capacity else None
+        row_keys = np.full(capacity, -1, dtype=np.int64)
+        kept = min(capacity, len(snapshot.row_keys))
+        row_keys[:kept] = snapshot.row_keys[:kept]
+        snapshot.row_keys = row_keys
+
+    def _load(self, conn: sqlite3.Connection, base: _Snapshot, version: int) -> _Snapshot:
+        """
+        Returns a snapshot of the store at the given version, read in the connection's current
+        transaction: the base snapshot plus the changes committed since, or a full reload if the
+        embeddings were compacted or the deletions since were pruned.
+        """
+        generation = self._setting(conn, "generation")
+        if base.version < 0 or base.generation != generation or base.version < self._setting(conn, "pruned_version"):
+            dim = self._setting(conn, "embedding_dim", self.embedding_dim)
+            if dim != self.embedding_dim:
+                raise ValueError(f"The store at {self.path} has {dim}-dimensional embeddings, not {self.embedding_dim}")
+            snapshot, since = _Snapshot(), -1
+            snapshot.generation = generation
+        else:
+            snapshot, since = base.copy(), base.version
+            for (key,) in conn.execute("SELECT key FROM deleted WHERE version > ?", (since,)):
+                snapshot.remove(key)
+        snapshot.version = version
+        snapshot.next_row = self._setting(conn, "next_row")
+        self._map_embeddings(snapshot)
+        for key, length, row, data in conn.execute(
+            "SELECT key, length, row, data FROM documents WHERE version > ?", (since,)
+        ):
+            snapshot.remove(key)
+            snapshot.add(key, Document.from_dict(orjson.loads(data)), length, row)
+        return snapshot
+
+    @contextmanager
+    def _reading(self) -> Iterator[Tuple[sqlite3.Connection, _Snapshot]]:
+        """
+        Yields the calling thread's connection, in a read transaction, and the latest snapshot.
+        The WAL keeps what the transaction reads (e.g. postings) as of its start while others
+        commit; only a reload, when the store changed, takes the lock.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self._setting(conn, "version")
+            snapshot = self._snapshot
+            if snapshot.version < version:
+                with self._lock:
+                    snapshot = self._snapshot
+                    if snapshot.version < version:
+                        snapshot = self._snapshot = self._load(conn, snapshot, version)
+            yield conn, snapshot
+        finally:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _writing(self) -> Iterator[Tuple[sqlite3.Connection, _Snapshot]]:
+        """
+        Yields a write transaction, holding sqlite's write lock, and a copy of the latest
+        snapshot to change along; the copy is published on commit.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._setting(conn, "version")
+                snapshot = self._snapshot
+                snapshot = snapshot.copy() if snapshot.version == version else self._load(conn, snapshot, version)
+                snapshot.version = version + 1
+                yield conn, snapshot
+                self._set_setting(conn, "version", snapshot.version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._snapshot = snapshot
+
+    # DocumentStore protocol
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self, path=str(self.path), embedding_dim=self.embedding_dim, bm25_k1=self.bm25_k1, bm25_b=self.bm25_b
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LocalDocumentStore":
+        return default_from_dict(cls, data)
+
+    def count_documents(self) -> int:
+        with self._reading() as (_, snapshot):
+            return len(snapshot.documents)
+
+    def filter_documents(self, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        with self._reading() as (_, snapshot):
+            return [snapshot.with_embedding(snapshot.documents[key]) for key in sorted(snapshot.matching_keys(filters))]
+
+    def write_documents(self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.NONE) -> int:
+        if policy == DuplicatePolicy.NONE:
+            policy = DuplicatePolicy.FAIL
+        for doc in documents:
+            if doc.embedding is not None and len(doc.embedding) != self.embedding_dim:
+                raise ValueError(
+                    f"Document {doc.id} has a {len(doc.embedding)}-dimensional embedding, expected {self.embedding_dim}"
+                )
+
+        with self._writing() as (conn, snapshot):
+            self._set_setting(conn, "embedding_dim", self.embedding_dim)
+            new_documents: Dict[str, Document] = {}
+            for doc in documents:
+                if doc.id in snapshot.keys or doc.id in new_documents:
+                    if policy == DuplicatePolicy.FAIL:
+                        raise DuplicateDocumentError(f"ID '{doc.id}' already exists in the document store.")
+                    if policy == DuplicatePolicy.SKIP:
+                        continue
+                    if doc.id in snapshot.keys:
+                        self._delete_keys(conn, snapshot, [snapshot.keys[doc.id]])
+                new_documents[doc.id] = doc
+            self._insert(conn, snapshot, list(new_documents.values()))
+        return len(new_documents)
+
+    def delete_documents(self, document_ids: List[str]):
+        with self._writing() as (conn, snapshot):
+            self._delete_keys(conn, snapshot, [snapshot.keys[doc_id] for doc_id in set(document_ids) if doc_id in snapshot.keys])
+            if len(snapshot.row_keys) - len(snapshot.rows) > max(len(snapshot.rows), 1024):
+                self._compact(conn, snapshot)
+
+    # Writes
+
+    def _insert(self, conn: sqlite3.Connection, snapshot: _Snapshot, documents: List[Document]):
+        if not documents:
+            return
+        embedded = [doc for doc in documents if doc.embedding is not None]
+        first_row = snapshot.next_row
+        if embedded:
+            vectors = np.asarray([doc.embedding for doc in embedded], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            # Rows are written before the documents referencing them are committed
+            self._write_rows(snapshot.generation, first_row, vectors)
+            snapshot.next_row += len(embedded)
+            self._set_setting(conn, "next_row", snapshot.next_row)
+            self._map_embeddings(snapshot)
+        rows = {doc.id: first_row + i for i, doc in enumerate(embedded)}
+
+        postings = []
+        for doc in documents:
+            # Embeddings are stored apart; serializing them would copy every value
+            stored = replace(doc, embedding=None, score=None)
+            terms = Counter(_tokens(doc.content))
+            length = sum(terms.values())
+            cursor = conn.execute(
+                "INSERT INTO documents (id, length, row, data, version) VALUES (?, ?, ?, ?, ?)",
+                (doc.id, length, rows.get(doc.id), orjson.dumps(stored.to_dict(flatten=False), default=str),
+                 snapshot.version),
+            )
+            key = cursor.lastrowid
+            postings.extend((term, key, tf) for term, tf in terms.items())
+            snapshot.add(key, stored, length, rows.get(doc.id))
+        conn.executemany("INSERT INTO postings (term, key, tf) VALUES (?, ?, ?)", postings)
+
+    def _write_rows(self, generation: int, first_row: int, vectors: np.ndarray):
+        path = self._embeddings_path(generation)
+        row_bytes = 4 * self.embedding_dim
+        capacity = path.stat().st_size // row_bytes if path.exists() else 0
+        needed = first_row + len(vectors)
+        with open(path, "r+b" if capacity else "w+b") as f:
+            if needed > capacity:
+                # Grown geometrically, so that the file is remapped O(log n) times
+                f.truncate(max(needed, 2 * capacity, 1024) * row_bytes)
+            f.seek(first_row * row_bytes)
+            f.write(vectors.tobytes())
+
+    def _delete_keys(self, conn: sqlite3.Connection, snapshot: _Snapshot, keys: List[int]):
+        if not keys:
+            return
+        params = [(key,) for key in keys]
+        conn.executemany("DELETE FROM postings WHERE key = ?", params)
+        conn.executemany("DELETE FROM documents WHERE key = ?", params)
+        conn.executemany("INSERT INTO deleted (key, version) VALUES (?, ?)", [(key, snapshot.version) for key in keys])
+        for key in keys:
+            snapshot.remove(key)
+        if conn.execute("SELECT COUNT(*) FROM deleted").fetchone()[0] > max(len(snapshot.documents), 1024):
+            # Stores loaded before this version reload in full
+            conn.execute("DELETE FROM deleted")
+            self._set_setting(conn, "pruned_version", snapshot.version)
+
+    def _compact(self, conn: sqlite3.Connection, snapshot: _Snapshot):
+        """Rewrites the live embeddings to a new file, dropping the rows of deleted documents."""
+        keys = sorted(snapshot.rows, key=snapshot.rows.get)
+        vectors = np.asarray(snapshot.matrix[[snapshot.rows[key] for key in keys]]) if keys else None
+        old_path = self._embeddings_path(snapshot.generation)
+        snapshot.generation += 1
+        self._embeddings_path(snapshot.generation).unlink(missing_ok=True)
+        if vectors is not None:
+            self._write_rows(snapshot.generation, 0, vectors)
+        conn.executemany("UPDATE documents SET row = ? WHERE key = ?", [(row, key) for row, key in enumerate(keys)])
+        # Other stores reload in full on the new generation
+        conn.execute("DELETE FROM deleted")
+        snapshot.rows = {key: row for row, key in enumerate(keys)}
+        snapshot.next_row = len(keys)
+        self._set_setting(conn, "generation", snapshot.generation)
+        self._set_setting(conn, "next_row", snapshot.next_row)
+        snapshot.matrix, snapshot.row_keys = None, np.empty(0, dtype=np.int64)
+        self._map_embeddings(snapshot)
+        snapshot.row_keys[:len(keys)] = keys
+        # Readers still mapping the old file keep it until they reload
+        old_path.unlink(missing_ok=True)
+        logger.info(f"Compacted the embeddings of {self.path} to {len(keys)} rows")
+
+    # Reads
+
+    def bm25_retrieval(self, query: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 10) -> List[Document]:
+        """Okapi BM25 ranking of the documents matching the filters, with Lucene's idf."""
+        with self._reading() as (conn, snapshot):
+            count = len(snapshot.documents)
+            if not count:
+                return []
+            allowed = snapshot.matching_keys(filters) if filters else None
+            average_length = snapshot.total_length / count or 1.0
+            k1, b = self.bm25_k1, self.bm25_b
+
+            scores: Dict[int, float] = {}
+            for term in set(_tokens(query)):
+                postings = conn.execute("SELECT key, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings:
+                    # The snapshot may be newer than the transaction, if another thread reloaded meanwhile
+                    if key not in snapshot.lengths or (allowed is not None and key not in allowed):
+                        continue
+                    norm = k1 * (1 - b + b * snapshot.lengths[key] / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [replace(snapshot.documents[key], score=score) for key, score in best]
+
+    def embedding_retrieval(
+        self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None, top_k: int = 10
+    ) -> List[Document]:
+        """Exact cosine similarity ranking of the documents matching the filters, scored like OpenSearch's cosinesimil."""
+        if len(query_embedding) != self.embedding_dim:
+            raise ValueError(f"Query embedding has {len(query_embedding)} dimensions, expected {self.embedding_dim}")
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._reading() as (_, snapshot):
+            if snapshot.matrix is None or not snapshot.rows:
+                return []
+            if filters:
+                rows = np.fromiter(
+                    (snapshot.rows[key] for key in snapshot.matching_keys(filters) if key in snapshot.rows), dtype=np.int64
+                )
+                if not len(rows):
+                    return []
+                similarities = snapshot.matrix[rows] @ query
+            else:
+                # Scanning the mapped rows up to the last one is cheaper than gathering the live ones
+                rows = np.arange(snapshot.next_row)
+                similarities = np.where(
+                    snapshot.row_keys[:snapshot.next_row] >= 0, snapshot.matrix[:snapshot.next_row] @ query, -np.inf
+                )
+
+            k = min(top_k, len(rows))
+            if k <= 0:
+                return []
+            best = np.argpartition(-similarities, k - 1)[:k]
+            best = best[np.argsort(-similarities[best])]
+            return [
+                replace(snapshot.documents[snapshot.row_keys[rows[i]]], score=(1 + float(similarities[i])) / 2)
+                for i in best if np.isfinite(similarities[i])
+            ]
+
+
+@component
+class LocalBM25Retriever:
+    """Retrieves documents from a LocalDocumentStore by BM25 keyword ranking."""
+
+    def __init__(self, document_store: LocalDocumentStore, filters: Optional[Dict[str, Any]] = None, top_k: int = 10):
+        self.document_store = document_store
+        self.filters = filters
+        self.top_k = top_k
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, filters: Optional[Dict[str, Any]] = None, top_k: Optional[int] = None):
+        documents = self.document_store.bm25_retrieval(
+            query, filters=filters or self.filters, top_k=top_k or self.top_k
+        )
+        return {"documents": documents}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(self, document_store=self.document_store.to_dict(), filters=self.filters, top_k=self.top_k)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LocalBM25Retriever":
+        data["init_parameters"]["document_store"] = LocalDocumentStore.from_dict(data["init_parameters"]["document_store"])
+        return default_from_dict(cls, data)
+
+
+@component
+class LocalEmbeddingRetriever:
+    """Retrieves documents from a LocalDocumentStore by the cosine similarity of their embeddings."""
+
+    def __init__(self, document_store: LocalDocumentStore, filters: Optional[Dict[str, Any]] = None, top_k: int = 10):
+        self.document_store = document_store
+        self.filters = filters
+        self.top_k = top_k
+
+    @component.output_types(documents=List[Document])
+    def run(self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None, top_k: Optional[int] = None):
+        documents = self.document_store.embedding_retrieval(
+            query_embedding, filters=filters or self.filters, top_k=top_k or self.top_k
+        )
+        return {"documents": documents}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(self, document_store=self.document_store.to_dict(), filters=self.filters, top_k=self.top_k)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LocalEmbeddingRetriever":
+        data["init_parameters"]["document_store"] = LocalDocumentStore.from_dict(data["init_parameters"]["document_store"])
+        return default_from_dict(cls, data)
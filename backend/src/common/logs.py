@@ -0,0 +1,83 @@
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Any
+
+import orjson
+
+from common.config import settings
+
+
+TEXT_FORMAT = "%(levelname)s - %(name)s - [%(process)d] - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
+def _cap(value: Any, max_chars: int) -> Any:
+    """Returns the value, or a truncated string of it when its text would exceed max_chars."""
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    if not isinstance(value, str):
+        try:
+            text = orjson.dumps(value, default=str).decode()
+        except TypeError:
+            text = str(value)
+        if len(text) <= max_chars:
+            return value
+        value = text
+    if len(value) <= max_chars:
+        return value
+    return f"{value[:max_chars]}... ({len(value)} chars)"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line: time, level, logger, process, message and
+    the fields passed in `extra`. Values longer than `max_chars` once encoded are truncated.
+    """
+
+    def __init__(self, max_chars: int = 1000):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": _cap(record.getMessage(), self.max_chars),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = _cap(value, self.max_chars)
+        if record.exc_info:
+            entry["exception"] = _cap(self.formatException(record.exc_info), self.max_chars * 10)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a `rate` fraction of the records logged with `extra={"sample": True}`; other records all pass."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or not getattr(record, "sample", False):
+            return True
+        return random.random() < self.rate
+
+
+def configure_logging():
+    """Sets up the root logger of a service: JSON or text lines, with per-request records sampled."""
+    handler = logging.StreamHandler()
+    if settings.log_format == "json":
+        handler.setFormatter(JsonFormatter(max_chars=settings.log_max_field_chars))
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(SamplingFilter(settings.log_sample_rate))
+    logging.basicConfig(level=settings.log_level, handlers=[handler])
+
+    # Set Haystack logger level
+    logging.getLogger("haystack").setLevel(settings.haystack_log_level)
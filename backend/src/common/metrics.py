@@ -0,0 +1,23 @@
+import logging
+from typing import Any, Callable, Dict
+
+
+logger = logging.getLogger(__name__)
+
+# Name -> callable returning a JSON-serializable dict, collected by the /metrics endpoint
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]):
+    """Registers a metrics provider under the given name, replacing any previous one."""
+    _providers[name] = provider
+
+def collect_metrics() -> Dict[str, Any]:
+    """Collects the current values of all registered metrics providers."""
+    metrics = {}
+    for name, provider in _providers.items():
+        try:
+            metrics[name] = provider()
+        except Exception as e:
+            logger.warning(f"Failed to collect metrics '{name}': {e}")
+            metrics[name] = {"error": str(e)}
+    return metrics
@@ -1,11 +1,25 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Literal, Optional, Dict
 from uuid import UUID
 
 
 class SearchQuery(BaseModel):
-    query: str = Field(..., description="The search query string")
+    query: str = Field(..., min_length=1, description="The search query string")
     filters: Optional[dict] = Field(None, description="Optional filters for the search")
+    mode: Literal["generative", "extractive", "retrieve"] = Field(
+        "generative",
+        description="'generative' answers with the LLM, 'extractive' returns the best matching passage "
+        "of the top documents, 'retrieve' returns the ranked documents only"
+    )
+    include_content: bool = Field(
+        True, description="Include the full content of the retrieved documents; false returns ids, meta and scores only"
+    )
+    session_id: Optional[str] = Field(
+        None,
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+        description="Conversation the query follows up on, in generative mode: previous questions and answers "
+        "are given to the LLM, and the previous documents reused if they match"
+    )
 
 
 class SearchResponse(BaseModel):
@@ -19,8 +33,15 @@ class FilesUploadResponse(BaseModel):
     error: Optional[str] = Field(None, description="Error message if upload failed")
 
 
+class FilesDeleteResponse(BaseModel):
+    file_id: str = Field(..., description="Name of the deleted file")
+    status: str = Field(..., description="Status of the deletion ('deleted')")
+    documents_deleted: int = Field(..., description="Number of indexed chunks removed")
+
+
 class FilesListResponse(BaseModel):
     files: List[str] = Field(..., description="List of indexed files")
+    total: int = Field(..., description="Number of indexed files, of which `files` may be a page")
 
 
 class FilesIndexResponse(BaseModel):
@@ -36,9 +57,9 @@ class FileModel(BaseModel):
 
 class DocumentModel(BaseModel):
     id: str
-    content: str
+    content: Optional[str] = None
     content_type: str
-    meta: Dict[str, str | int]
+    meta: Dict[str, str | int | None]
     score: Optional[float] = None
 
 
@@ -48,6 +69,11 @@ class AnswerModel(BaseModel):
     document_ids: List[str]
     meta: Dict[str, List]
     file: FileModel
+    # Extractive answers only: the span's score, surrounding text and [start, end) offsets
+    score: Optional[float] = None
+    context: Optional[str] = None
+    offsets_in_context: Optional[List[int]] = None
+    offsets_in_document: Optional[List[int]] = None
 
 
 class ResultModel(BaseModel):
@@ -60,3 +86,6 @@ class ResultModel(BaseModel):
 class QueryResultsResponse(BaseModel):
     query_id: str
     results: List[ResultModel]
+    # Dependencies the search went on without: "embedder" (keyword retrieval only), "llm" (no generated answer)
+    degraded: List[str] = []
+    session_id: Optional[str] = None
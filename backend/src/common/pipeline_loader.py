@@ -1,22 +1,293 @@
-import os
+import hashlib
+import json
 import logging
+import marshal
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
+import yaml
 from haystack import Pipeline
+from haystack.core.serialization import generate_qualified_class_name
+from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
+from openai import OpenAI
+
+from common.config import settings
+from common.document_store import PooledOpenSearchDocumentStore
+from common.llm_client import is_shared_client
 
 
 logger = logging.getLogger(__name__)
 
-def load_pipeline(pipelines_dir, filename):
+# The libyaml parser, when available, is several times faster than the pure Python one
+_BaseLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+class _PipelineYamlLoader(_BaseLoader):  # pylint: disable=too-many-ancestors
+    """Safe YAML loader that, like haystack's, supports the Python tuples of serialized pipelines."""
+
+    def construct_python_tuple(self, node: yaml.SequenceNode):
+        return tuple(self.construct_sequence(node))
+
+_PipelineYamlLoader.add_constructor("tag:yaml.org,2002:python/tuple", _PipelineYamlLoader.construct_python_tuple)
+
+# marshal keeps tuples and shared YAML anchors, but its format depends on the Python version
+_CACHE_TAG = f"py{sys.version_info.major}{sys.version_info.minor}-m{marshal.version}".encode()
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(_CACHE_TAG + data).hexdigest()
+
+def _cache_file(cache_dir: Path, filename: str, digest: str) -> Path:
+    return cache_dir / f"{Path(filename).stem}-{digest[:32]}.marshal"
+
+def _read_cache(cache_dir: Optional[Path], filename: str, digest: str) -> Optional[Dict[str, Any]]:
+    if cache_dir is None:
+        return None
+    try:
+        with open(_cache_file(cache_dir, filename, digest), "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def _write_cache(cache_dir: Optional[Path], filename: str, digest: str, data: Dict[str, Any]):
+    if cache_dir is None:
+        return
+    path = _cache_file(cache_dir, filename, digest)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Only the entry of the current definition is kept
+        for stale in cache_dir.glob(f"{Path(filename).stem}-*.marshal"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not cache pipeline definition {filename}: {e}")
+
+def share_document_stores(pipeline: Pipeline) -> int:
+    """
+    Makes components configured with identical document stores use a single instance.
+
+    Serialized pipelines embed a full document store definition in every component using
+    one, so each would otherwise open its own client. OpenSearch stores are replaced with
+    a PooledOpenSearchDocumentStore, which checks the index once and pools connections.
+    Returns the number of distinct document stores left.
+    """
+    shared: Dict[str, Any] = {}
+    for _, instance in pipeline.walk():
+        for attribute, value in vars(instance).items():
+            if not (hasattr(value, "filter_documents") and hasattr(value, "write_documents")):
+                continue
+            data = value.to_dict()
+            key = json.dumps(data, sort_keys=True, default=str)
+            if key not in shared:
+                if type(value) is OpenSearchDocumentStore:
+                    data["type"] = generate_qualified_class_name(PooledOpenSearchDocumentStore)
+                    value = PooledOpenSearchDocumentStore.from_dict(data)
+                shared[key] = value
+            setattr(instance, attribute, shared[key])
+    return len(shared)
+
+def _build_pipeline(path: Path, data: bytes, cache_dir: Optional[Path]) -> Tuple[Pipeline, str]:
+    digest = _digest(data)
+    definition = _read_cache(cache_dir, path.name, digest)
+    cached = definition is not None
+    if not cached:
+        definition = yaml.load(data, Loader=_PipelineYamlLoader)
+
+    pipeline = Pipeline.from_dict(definition)
+    stores = share_document_stores(pipeline)
+
+    # Only definitions that built a valid pipeline are cached
+    if not cached:
+        _write_cache(cache_dir, path.name, digest, definition)
+    logger.info(
+        f"Loaded pipeline definition from {path}{' (cached)' if cached else ''}, "
+        f"{stores} document store{'s' if stores != 1 else ''}"
+    )
+    return pipeline, digest
+
+def load_pipeline(pipelines_dir, filename, cache_dir: Optional[Path] = settings.pipeline_cache_dir):
     if not pipelines_dir or not filename:
         return None
 
-    p = Pipeline()
-    yaml_path = os.path.join(pipelines_dir, filename)
+    yaml_path = Path(pipelines_dir) / filename
 
     try:
         with open(yaml_path, "rb") as f:
-            logger.info(f"Loading pipeline definition from {yaml_path}")
-            return p.load(f)
+            data = f.read()
     except FileNotFoundError:
         logger.warning(f"Pipeline definition not found: {yaml_path}")
-    return None
+        return None
+
+    pipeline, _ = _build_pipeline(yaml_path, data, cache_dir)
+    return pipeline
+
+
+def close_pipeline(pipeline: Pipeline):
+    """Closes the document store connections and own LLM clients of a pipeline that is no longer used."""
+    closed = set()
+    for _, instance in pipeline.walk():
+        for value in vars(instance).values():
+            if id(value) in closed:
+                continue
+            if hasattr(value, "filter_documents") and hasattr(value, "write_documents"):
+                closed.add(id(value))
+                if hasattr(value, "close"):
+                    value.close()
+                elif hasattr(value, "reset_connections"):
+                    value.reset_connections()
+            elif isinstance(value, OpenAI) and not is_shared_client(value):
+                closed.add(id(value))
+                value.close()
+
+
+class PipelineReloader:
+    """
+    Watches a pipeline definition file and loads the pipeline again when the file changes.
+
+    The file's modification time is checked at most every `interval` seconds, when a run
+    leases the pipeline. A changed definition is built and warmed up in a background
+    thread, so runs keep using the current pipeline meanwhile, and runs starting after it
+    is ready lease the new one. The replaced pipeline's document stores and clients are
+    closed once its last run finishes. A definition that fails to load is logged and
+    ignored, so the current pipeline keeps serving.
+
+    `prepare`, if given, is called once with each pipeline, the new ones in the background
+    thread, before they are leased; its result is the pipeline's `prepared` state.
+    """
+
+    def __init__(
+        self,
+        pipelines_dir,
+        filename: str,
+        interval: float = settings.pipeline_reload_interval,
+        cache_dir: Optional[Path] = settings.pipeline_cache_dir,
+        pipeline: Optional[Pipeline] = None,
+        prepare: Optional[Callable[[Pipeline], Any]] = None,
+    ):
+        self.path = Path(pipelines_dir) / filename
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.pipeline = pipeline
+        self._lock = threading.Lock()
+        self._next_check = time.monotonic() + interval
+        self._mtime, self._digest = self._current_version()
+        self._builder: Optional[threading.Thread] = None
+        self._ready: Optional[Pipeline] = None
+        # Runs using each pipeline, by id, and the replaced pipelines waiting for theirs to finish
+        self._runs: Dict[int, int] = {}
+        self._replaced: Dict[int, Pipeline] = {}
+        self._prepare = prepare
+        self._prepared: Dict[int, Any] = {}
+        if pipeline is not None and prepare is not None:
+            self._prepared[id(pipeline)] = prepare(pipeline)
+
+    def _current_version(self) -> Tuple[Optional[int], Optional[str]]:
+        try:
+            return self.path.stat().st_mtime_ns, _digest(self.path.read_bytes())
+        except OSError:
+            return None, None
+
+    def _check(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check or self._builder is not None:
+                return
+            self._next_check = now + self.interval
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            self._builder = threading.Thread(target=self._build, name="pipeline-reload", daemon=True)
+            self._builder.start()
+
+    def _build(self):
+        pipeline = None
+        try:
+            data = self.path.read_bytes()
+            digest = _digest(data)
+            if digest != self._digest:
+                pipeline, _ = _build_pipeline(self.path, data, self.cache_dir)
+                pipeline.warm_up()
+                prepared = self._prepare(pipeline) if self._prepare is not None else None
+                self._digest = digest
+                logger.info(f"Reloaded pipeline from {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to reload pipeline from {self.path}, keeping the current one: {e}")
+            pipeline = None
+        finally:
+            unused = None
+            with self._lock:
+                if pipeline is not None:
+                    # A pipeline built before, and not leased yet, is never used
+                    unused = self._ready
+                    if unused is not None:
+                        self._prepared.pop(id(unused), None)
+                    self._ready = pipeline
+                    self._prepared[id(pipeline)] = prepared
+                self._builder = None
+            if unused is not None:
+                close_pipeline(unused)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Waits for a pipeline being built in the background, if any."""
+        builder = self._builder
+        if builder is not None:
+            builder.join(timeout)
+
+    def reload_if_changed(self) -> Optional[Pipeline]:
+        """
+        Starts building the pipeline again if the definition changed; returns the new pipeline
+        once it is built and warmed up, and is the current one, else None.
+        """
+        self._check()
+        unused = None
+        with self._lock:
+            if self._ready is None:
+                return None
+            previous, self.pipeline, self._ready = self.pipeline, self._ready, None
+            if previous is not None:
+                if self._runs.get(id(previous)):
+                    self._replaced[id(previous)] = previous
+                else:
+                    unused = previous
+                    self._prepared.pop(id(previous), None)
+            pipeline = self.pipeline
+        if unused is not None:
+            close_pipeline(unused)
+        return pipeline
+
+    def prepared(self, pipeline: Pipeline) -> Any:
+        """The `prepare` result of a pipeline, while it is current or leased."""
+        with self._lock:
+            return self._prepared.get(id(pipeline))
+
+    @contextmanager
+    def lease(self) -> Iterator[Optional[Pipeline]]:
+        """The current pipeline, for a run; a replaced pipeline is closed once its last run finishes."""
+        self.reload_if_changed()
+        with self._lock:
+            pipeline = self.pipeline
+            self._runs[id(pipeline)] = self._runs.get(id(pipeline), 0) + 1
+        try:
+            yield pipeline
+        finally:
+            with self._lock:
+                self._runs[id(pipeline)] -= 1
+                unused = None
+                if not self._runs[id(pipeline)]:
+                    del self._runs[id(pipeline)]
+                    unused = self._replaced.pop(id(pipeline), None)
+                    if unused is not None:
+                        self._prepared.pop(id(pipeline), None)
+            if unused is not None:
+                close_pipeline(unused)
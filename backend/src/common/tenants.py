@@ -0,0 +1,155 @@
+import hashlib
+import hmac
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from fastapi import Header, HTTPException
+
+from common.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+TENANT_HEADER = "X-Tenant-ID"
+
+# Tenant files are stored under this directory of the file storage path
+TENANTS_DIR = "tenants"
+
+# Tenant ids become index names and directory names: lowercase, no separators or dots
+_TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+def validate_tenant_id(tenant: str) -> str:
+    if not _TENANT_ID_PATTERN.match(tenant):
+        raise ValueError(
+            f"Invalid tenant id '{tenant}': use up to 63 lowercase letters, digits, '-' or '_', "
+            "starting with a letter or digit"
+        )
+    return tenant
+
+def is_default_tenant(tenant: Optional[str]) -> bool:
+    return tenant is None or tenant == settings.default_tenant
+
+def tenant_index(tenant: Optional[str]) -> str:
+    """Index holding the documents of a tenant; the default tenant keeps the original 'default' index."""
+    if is_default_tenant(tenant):
+        return "default"
+    return f"{settings.tenant_index_prefix}{tenant}"
+
+def tenant_storage_path(tenant: Optional[str]) -> Path:
+    """Directory holding the files of a tenant, under the file storage path."""
+    if is_default_tenant(tenant):
+        return settings.file_storage_path
+    return settings.file_storage_path / TENANTS_DIR / tenant
+
+def stored_tenants() -> List[str]:
+    """Tenants other than the default one with a directory in the file storage path."""
+    tenants_path = settings.file_storage_path / TENANTS_DIR
+    if not tenants_path.is_dir():
+        return []
+    return sorted(path.name for path in tenants_path.iterdir() if path.is_dir() and _TENANT_ID_PATTERN.match(path.name))
+
+def tenant_cache_path(path: Path, tenant: Optional[str]) -> Path:
+    """Per-tenant variant of a cache file path, e.g. near_duplicates-acme.sqlite."""
+    if is_default_tenant(tenant):
+        return path
+    return path.with_name(f"{path.stem}-{tenant}{path.suffix}")
+
+def tenant_allows_key(tenant: str, api_key: Optional[str]) -> bool:
+    """Whether the API key is one of the tenant's, as listed by SHA-256 digest in TENANT_API_KEY_HASHES."""
+    if not api_key:
+        return False
+    digest = hashlib.sha256(api_key.encode()).hexdigest()
+    return any(hmac.compare_digest(digest, allowed.lower()) for allowed in settings.tenant_api_key_hashes.get(tenant, []))
+
+def get_tenant(
+    x_tenant_id: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+) -> str:
+    """
+    FastAPI dependency returning the tenant of a request, from the X-Tenant-ID header. A
+    tenant other than the default one is only used with one of its API keys (X-API-Key).
+    """
+    if not x_tenant_id:
+        return settings.default_tenant
+    try:
+        tenant = validate_tenant_id(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not is_default_tenant(tenant) and not tenant_allows_key(tenant, x_api_key):
+        raise HTTPException(status_code=403, detail=f"The API key is not allowed to use tenant '{tenant}'")
+    return tenant
+
+
+T = TypeVar("T")
+
+class TenantCache(Generic[T]):
+    """
+    Per-tenant objects (services with their pipelines and caches) created on first use.
+
+    At most `max_tenants` are kept; the least recently used one is dropped when another
+    tenant needs room, and created again if that tenant comes back. Concurrent first
+    requests of a tenant wait for one object to be created, without holding up requests
+    of other tenants.
+    """
+
+    def __init__(self, factory: Callable[[str], T], max_tenants: int = 32):
+        self.factory = factory
+        self.max_tenants = max_tenants
+        self._items: "OrderedDict[str, T]" = OrderedDict()
+        self._creating: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted = 0
+
+    def get(self, tenant: str) -> T:
+        with self._lock:
+            item = self._items.get(tenant)
+            if item is not None:
+                self._items.move_to_end(tenant)
+                return item
+            creating = self._creating.get(tenant)
+            if creating is None:
+                creating = self._creating[tenant] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # Another request is creating this tenant's objects
+            return creating.result()
+
+        try:
+            logger.info(f"Creating services for tenant '{tenant}'")
+            item = self.factory(tenant)
+        except BaseException as e:
+            with self._lock:
+                del self._creating[tenant]
+            creating.set_exception(e)
+            raise
+        with self._lock:
+            del self._creating[tenant]
+            self._items[tenant] = item
+            self._created += 1
+            while len(self._items) > self.max_tenants:
+                evicted, _ = self._items.popitem(last=False)
+                self._evicted += 1
+                logger.info(f"Dropped services of least recently used tenant '{evicted}'")
+        creating.set_result(item)
+        return item
+
+    def __contains__(self, tenant: str) -> bool:
+        with self._lock:
+            return tenant in self._items
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tenants": list(self._items),
+                "max_tenants": self.max_tenants,
+                "created": self._created,
+                "evicted": self._evicted,
+            }
@@ -0,0 +1,223 @@
+import bisect
+import logging
+import math
+import re
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Tuple
+
+from haystack import Document, component, default_from_dict, default_to_dict
+
+from indexing.preprocessors import FastDocumentSplitter
+
+
+logger = logging.getLogger(__name__)
+
+CHUNKING_STRATEGIES = ("word", "sentence", "recursive", "token")
+
+# End of a sentence: terminal punctuation, optional closing quotes or brackets, then whitespace
+# before an uppercase letter, a digit or an opening quote; or a paragraph break
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+(?=[\"'“‘(\[]?[A-Z0-9À-Þ])|\n\s*\n")
+# Separators of the recursive strategy, from the coarsest: paragraphs, lines, sentences, words
+_RECURSIVE_SEPARATORS = (re.compile(r"\n\s*\n"), re.compile(r"\n"), _SENTENCE_END, re.compile(r"\s+"))
+_WORD = re.compile(r"\S+\s*")
+
+
+def _split_at(text: str, start: int, end: int, separator: re.Pattern) -> List[Tuple[int, int]]:
+    """Spans of text[start:end] cut after each match of separator, each keeping its trailing separator."""
+    spans = []
+    for match in separator.finditer(text, start, end):
+        if match.end() > start and match.end() < end:
+            spans.append((start, match.end()))
+            start = match.end()
+    spans.append((start, end))
+    return spans
+
+def _word_count(text: str, start: int, end: int) -> int:
+    return len(text[start:end].split())
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    return _split_at(text, 0, len(text), _SENTENCE_END)
+
+def recursive_spans(text: str, max_words: int) -> List[Tuple[int, int]]:
+    """
+    Spans of at most `max_words` words, cut at the coarsest structure possible: paragraphs
+    (and the headings of markdown, which are paragraphs of their own), then lines, then
+    sentences, then words.
+    """
+    def split(start: int, end: int, level: int) -> List[Tuple[int, int]]:
+        if level == len(_RECURSIVE_SEPARATORS) or _word_count(text, start, end) <= max_words:
+            return [(start, end)]
+        spans = []
+        for span_start, span_end in _split_at(text, start, end, _RECURSIVE_SEPARATORS[level]):
+            spans.extend(split(span_start, span_end, level + 1))
+        return spans
+
+    return split(0, len(text), 0)
+
+def pack_spans(
+    spans: List[Tuple[int, int]], sizes: List[int], max_size: int, overlap: int
+) -> List[Tuple[int, int]]:
+    """
+    Groups consecutive spans into chunks of at most `max_size` (a larger span is a chunk of
+    its own). Each chunk starts with the last spans of the previous one, up to `overlap`.
+    Returns the (first, last + 1) span indices of each chunk.
+    """
+    chunks = []
+    first = 0
+    while first < len(spans):
+        end, size = first, 0
+        while end < len(spans) and (end == first or size + sizes[end] <= max_size):
+            size += sizes[end]
+            end += 1
+        chunks.append((first, end))
+        if end == len(spans):
+            break
+        # Step back over the overlap, always moving forward
+        next_first, overlapped = end, 0
+        while next_first - 1 > first and overlapped + sizes[next_first - 1] <= overlap:
+            overlapped += sizes[next_first - 1]
+            next_first -= 1
+        first = next_first
+    return chunks
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken's `encoding` (OpenAI's tokenizer) if it is installed,
+    else estimates them at a token per 4 characters of each word.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self.encoding = encoding
+        try:
+            import tiktoken
+            self._encoder = tiktoken.get_encoding(encoding)
+        except ImportError:
+            logger.info("tiktoken is not installed: token counts are estimated from lengths")
+            self._encoder = None
+
+    def count(self, words: List[str]) -> List[int]:
+        if self._encoder is None:
+            return [max(1, math.ceil(len(word.strip()) / 4)) for word in words]
+        return [len(tokens) for tokens in self._encoder.encode_ordinary_batch(words)]
+
+
+@component
+class DocumentChunker:
+    """
+    Splits documents into chunks with the strategy set for their MIME type (`file_type`
+    meta, as routed by FileTypeRouter), or the default one:
+
+    - "word": windows of `split_length` words overlapping by `split_overlap` words
+      (FastDocumentSplitter).
+    - "sentence": whole sentences, up to `split_length` words per chunk, overlapping by
+      the last sentences of the previous chunk up to `split_overlap` words.
+    - "recursive": cut at paragraphs, then lines, sentences and words as needed to stay
+      within `split_length` words, then packed like sentences. Keeps the sections of
+      structured text such as markdown together.
+    - "token": windows of whole words of up to `split_length` tokens, overlapping by
+      `split_overlap` tokens, so that chunks fit the embedder's input precisely.
+
+    Chunk sizes are in words, except for "token". Chunks get the same meta as
+    DocumentSplitter's: `source_id`, `split_id`, `split_idx_start` and `page_number`.
+    """
+
+    def __init__(
+        self,
+        split_by: str = "word",
+        split_by_type: Optional[Dict[str, str]] = None,
+        split_length: int = 250,
+        split_overlap: int = 30,
+        token_encoding: str = "cl100k_base",
+    ):
+        self.split_by = split_by
+        self.split_by_type = split_by_type or {}
+        for strategy in [split_by, *self.split_by_type.values()]:
+            if strategy not in CHUNKING_STRATEGIES:
+                raise ValueError(
+                    f"Invalid chunking strategy '{strategy}', must be one of: {', '.join(CHUNKING_STRATEGIES)}"
+                )
+        if split_overlap >= split_length:
+            raise ValueError("split_overlap must be smaller than split_length")
+        self.split_length = split_length
+        self.split_overlap = split_overlap
+        self.token_encoding = token_encoding
+        self._word_splitter = FastDocumentSplitter(
+            split_by="word", split_length=split_length, split_overlap=split_overlap
+        )
+        self._token_counter: Optional[TokenCounter] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            split_by=self.split_by,
+            split_by_type=self.split_by_type,
+            split_length=self.split_length,
+            split_overlap=self.split_overlap,
+            token_encoding=self.token_encoding,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentChunker":
+        return default_from_dict(cls, data)
+
+    def strategy(self, document: Document) -> str:
+        return self.split_by_type.get(document.meta.get("file_type"), self.split_by)
+
+    def _spans_and_sizes(self, text: str, strategy: str) -> Tuple[List[Tuple[int, int]], List[int]]:
+        if strategy == "token":
+            if self._token_counter is None:
+                self._token_counter = TokenCounter(self.token_encoding)
+            spans = [match.span() for match in _WORD.finditer(text)]
+            # Leading whitespace belongs to the first word
+            if spans:
+                spans[0] = (0, spans[0][1])
+            return spans, self._token_counter.count([text[start:end] for start, end in spans])
+        if strategy == "sentence":
+            spans = sentence_spans(text)
+            # Sentences longer than a chunk are cut into words
+            spans = [
+                span
+                for start, end in spans
+                for span in (
+                    _split_at(text, start, end, _RECURSIVE_SEPARATORS[-1])
+                    if _word_count(text, start, end) > self.split_length else [(start, end)]
+                )
+            ]
+        else:
+            spans = recursive_spans(text, self.split_length)
+        return spans, [_word_count(text, start, end) for start, end in spans]
+
+    def _split(self, document: Document, strategy: str) -> List[Document]:
+        if not document.content:
+            return []
+        if strategy == "word":
+            return self._word_splitter._split(document)
+
+        text = document.content
+        spans, sizes = self._spans_and_sizes(text, strategy)
+        page_breaks = [match.start() for match in re.finditer("\f", text)]
+        first_page = document.meta.get("page_number", 1)
+
+        text_splits, splits_pages, splits_start_idxs = [], [], []
+        for first, end in pack_spans(spans, sizes, self.split_length, self.split_overlap):
+            start = spans[first][0]
+            chunk = text[start:spans[end - 1][1]]
+            if not chunk.strip():
+                continue
+            text_splits.append(chunk)
+            splits_pages.append(bisect.bisect_left(page_breaks, start) + first_page)
+            splits_start_idxs.append(start)
+
+        meta = deepcopy(document.meta)
+        meta["source_id"] = document.id
+        return self._word_splitter._create_docs_from_splits(
+            text_splits=text_splits, splits_pages=splits_pages, splits_start_idxs=splits_start_idxs, meta=meta
+        )
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        chunks = []
+        for document in documents:
+            chunks.extend(self._split(document, self.strategy(document)))
+        return {"documents": chunks}
@@ -0,0 +1,289 @@
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from haystack import Document, component, default_from_dict, default_to_dict
+
+
+logger = logging.getLogger(__name__)
+
+MODES = ("skip", "link")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) splitting the signature so that the LSH S-curve, (1/bands)^(1/rows), is closest to threshold."""
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, using `num_perm` universal hash functions."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = text.lower().split()
+        k = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p stays below 2^64 for 32-bit a, b and x
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash LSH index of chunk signatures in sqlite, with the near duplicates
+    found of the indexed chunks.
+    """
+
+    def __init__(self, path: str, num_perm: int = 128, bands: int = 16):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures (doc_id TEXT PRIMARY KEY, file_path TEXT, signature BLOB)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER, hash INTEGER, doc_id TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, hash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_doc ON bands (doc_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS signatures_file ON signatures (file_path)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS duplicates (doc_id TEXT PRIMARY KEY, of_doc_id TEXT, file_path TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS duplicates_of ON duplicates (of_doc_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS duplicates_file ON duplicates (file_path)")
+
+    def _band_hashes(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        data = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [(band, zlib.crc32(data[band * width:(band + 1) * width])) for band in range(self.bands)]
+
+    def query(
+        self, signature: np.ndarray, threshold: float, exclude_file: Optional[str] = None
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Returns the (doc id, estimated Jaccard similarity) of the most similar indexed chunk
+        above threshold, other than the chunks of `exclude_file`.
+        """
+        bands = self._band_hashes(signature)
+        sql = (
+            "SELECT DISTINCT s.doc_id, s.signature FROM bands b JOIN signatures s ON s.doc_id = b.doc_id "
+            f"WHERE ({' OR '.join(['(b.band = ? AND b.hash = ?)'] * len(bands))})"
+        )
+        params = [value for band in bands for value in band]
+        if exclude_file is not None:
+            sql += " AND s.file_path IS NOT ?"
+            params.append(exclude_file)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        best = None
+        for doc_id, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (doc_id, similarity)
+        return best
+
+    def _add(self, doc_id: str, file_path: Optional[str], signature: np.ndarray):
+        # A chunk indexed again replaces its signature
+        self._conn.execute("DELETE FROM bands WHERE doc_id = ?", (doc_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO signatures (doc_id, file_path, signature) VALUES (?, ?, ?)",
+            (doc_id, file_path, signature.tobytes()),
+        )
+        self._conn.executemany(
+            "INSERT INTO bands (band, hash, doc_id) VALUES (?, ?, ?)",
+            [(band, h, doc_id) for band, h in self._band_hashes(signature)],
+        )
+
+    def add(self, doc_id: str, file_path: Optional[str], signature: np.ndarray):
+        with self._lock, self._conn:
+            self._add(doc_id, file_path, signature)
+
+    def add_duplicate(self, doc_id: str, of_doc_id: str, file_path: Optional[str]):
+        """Records that a chunk is a near duplicate of an indexed one."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO duplicates (doc_id, of_doc_id, file_path) VALUES (?, ?, ?)",
+                (doc_id, of_doc_id, file_path),
+            )
+
+    def merge(self, other: "NearDuplicateIndex"):
+        """Adds the signatures and duplicates of another index, in one transaction."""
+        with other._lock:
+            signatures = other._conn.execute("SELECT doc_id, file_path, signature FROM signatures").fetchall()
+            duplicates = other._conn.execute("SELECT doc_id, of_doc_id, file_path FROM duplicates").fetchall()
+        with self._lock, self._conn:
+            for doc_id, file_path, blob in signatures:
+                self._add(doc_id, file_path, np.frombuffer(blob, dtype=np.uint32))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO duplicates (doc_id, of_doc_id, file_path) VALUES (?, ?, ?)", duplicates
+            )
+
+    def duplicates_of(self, doc_ids: List[str]) -> Dict[str, List[str]]:
+        """The near duplicates of the given chunks: their ids, by file path."""
+        files: Dict[str, List[str]] = {}
+        with self._lock:
+            for doc_id in doc_ids:
+                for duplicate_id, file_path in self._conn.execute(
+                    "SELECT doc_id, file_path FROM duplicates WHERE of_doc_id = ?", (doc_id,)
+                ):
+                    files.setdefault(file_path, []).append(duplicate_id)
+        return files
+
+    def remove_file(self, file_path: str) -> int:
+        """Removes the signatures and duplicates of all chunks of a file; returns how many signatures were removed."""
+        with self._lock, self._conn:
+            doc_ids = [
+                (row[0],) for row in self._conn.execute("SELECT doc_id FROM signatures WHERE file_path = ?", (file_path,))
+            ]
+            self._conn.executemany("DELETE FROM bands WHERE doc_id = ?", doc_ids)
+            self._conn.execute("DELETE FROM signatures WHERE file_path = ?", (file_path,))
+            self._conn.execute("DELETE FROM duplicates WHERE file_path = ?", (file_path,))
+        return len(doc_ids)
+
+    def remove(self, doc_ids: List[str]) -> int:
+        """Removes the signatures and duplicates of the given chunks; returns how many signatures were removed."""
+        params = [(doc_id,) for doc_id in doc_ids]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM bands WHERE doc_id = ?", params)
+            removed = self._conn.executemany("DELETE FROM signatures WHERE doc_id = ?", params).rowcount
+            self._conn.executemany("DELETE FROM duplicates WHERE doc_id = ?", params)
+        return removed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+
+@component
+class NearDuplicateFilter:
+    """
+    Detects near-duplicate chunks with MinHash and a persistent LSH index, before they are embedded.
+
+    Each chunk's word shingles are MinHashed; chunks whose estimated Jaccard similarity to an
+    already indexed chunk (or an earlier chunk of the same run) reaches `threshold` are near
+    duplicates. In "skip" mode they are dropped. In "link" mode they are sent to the
+    `duplicates` output, with the id of the chunk they duplicate in `near_duplicate_of`
+    meta, to be stored without an embedding.
+
+    Chunks are only near duplicates of other files' chunks: a chunk matching itself, when a
+    file is indexed again, or its previous version, when a file is replaced, is not one.
+
+    A run's signatures and duplicates are staged, per thread, and only added to the index
+    by `commit()`, once its chunks are written: the indexing service commits after a
+    successful pipeline run and discards them after a failed one.
+    """
+
+    def __init__(
+        self,
+        index_path: str = ":memory:",
+        threshold: float = 0.9,
+        mode: str = "skip",
+        num_perm: int = 128,
+        shingle_size: int = 5,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Invalid near duplicate mode '{mode}', must be one of: {', '.join(MODES)}")
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.index_path = index_path
+        self.threshold = threshold
+        self.mode = mode
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        bands, _ = lsh_params(threshold, num_perm)
+        self.index = NearDuplicateIndex(index_path, num_perm=num_perm, bands=bands)
+        self._staged = threading.local()
+        self._stats = {"checked": 0, "duplicates": 0, "characters_saved": 0}
+        self._stats_lock = threading.Lock()
+
+    @component.output_types(documents=List[Document], duplicates=List[Document])
+    def run(self, documents: List[Document]):
+        # Chunks of this run are checked against the index and the run's earlier chunks
+        staged = NearDuplicateIndex(":memory:", num_perm=self.num_perm, bands=self.index.bands)
+        self._staged.index = staged
+        unique, duplicates = [], []
+        for doc in documents:
+            if not doc.content:
+                unique.append(doc)
+                continue
+            signature = self.hasher.signature(doc.content)
+            file_path = doc.meta.get("file_path")
+            matches = [
+                match for match in (
+                    self.index.query(signature, self.threshold, exclude_file=file_path),
+                    staged.query(signature, self.threshold, exclude_file=file_path),
+                ) if match is not None
+            ]
+            match = max(matches, key=lambda match: match[1]) if matches else None
+            if match is None:
+                staged.add(doc.id, file_path, signature)
+            if match is None or match[0] == doc.id:
+                unique.append(doc)
+                continue
+            # Recorded so that deleting the chunk it duplicates indexes it again
+            staged.add_duplicate(doc.id, match[0], file_path)
+            if self.mode == "link":
+                doc.meta["near_duplicate_of"] = match[0]
+                duplicates.append(doc)
+
+        saved = sum(len(doc.content) for doc in documents if doc.content) - sum(
+            len(doc.content) for doc in unique if doc.content
+        )
+        with self._stats_lock:
+            self._stats["checked"] += len(documents)
+            self._stats["duplicates"] += len(documents) - len(unique)
+            self._stats["characters_saved"] += saved
+        if len(unique) < len(documents):
+            logger.info(f"Near duplicates: {len(documents) - len(unique)} of {len(documents)} chunks not embedded")
+        return {"documents": unique, "duplicates": duplicates}
+
+    def commit(self):
+        """Adds the signatures and duplicates of this thread's last run to the index."""
+        staged = getattr(self._staged, "index", None)
+        if staged is not None:
+            self.index.merge(staged)
+            self._staged.index = None
+
+    def discard(self):
+        """Drops the signatures and duplicates of this thread's last run."""
+        self._staged.index = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["duplicate_ratio"] = stats["duplicates"] / stats["checked"] if stats["checked"] else 0.0
+        stats["indexed_chunks"] = len(self.index)
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            index_path=self.index_path,
+            threshold=self.threshold,
+            mode=self.mode,
+            num_perm=self.num_perm,
+            shingle_size=self.shingle_size,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NearDuplicateFilter":
+        return default_from_dict(cls, data)
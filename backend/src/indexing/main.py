@@ -2,41 +2,57 @@ from pathlib import Path
 import sys
 
 from contextlib import asynccontextmanager
+import hashlib
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 from common.api_utils import create_api
-from common.models import FilesUploadResponse, FilesListResponse
-from common.document_store import initialize_document_store
+from common.models import FilesUploadResponse, FilesDeleteResponse, FilesListResponse
+from common.document_store import initialize_document_store, tenant_document_store
 from common.config import settings
+from common.logs import configure_logging
+from common.metrics import register_metrics
+from common.tenants import TenantCache, get_tenant, is_default_tenant, stored_tenants
 from indexing.service import IndexingService
 
 
-logging.basicConfig(
-    format="%(levelname)s - %(name)s - [%(process)d] - %(message)s",
-    level=settings.log_level
-)
+configure_logging()
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
-# Set Haystack logger to INFO level
-logging.getLogger("haystack").setLevel(settings.haystack_log_level)
-
 # Create a single instance of IndexingService
 document_store = initialize_document_store()
+if hasattr(document_store, "pool_stats"):
+    register_metrics("opensearch", document_store.pool_stats)
 indexing_service = IndexingService(document_store)
+if "near_duplicate_filter" in indexing_service.pipeline.graph.nodes:
+    register_metrics("near_duplicates", indexing_service.pipeline.get_component("near_duplicate_filter").stats)
+if indexing_service.profiler is not None:
+    register_metrics("indexing_profile", lambda: indexing_service.last_profile_report or {})
+
+# Other tenants get their own service (index, files, pipeline and caches) on first use
+tenant_services = TenantCache(
+    lambda tenant: IndexingService(tenant_document_store(document_store, tenant), tenant=tenant),
+    max_tenants=settings.max_cached_tenants
+)
+register_metrics("tenants", tenant_services.stats)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting up...")
 
     # Index all files on startup
-    if settings.index_on_startup and indexing_service.index_files():
-        logger.info("Indexing completed successfully")
+    if settings.index_on_startup:
+        if indexing_service.index_files():
+            logger.info("Indexing completed successfully")
+        for tenant in stored_tenants():
+            if tenant_services.get(tenant).index_files():
+                logger.info(f"Indexing completed successfully for tenant '{tenant}'")
 
     yield
     # Shutdown
@@ -45,10 +61,11 @@ async def lifespan(app: FastAPI):
 
 app = create_api(title="RAG Indexing Service", lifespan=lifespan)
 
-def get_indexing_service():
-    if indexing_service.pipeline is None:
+def get_indexing_service(tenant: str = Depends(get_tenant)):
+    service = indexing_service if is_default_tenant(tenant) else tenant_services.get(tenant)
+    if service.pipeline is None:
         raise HTTPException(status_code=500, detail="IndexingService not initialized")
-    return indexing_service
+    return service
 
 @app.post("/files", response_model=List[FilesUploadResponse])
 async def upload_files(
@@ -59,6 +76,10 @@ async def upload_files(
     Upload and index multiple files.
 
     This endpoint allows uploading multiple files simultaneously. Each file is saved and indexed synchronously.
+    Uploading a file with the name of an existing one replaces it: the chunks of the previous version are
+    removed once the new version is indexed. If indexing the new version fails, the previous one is kept.
+
+    Files are stored and indexed for the tenant named in the X-Tenant-ID header (the default tenant if absent).
 
     Parameters:
     - files (List[UploadFile]): A list of files to be uploaded and indexed.
@@ -69,7 +90,7 @@ async def upload_files(
       If a file upload fails, an error message is included.
 
     Raises:
-    - HTTPException(400): If no files are provided.
+    - HTTPException(400): If no files are provided, or the tenant id is invalid.
     - HTTPException(500): If the IndexingService is not initialized.
 
     The response status code is 200 if all files are uploaded successfully, or 500 if any file upload fails.
@@ -87,7 +108,8 @@ async def upload_files(
         try:
             contents = await file.read()
             logger.info(f"Uploading file: {file.filename}")
-            full_path = service.save_uploaded_file(file.filename, contents)
+            # Saving and indexing block: they run in the threadpool, as deleting does
+            full_path = await run_in_threadpool(service.save_uploaded_file, file.filename, contents)
 
             logger.info(f"File uploaded and indexed successfully: {full_path}")
             responses.append(FilesUploadResponse(file_id=file.filename, status="success"))
@@ -103,12 +125,19 @@ async def upload_files(
 
 @app.get("/files", response_model=FilesListResponse)
 async def get_files(
+    request: Request,
+    offset: int = Query(0, ge=0, description="Index of the first file returned"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of files returned (all if absent)"),
     service: IndexingService = Depends(get_indexing_service)
 ) -> FilesListResponse:
     """
     Retrieve a list of all indexed files.
 
-    This endpoint rescans the files directory and returns an updated list of all indexed files.
+    This endpoint rescans the files directory of the tenant named in the X-Tenant-ID header
+    and returns an updated list of all indexed files.
+
+    Parameters:
+    - offset, limit: The page of the list returned; `total` is the number of files in the list.
 
     Returns:
     - FilesListResponse: An object containing a list of file information.
@@ -118,11 +147,48 @@ async def get_files(
     - HTTPException(500): If the IndexingService is not initialized.
 
     The files list is updated each time this endpoint is called, ensuring the returned information is current.
+    The response has an ETag of the whole list and the page: a request for the same page with
+    that ETag in If-None-Match gets a 304 without a body until the list changes.
     """
     files = service.rescan_files_and_paths()
 
-    logger.info(f"Found files {files}")
-    return FilesListResponse(files=files)
+    logger.info(f"Found {len(files)} files")
+    etag = '"' + hashlib.sha1(f"{offset}:{limit}\n".encode() + "\n".join(files).encode()).hexdigest() + '"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    end = None if limit is None else offset + limit
+    response = FilesListResponse(files=files[offset:end], total=len(files))
+    return JSONResponse(content=response.dict(), headers={"ETag": etag})
+
+# A plain function: FastAPI runs it in its threadpool, as deleting blocks on the document store
+@app.delete("/files/{name}", response_model=FilesDeleteResponse)
+def delete_file(
+    name: str,
+    service: IndexingService = Depends(get_indexing_service)
+) -> FilesDeleteResponse:
+    """
+    Delete a file and remove its chunks from the index.
+
+    Chunks are removed by their file path metadata, so the rest of the index is left untouched.
+    The file is looked up among the files of the tenant named in the X-Tenant-ID header.
+
+    Parameters:
+    - name (str): Name of the file, as listed by GET /files.
+
+    Returns:
+    - FilesDeleteResponse: The file name, status "deleted" and the number of chunks removed.
+
+    Raises:
+    - HTTPException(404): If there is no file with that name.
+    - HTTPException(500): If the IndexingService is not initialized.
+    """
+    try:
+        deleted = service.delete_file(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"File not found: {name}")
+
+    logger.info(f"File deleted: {name} ({deleted} chunks)")
+    return FilesDeleteResponse(file_id=name, status="deleted", documents_deleted=deleted)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,46 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from haystack import Document, component
+
+
+# FileTypeRouter registers markdown too: keep file types consistent with its routing
+mimetypes.add_type("text/markdown", ".md")
+mimetypes.add_type("text/markdown", ".markdown")
+
+@component
+class MetadataEnricher:
+    """
+    Adds the filterable metadata fields to documents, from their `file_path` meta:
+    `file_name`, `file_type` (MIME type), `uploaded_at` (file modification time, ISO 8601 UTC)
+    and, when given, `tenant`.
+
+    These fields are mapped explicitly in the OpenSearch index, so they can be used in
+    query filters, including the pre-filtered k-NN search.
+    """
+
+    def __init__(self, tenant: Optional[str] = None):
+        self.tenant = tenant
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document], tenant: Optional[str] = None):
+        tenant = tenant or self.tenant
+        uploaded_at: Dict[str, Optional[str]] = {}
+        for doc in documents:
+            file_path = doc.meta.get("file_path")
+            if file_path:
+                if file_path not in uploaded_at:
+                    try:
+                        mtime = os.path.getmtime(file_path)
+                        uploaded_at[file_path] = datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat()
+                    except OSError:
+                        uploaded_at[file_path] = None
+                doc.meta["file_name"] = os.path.basename(file_path)
+                doc.meta["file_type"] = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+                if uploaded_at[file_path]:
+                    doc.meta["uploaded_at"] = uploaded_at[file_path]
+            if tenant:
+                doc.meta["tenant"] = tenant
+        return {"documents": documents}
@@ -0,0 +1,238 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack.components.converters.utils import get_bytestream_from_source, normalize_metadata
+from haystack.dataclasses import ByteStream
+from haystack.lazy_imports import LazyImport
+from pypdf import PdfReader
+from pypdf.generic import IndirectObject, StreamObject
+
+with LazyImport("Run 'pip install pymupdf' to use the pymupdf PDF backend") as pymupdf_import:
+    import pymupdf
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pypdf", "pymupdf")
+
+# Worker pools by size, shared by every converter of the process (e.g. one per tenant pipeline)
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def _shared_executor(max_workers: int) -> ProcessPoolExecutor:
+    with _executors_lock:
+        if max_workers not in _executors:
+            # Forking a threaded server process is unsafe: start clean interpreters
+            _executors[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executors[max_workers]
+
+def _extract_pages(backend: str, data: bytes, page_indexes: List[int], reader: Optional[PdfReader] = None) -> List[str]:
+    """Extracts the text of the given pages. Runs in the worker processes, or inline with an open reader."""
+    if backend == "pymupdf":
+        with pymupdf.open(stream=data, filetype="pdf") as pdf:
+            return [pdf[i].get_text() for i in page_indexes]
+    reader = reader or PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() for i in page_indexes]
+
+def _object_digest(obj, memo: Dict[Tuple[int, int], bytes]) -> bytes:
+    """
+    Digest of a PDF object with its indirect references resolved, the same for every reader
+    of the same content; `memo` holds the digests of the indirect objects of a reader.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            # Stands for the object in references back to it while it's resolved
+            memo[key] = b"cycle"
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+
+    h = hashlib.sha256(type(obj).__name__.encode())
+    if isinstance(obj, StreamObject):
+        h.update(obj.get_data())
+    if isinstance(obj, dict):
+        # Raw values: indexing resolves indirect objects
+        for name, value in sorted(dict.items(obj)):
+            h.update(str(name).encode())
+            h.update(_object_digest(value, memo))
+    elif isinstance(obj, list):
+        for value in list.__iter__(obj):
+            h.update(_object_digest(value, memo))
+    else:
+        h.update(repr(obj).encode())
+    return h.digest()
+
+def _page_hash(backend: str, page, memo: Optional[Dict[Tuple[int, int], bytes]] = None) -> str:
+    """Hashes what determines a page's text: its content stream and fonts."""
+    h = hashlib.sha256(backend.encode())
+    contents = page.get_contents()
+    if contents is not None:
+        h.update(contents.get_data())
+    fonts = page.get("/Resources", {}).get("/Font", {})
+    h.update(_object_digest(fonts, {} if memo is None else memo))
+    return h.hexdigest()
+
+
+class PageCache:
+    """Extracted page text in a sqlite database, keyed by page hash."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pages (hash TEXT PRIMARY KEY, text TEXT NOT NULL)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, hashes: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            # Stay under sqlite's limit on query parameters
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, text FROM pages WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update(rows)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items: List[Tuple[str, str]]):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO pages (hash, text) VALUES (?, ?)", items)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+@component
+class ParallelPDFToDocument:
+    """
+    Converts PDF files to one Document per page, extracting pages in parallel worker processes.
+
+    Pages whose content stream and fonts were seen before are served from a page cache,
+    so re-indexing a file, or files sharing pages, only extracts what changed. Documents are
+    produced page by page and whole-file strings are never built; each Document carries the
+    `page_number` of its page. Pages without text are skipped.
+
+    Converters with the same `max_workers` share one pool of worker processes.
+
+    Small files (fewer than `min_pages_per_worker` pages per worker) are extracted in the
+    calling process, where starting work in the pool would cost more than it saves.
+    """
+
+    def __init__(
+        self,
+        backend: str = "pypdf",
+        max_workers: int = 0,
+        cache_dir: Optional[str] = None,
+        min_pages_per_worker: int = 4,
+        store_full_path: bool = True,
+    ):
+        """
+        :param backend: Text extraction library, "pypdf" or "pymupdf" (faster, needs the pymupdf package).
+        :param max_workers: Extraction processes; 0 uses one per CPU.
+        :param cache_dir: Directory for the page cache; no caching if None.
+        :param min_pages_per_worker: Pages each worker must get for a file to be extracted in parallel.
+        :param store_full_path: Store the full path of the file in `file_path` meta, or only its name.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid PDF backend '{backend}', must be one of: {', '.join(BACKENDS)}")
+        if backend == "pymupdf":
+            pymupdf_import.check()
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.min_pages_per_worker = min_pages_per_worker
+        self.store_full_path = store_full_path
+        self.cache = PageCache(Path(cache_dir) / "pdf_pages.sqlite") if cache_dir else None
+
+    def _extract(self, data: bytes, reader: PdfReader, page_indexes: List[int]) -> Iterator[str]:
+        """Yields page texts in order, in parallel when there are enough pages."""
+        workers = min(self.max_workers, len(page_indexes) // self.min_pages_per_worker)
+        if workers <= 1:
+            yield from _extract_pages(self.backend, data, page_indexes, reader)
+            return
+        chunk_size = -(-len(page_indexes) // workers)
+        chunks = [page_indexes[i:i + chunk_size] for i in range(0, len(page_indexes), chunk_size)]
+        futures = [_shared_executor(self.max_workers).submit(_extract_pages, self.backend, data, chunk) for chunk in chunks]
+        for future in futures:
+            yield from future.result()
+
+    def _convert(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        """Yields (page number, text) for every page of the PDF."""
+        reader = PdfReader(io.BytesIO(data))
+        n_pages = len(reader.pages)
+        if self.cache is None:
+            yield from enumerate(self._extract(data, reader, list(range(n_pages))), start=1)
+            return
+
+        # Fonts are usually shared by the pages: each is hashed once
+        memo: Dict[Tuple[int, int], bytes] = {}
+        hashes = [_page_hash(self.backend, page, memo) for page in reader.pages]
+        cached = self.cache.get_many(list(set(hashes)))
+        missing = [i for i in range(n_pages) if hashes[i] not in cached]
+        extracted = dict(zip(missing, self._extract(data, reader, missing)))
+        if extracted:
+            self.cache.put_many([(hashes[i], text) for i, text in extracted.items()])
+        for i in range(n_pages):
+            yield i + 1, extracted[i] if i in extracted else cached[hashes[i]]
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        sources: List[Union[str, Path, ByteStream]],
+        meta: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+    ):
+        documents = []
+        meta_list = normalize_metadata(meta, sources_count=len(sources))
+
+        for source, metadata in zip(sources, meta_list):
+            try:
+                bytestream = get_bytestream_from_source(source)
+                pages = list(self._convert(bytestream.data))
+            except Exception as e:
+                logger.warning(f"Could not read {source} and convert it to Documents, skipping. Error: {e}")
+                continue
+
+            merged_metadata = {**bytestream.meta, **metadata}
+            if not self.store_full_path and "file_path" in merged_metadata:
+                merged_metadata["file_path"] = os.path.basename(merged_metadata["file_path"])
+            for page_number, text in pages:
+                if text and text.strip():
+                    documents.append(Document(content=text, meta={**merged_metadata, "page_number": page_number}))
+
+        return {"documents": documents}
+
+    def close(self):
+        """Shuts down the worker pool, which is shared with the other converters of the same size."""
+        with _executors_lock:
+            executor = _executors.pop(self.max_workers, None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            backend=self.backend,
+            max_workers=self.max_workers,
+            cache_dir=self.cache_dir,
+            min_pages_per_worker=self.min_pages_per_worker,
+            store_full_path=self.store_full_path,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParallelPDFToDocument":
+        return default_from_dict(cls, data)
@@ -0,0 +1,109 @@
+import re
+from copy import deepcopy
+from typing import List, Tuple
+
+import numpy as np
+from haystack import Document, component
+from haystack.components.preprocessors import DocumentCleaner, DocumentSplitter
+
+
+_SPLIT_BY_MAPPING = {"page": "\f", "passage": "\n\n", "sentence": ".", "word": " ", "line": "\n"}
+
+
+@component
+class FastDocumentCleaner(DocumentCleaner):
+    """
+    DocumentCleaner producing the same output with one pass less over the text.
+
+    Removing extra whitespace collapses every run of whitespace inside a page and strips the
+    page, after which no line can be empty: the empty line pass is skipped then.
+    """
+
+    def _remove_empty_lines(self, text: str) -> str:
+        # run() removes extra whitespace first, which leaves no empty lines
+        if self.remove_extra_whitespaces:
+            return text
+        return super()._remove_empty_lines(text)
+
+
+def _unit_offsets(text: str, split_at: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the start offset of every unit (plus the text length as a last entry) and the
+    offsets of the page breaks, with units split as `text.split(split_at)` does, each keeping
+    its trailing delimiter.
+    """
+    if len(split_at) == 1:
+        # One scan over the code points finds every delimiter and page break
+        if text.isascii():
+            codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        else:
+            codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        delimiters = np.flatnonzero(codes == ord(split_at))
+        page_breaks = delimiters if split_at == "\f" else np.flatnonzero(codes == ord("\f"))
+    else:
+        delimiters = np.fromiter((m.start() for m in re.finditer(re.escape(split_at), text)), dtype=np.int64)
+        page_breaks = np.fromiter((m.start() for m in re.finditer("\f", text)), dtype=np.int64)
+
+    offsets = np.empty(len(delimiters) + 2, dtype=np.int64)
+    offsets[0] = 0
+    offsets[1:-1] = delimiters + len(split_at)
+    offsets[-1] = len(text)
+    return offsets, page_breaks
+
+def _window_starts(n_units: int, split_length: int, step: int) -> np.ndarray:
+    """Start unit of each window, matching `more_itertools.windowed(units, split_length, step=step)`."""
+    if n_units <= split_length:
+        return np.zeros(1 if n_units else 0, dtype=np.int64)
+    n_full = (n_units - split_length) // step + 1
+    starts = np.arange(n_full, dtype=np.int64) * step
+    # A last, partial window covers the units left after the last full one
+    if starts[-1] + split_length < n_units:
+        starts = np.append(starts, n_full * step)
+    return starts
+
+
+@component
+class FastDocumentSplitter(DocumentSplitter):
+    """
+    DocumentSplitter producing the same splits without materializing a string per unit.
+
+    The text is scanned once to find the offsets of all unit boundaries and page breaks;
+    window boundaries, `split_idx_start` and page numbers are then computed on those
+    offsets, and each split is a single slice of the original text.
+
+    Documents with a `page_number` (one page per document, as ParallelPDFToDocument emits)
+    keep it: the page numbers of their splits start from it instead of from 1.
+    """
+
+    def _split(self, to_split: Document) -> List[Document]:
+        if to_split.content is None:
+            return []
+        if self.split_by == "function":
+            return super()._split(to_split)
+
+        text = to_split.content
+        offsets, page_breaks = _unit_offsets(text, _SPLIT_BY_MAPPING[self.split_by])
+        n_units = len(offsets) - 1
+        starts = _window_starts(n_units, self.split_length, self.split_length - self.split_overlap)
+        ends = np.minimum(starts + self.split_length, n_units)
+        char_starts, char_ends = offsets[starts], offsets[ends]
+        pages = np.searchsorted(page_breaks, char_starts) + to_split.meta.get("page_number", 1)
+
+        text_splits: List[str] = []
+        splits_pages: List[int] = []
+        splits_start_idxs: List[int] = []
+        for n, start, end, page in zip(
+            (ends - starts).tolist(), char_starts.tolist(), char_ends.tolist(), pages.tolist()
+        ):
+            if n < self.split_threshold and text_splits:
+                text_splits[-1] += text[start:end]
+            elif end > start:
+                text_splits.append(text[start:end])
+                splits_pages.append(page)
+                splits_start_idxs.append(start)
+
+        metadata = deepcopy(to_split.meta)
+        metadata["source_id"] = to_split.id
+        return self._create_docs_from_splits(
+            text_splits=text_splits, splits_pages=splits_pages, splits_start_idxs=splits_start_idxs, meta=metadata
+        )
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from haystack import Document, Pipeline
+from haystack.components.routers import FileTypeRouter
+
+
+logger = logging.getLogger(__name__)
+
+def _count_documents(value: Any) -> Optional[int]:
+    if isinstance(value, list) and all(isinstance(item, Document) for item in value):
+        return len(value)
+    return None
+
+class PipelineProfiler:
+    """
+    Records wall time, CPU time, peak memory and document counts per pipeline component,
+    and per MIME type as routed by the pipeline's FileTypeRouter.
+
+    The component `run` methods are wrapped once; they only record while a `profile()`
+    block is active in the calling thread. CPU time is process-wide and peak memory is
+    measured with tracemalloc, so concurrent profiled runs blur each other's numbers.
+    """
+
+    def __init__(self, pipeline: Pipeline):
+        self.pipeline = pipeline
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._local = threading.local()
+        for name in pipeline.graph.nodes:
+            self._wrap(name, pipeline.get_component(name))
+
+    def _wrap(self, name: str, instance):
+        run = instance.run
+
+        @wraps(run)
+        def profiled_run(**kwargs):
+            report = getattr(self._local, "report", None)
+            if report is None:
+                return run(**kwargs)
+
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                self._track_peak(report)
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            result = run(**kwargs)
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] - memory_before if tracing else 0
+            if tracing:
+                self._track_peak(report)
+
+            self._record(report, name, instance, kwargs, result, wall, cpu, peak)
+            return result
+
+        instance.run = profiled_run
+
+    @staticmethod
+    def _track_peak(report):
+        # Each stage resets tracemalloc's peak to measure its own: the run's is the highest seen
+        report["_peak_bytes"] = max(report["_peak_bytes"], tracemalloc.get_traced_memory()[1])
+
+    def _record(self, report, name, instance, inputs, outputs, wall, cpu, peak):
+        stage = report["stages"].setdefault(name, {
+            "calls": 0, "wall_time_s": 0.0, "cpu_time_s": 0.0, "peak_memory_mb": 0.0,
+            "documents_in": 0, "documents_out": 0,
+        })
+        stage["calls"] += 1
+        stage["wall_time_s"] += wall
+        stage["cpu_time_s"] += cpu
+        stage["peak_memory_mb"] = max(stage["peak_memory_mb"], peak / (1024 * 1024))
+        documents_in = sum(filter(None, (_count_documents(v) for v in inputs.values())))
+        stage["documents_in"] += documents_in
+
+        if isinstance(instance, FileTypeRouter):
+            for mime_type, sources in outputs.items():
+                for source in sources:
+                    self._add_source(report, str(source), mime_type)
+            return
+
+        mime_of = report["_mime_of"]
+        converted = {}
+        for value in outputs.values():
+            if _count_documents(value) is None:
+                continue
+            stage["documents_out"] += len(value)
+            for doc in value:
+                mime_type = mime_of.get(str(doc.meta.get("file_path")), "unknown")
+                converted[mime_type] = converted.get(mime_type, 0) + 1
+
+        for mime_type, count in converted.items():
+            per_mime = self._mime_entry(report, mime_type)
+            per_mime["documents"][name] = per_mime["documents"].get(name, 0) + count
+            # Converters only see one MIME type, so their time is attributable to it
+            if len(converted) == 1 and not documents_in:
+                per_mime["conversion_time_s"] += wall
+
+    def _mime_entry(self, report, mime_type: str) -> Dict[str, Any]:
+        return report["mime_types"].setdefault(
+            mime_type, {"files": 0, "bytes": 0, "conversion_time_s": 0.0, "documents": {}}
+        )
+
+    def _add_source(self, report, source: str, mime_type: str):
+        report["_mime_of"][source] = mime_type
+        per_mime = self._mime_entry(report, mime_type)
+        per_mime["files"] += 1
+        try:
+            per_mime["bytes"] += os.path.getsize(source)
+        except OSError:
+            pass
+
+    @contextmanager
+    def profile(self, sources: List[str]):
+        """Profiles the pipeline runs inside the block; yields the report being filled in."""
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "files": len(sources),
+            "stages": {},
+            "mime_types": {},
+            "_mime_of": {},
+            "_peak_bytes": 0,
+        }
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._local.report = report
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield report
+        finally:
+            self._local.report = None
+            report["wall_time_s"] = time.perf_counter() - wall_start
+            report["cpu_time_s"] = time.process_time() - cpu_start
+            self._track_peak(report)
+            report["peak_memory_mb"] = report.pop("_peak_bytes") / (1024 * 1024)
+            # Kilobytes on Linux
+            report["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            if started_tracing:
+                tracemalloc.stop()
+            del report["_mime_of"]
+            report["bytes"] = sum(m["bytes"] for m in report["mime_types"].values())
+            for stage in report["stages"].values():
+                stage["share"] = stage["wall_time_s"] / report["wall_time_s"] if report["wall_time_s"] else 0.0
+            self.last_report = report
+
+    def summary(self, report: Dict[str, Any]) -> str:
+        stages = sorted(report["stages"].items(), key=lambda item: item[1]["wall_time_s"], reverse=True)
+        breakdown = ", ".join(f"{name} {stage['share']:.0%}" for name, stage in stages)
+        return (
+            f"Indexed {report['files']} files ({report['bytes'] / (1024 * 1024):.1f} MB) "
+            f"in {report['wall_time_s']:.2f}s (CPU {report['cpu_time_s']:.2f}s, "
+            f"peak {report['peak_memory_mb']:.1f} MB): {breakdown}"
+        )
+
+    def write_report(self, report: Dict[str, Any], directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = directory / f"indexing-{timestamp}.json"
+        path.write_text(json.dumps(report, indent=2))
+        return path
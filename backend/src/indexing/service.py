@@ -1,24 +1,36 @@
 from pathlib import Path
 import sys
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
-from typing import Optional, List
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, List, Set
 
-from haystack import Pipeline
+from haystack import Document, Pipeline
 from haystack.components.routers import FileTypeRouter
-from haystack.components.converters import TextFileToDocument, PyPDFToDocument, MarkdownToDocument
+from haystack.components.converters import TextFileToDocument, MarkdownToDocument
 from haystack.components.joiners import DocumentJoiner
-from haystack.components.preprocessors import DocumentCleaner, DocumentSplitter
 from haystack.components.writers import DocumentWriter
 from haystack.components.embedders import SentenceTransformersDocumentEmbedder
 from haystack.components.embedders import OpenAIDocumentEmbedder
 from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
 from haystack.document_stores.types import DuplicatePolicy
 
+from common.document_store import delete_documents_by_file, document_ids_by_file
 from common.file_manager import FileManager
-from common.pipeline_loader import load_pipeline
+from common.pipeline_loader import PipelineReloader, load_pipeline
+from common.llm_client import use_shared_client
 from common.config import settings
+from common.tenants import is_default_tenant, tenant_cache_path, tenant_storage_path
+from indexing.chunking import DocumentChunker
+from indexing.dedup import NearDuplicateFilter
+from indexing.metadata import MetadataEnricher
+from indexing.pdf_converter import ParallelPDFToDocument
+from indexing.preprocessors import FastDocumentCleaner, FastDocumentSplitter
+from indexing.profiler import PipelineProfiler
 
 
 logger = logging.getLogger(__name__)
@@ -36,12 +48,21 @@ class FilePathRemover:
 @dataclass
 class IndexingConfig:
     document_store: OpenSearchDocumentStore
+    tenant: Optional[str] = None
     pipeline_filename: str = "index.yml"
     embedder_model: str = "intfloat/multilingual-e5-base"
-    split_by: str = "word"
-    split_length: int = 250
-    split_overlap: int = 30
+    # Chunking strategy, and the ones of given MIME types; sizes in words, or tokens with "token"
+    split_by: str = settings.chunking_strategy
+    split_by_type: Dict[str, str] = field(default_factory=lambda: dict(settings.chunking_strategies))
+    split_length: int = settings.chunk_size
+    split_overlap: int = settings.chunk_overlap
     writer_policy: DuplicatePolicy = DuplicatePolicy.SKIP
+    pdf_backend: str = settings.pdf_backend
+    pdf_workers: int = settings.pdf_workers
+    pdf_page_cache_dir: Optional[Path] = settings.pdf_page_cache_dir
+    near_duplicate_mode: str = settings.near_duplicate_mode
+    near_duplicate_threshold: float = settings.near_duplicate_threshold
+    near_duplicate_index_path: Path = settings.near_duplicate_index_path
 
 def create_indexing_pipeline(config: IndexingConfig) -> Pipeline:
     """
@@ -49,12 +70,14 @@ def create_indexing_pipeline(config: IndexingConfig) -> Pipeline:
 
     This function sets up a Haystack pipeline that performs the following steps:
     1. Routes files based on type (text, PDF, Markdown)
-    2. Converts files to documents
-    3. Joins multiple documents
+    2. Converts files to documents (PDFs page by page, in parallel)
+    3. Joins multiple documents and adds their filterable metadata (file name, type, upload date)
     4. Cleans the documents
-    5. Splits documents into smaller chunks
-    6. Embeds the document chunks using SentenceTransformers
-    7. Writes the processed documents to the document store
+    5. Splits documents into smaller chunks, with the chunking strategy of their file type
+       (strategies other than "word" split before cleaning, to see the text's structure)
+    6. Optionally skips or links near-duplicate chunks, so they aren't embedded
+    7. Embeds the document chunks using SentenceTransformers
+    8. Writes the processed documents to the document store
 
     Args:
         config (IndexingConfig): Configuration object containing settings for the indexing pipeline.
@@ -75,22 +98,42 @@ def create_indexing_pipeline(config: IndexingConfig) -> Pipeline:
 
     # File converters
     p.add_component(instance=TextFileToDocument(), name="text_file_converter")
-    p.add_component(instance=PyPDFToDocument(), name="pdf_file_converter")
+    p.add_component(instance=ParallelPDFToDocument(
+        backend=config.pdf_backend,
+        max_workers=config.pdf_workers,
+        cache_dir=str(config.pdf_page_cache_dir) if config.pdf_page_cache_dir else None
+    ), name="pdf_file_converter")
     p.add_component(instance=MarkdownToDocument(), name="markdown_converter")
 
     # Document processing
     p.add_component(instance=DocumentJoiner(join_mode="concatenate"), name="document_joiner")
-    p.add_component(instance=DocumentCleaner(), name="document_cleaner")
-    p.add_component(instance=DocumentSplitter(
-        split_by=config.split_by, 
-        split_length=config.split_length, 
-        split_overlap=config.split_overlap
-    ), name="document_splitter")
+    p.add_component(instance=MetadataEnricher(tenant=config.tenant), name="metadata_enricher")
+    p.add_component(instance=FastDocumentCleaner(), name="document_cleaner")
+    chunk_structure = config.split_by != "word" or any(strategy != "word" for strategy in config.split_by_type.values())
+    if not chunk_structure:
+        p.add_component(instance=FastDocumentSplitter(
+            split_by=config.split_by, 
+            split_length=config.split_length, 
+            split_overlap=config.split_overlap
+        ), name="document_splitter")
+    else:
+        # Other strategies, or a strategy per MIME type; they need the paragraphs and lines
+        # that cleaning collapses, so chunks are cleaned instead of documents
+        p.add_component(instance=DocumentChunker(
+            split_by=config.split_by,
+            split_by_type=config.split_by_type,
+            split_length=config.split_length,
+            split_overlap=config.split_overlap
+        ), name="document_splitter")
 
     # Embedding and document indexing
     if settings.use_openai_embedder:
         p.add_component(
-            instance=OpenAIDocumentEmbedder(),
+            instance=use_shared_client(OpenAIDocumentEmbedder(
+                api_base_url=settings.openai_base_url,
+                timeout=settings.openai_timeout,
+                max_retries=settings.openai_max_retries
+            )),
             name="document_embedder"
         )
     else:
@@ -104,6 +147,22 @@ def create_indexing_pipeline(config: IndexingConfig) -> Pipeline:
         name="document_writer"
     )
 
+    if config.near_duplicate_mode != "off":
+        p.add_component(
+            instance=NearDuplicateFilter(
+                # Chunks are only near duplicates of the same tenant's chunks
+                index_path=str(tenant_cache_path(config.near_duplicate_index_path, config.tenant)),
+                threshold=config.near_duplicate_threshold,
+                mode=config.near_duplicate_mode
+            ),
+            name="near_duplicate_filter"
+        )
+    if config.near_duplicate_mode == "link":
+        p.add_component(
+            instance=DocumentWriter(document_store=config.document_store, policy=config.writer_policy),
+            name="duplicate_writer"
+        )
+
     # Connect components to each other
     p.connect("file_type_router.text/plain", "text_file_converter.sources")
     p.connect("file_type_router.application/pdf", "pdf_file_converter.sources")
@@ -113,21 +172,52 @@ def create_indexing_pipeline(config: IndexingConfig) -> Pipeline:
     p.connect("pdf_file_converter", "document_joiner.documents")
     p.connect("markdown_converter", "document_joiner.documents")
 
-    p.connect("document_joiner.documents", "document_cleaner.documents")
-    p.connect("document_cleaner.documents", "document_splitter.documents")
-    p.connect("document_splitter.documents", "document_embedder.documents")
+    p.connect("document_joiner.documents", "metadata_enricher.documents")
+    if chunk_structure:
+        p.connect("metadata_enricher.documents", "document_splitter.documents")
+        p.connect("document_splitter.documents", "document_cleaner.documents")
+        chunks = "document_cleaner.documents"
+    else:
+        p.connect("metadata_enricher.documents", "document_cleaner.documents")
+        p.connect("document_cleaner.documents", "document_splitter.documents")
+        chunks = "document_splitter.documents"
+    if config.near_duplicate_mode != "off":
+        p.connect(chunks, "near_duplicate_filter.documents")
+        p.connect("near_duplicate_filter.documents", "document_embedder.documents")
+    else:
+        p.connect(chunks, "document_embedder.documents")
+    if config.near_duplicate_mode == "link":
+        p.connect("near_duplicate_filter.duplicates", "duplicate_writer.documents")
     p.connect("document_embedder.documents", "document_writer.documents")
     
     return p
 
+def find_near_duplicate_filter(pipeline: Pipeline) -> Optional[NearDuplicateFilter]:
+    return next((instance for _, instance in pipeline.walk() if isinstance(instance, NearDuplicateFilter)), None)
+
+@dataclass
+class IndexingRun:
+    """The pipeline a run uses, with its near-duplicate filter and profiler."""
+    pipeline: Pipeline
+    near_duplicate_filter: Optional[NearDuplicateFilter] = None
+    profiler: Optional[PipelineProfiler] = None
+
 class IndexingService:
-    def __init__(self, document_store):
-        self.config = IndexingConfig(document_store=document_store)
+    def __init__(self, document_store, tenant: Optional[str] = None):
+        self.config = IndexingConfig(document_store=document_store, tenant=tenant)
         self.pipeline = None
+        self.reloader = None
+        profiler = PipelineProfiler if settings.indexing_profile else None
 
-        if settings.pipelines_from_yaml:
+        # YAML definitions name their document store index: they are only used for the default tenant
+        if settings.pipelines_from_yaml and is_default_tenant(tenant):
             try:
                 self.pipeline = load_pipeline(settings.pipelines_dir, self.config.pipeline_filename)
+                if self.pipeline is not None and settings.pipeline_reload_interval > 0:
+                    # Reloaded pipelines are profiled from the start, each by a profiler of its own
+                    self.reloader = PipelineReloader(
+                        settings.pipelines_dir, self.config.pipeline_filename, pipeline=self.pipeline, prepare=profiler
+                    )
             except Exception as e:
                 logger.warning(f"Failed to load pipeline from YAML: {e}. Falling back to default pipeline.")
 
@@ -136,10 +226,42 @@ class IndexingService:
 
         #print(f"\n--- Indexing Pipeline ---\n{self.pipeline.dumps()}")
 
-        self.file_manager = FileManager()
+        if self.reloader is not None:
+            self.profiler = self.reloader.prepared(self.pipeline)
+        else:
+            self.profiler = profiler(self.pipeline) if profiler is not None else None
+        self.near_duplicate_filter = find_near_duplicate_filter(self.pipeline)
+        # The report of the last profiled run, of whichever pipeline ran it
+        self.last_profile_report: Optional[Dict[str, Any]] = None
 
-    def index_files(self, path: Optional[str] = None):
-        if self.pipeline is None:
+        self.file_manager = FileManager(tenant_storage_path(tenant))
+        # Uploads and deletes change the files and the index together: one at a time, so that
+        # a delete doesn't interleave with the replacement of a file
+        self._files_lock = threading.Lock()
+
+    @contextmanager
+    def _lease(self) -> Iterator[IndexingRun]:
+        """
+        The indexing pipeline, for a run. From a YAML definition, the current one, leased:
+        runs already started finish on a pipeline replaced by a reload, with its own filter
+        and profiler.
+        """
+        if self.reloader is None:
+            yield IndexingRun(self.pipeline, self.near_duplicate_filter, self.profiler)
+            return
+        with self.reloader.lease() as pipeline:
+            yield IndexingRun(pipeline, find_near_duplicate_filter(pipeline), self.reloader.prepared(pipeline))
+
+    def index_files(self, path: Optional[str] = None, with_chunks: bool = False):
+        """
+        Indexes a file, or all files. With `with_chunks`, the result also has the outputs of
+        the components feeding the document writers: the chunks the run wrote.
+        """
+        with self._lease() as run:
+            return self._index_files(run, path, with_chunks)
+
+    def _index_files(self, run: IndexingRun, path: Optional[str], with_chunks: bool):
+        if run.pipeline is None:
             raise ValueError("Indexing pipeline has not been initialized")
  
         # If path is provided, index that single file, otherwise index all files
@@ -149,19 +271,142 @@ class IndexingService:
             logger.info("No files to index")
             return
 
-        logger.info(f"Indexing files: {sources}")
+        logger.info(f"Indexing {len(sources)} files", extra={"event": "index_files", "files": len(sources)})
+        if settings.log_payloads:
+            logger.debug("Indexing sources", extra={"sources": sources})
 
-        # Here "file_type_router" has to match the pipeline component definition!
-        result = self.pipeline.run({"file_type_router": {"sources": sources}})
+        include_outputs_from = self._writer_inputs(run.pipeline) if with_chunks else None
+        if run.profiler is not None:
+            with run.profiler.profile(sources) as report:
+                result = self._run_pipeline(run, sources, include_outputs_from)
+            self.last_profile_report = report
+            report_path = run.profiler.write_report(report, settings.indexing_profile_dir)
+            logger.info(f"{run.profiler.summary(report)} (report: {report_path})")
+        else:
+            result = self._run_pipeline(run, sources, include_outputs_from)
+
+        written = result.get("document_writer", {}).get("documents_written", 0)
+        logger.info(f"Indexed {written} chunks", extra={"event": "index_result", "documents_written": written})
+        if settings.log_payloads:
+            logger.debug("Indexing result", extra={"result": result})
+        return result
 
-        logger.info(f"Indexing result: {result}")
+    @staticmethod
+    def _run_pipeline(run: IndexingRun, sources: List[str], include_outputs_from: Optional[Set[str]] = None):
+        # Here "file_type_router" has to match the pipeline component definition!
+        data = {"file_type_router": {"sources": sources}}
+        try:
+            if include_outputs_from:
+                result = run.pipeline.run(data, include_outputs_from=include_outputs_from)
+            else:
+                result = run.pipeline.run(data)
+        except Exception:
+            if run.near_duplicate_filter is not None:
+                run.near_duplicate_filter.discard()
+            raise
+        # The chunks are written: their signatures can be matched by later runs
+        if run.near_duplicate_filter is not None:
+            run.near_duplicate_filter.commit()
         return result
 
+    @staticmethod
+    def _writer_inputs(pipeline: Pipeline) -> Set[str]:
+        return {
+            sender
+            for name, instance in pipeline.walk() if isinstance(instance, DocumentWriter)
+            for sender in pipeline.graph.predecessors(name)
+        }
+
+    @staticmethod
+    def _chunk_ids(result: Dict[str, Any]) -> Set[str]:
+        return {
+            doc.id
+            for outputs in result.values() if isinstance(outputs, dict)
+            for value in outputs.values() if isinstance(value, list)
+            for doc in value if isinstance(doc, Document)
+        }
+
     def save_uploaded_file(self, filename: str, contents: bytes) -> str:
+        with self._files_lock:
+            return self._save_uploaded_file(filename, contents)
+
+    def _save_uploaded_file(self, filename: str, contents: bytes) -> str:
+        previous_path = self.file_manager.get_file_path(filename)
+        if previous_path is None:
+            full_path = self.file_manager.save_file(filename, contents)
+            # Index uploaded file synchronously
+            self.index_files(full_path)
+            return full_path
+
+        # Replacing a file: its new version is indexed before the chunks of the previous one are
+        # deleted, so that the previous version stays searchable, and is put back if indexing fails
+        document_store = self.config.document_store
+        previous_ids = set(document_ids_by_file(document_store, previous_path))
+        previous_contents, previous_stat = Path(previous_path).read_bytes(), os.stat(previous_path)
         full_path = self.file_manager.save_file(filename, contents)
-        # Index uploaded file synchronously
-        self.index_files(full_path)
+        try:
+            result = self.index_files(full_path, with_chunks=True)
+        except Exception:
+            with self._lease() as run:
+                self._delete_chunks(set(document_ids_by_file(document_store, full_path)) - previous_ids, run.near_duplicate_filter)
+            if full_path != previous_path:
+                os.remove(full_path)
+            with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(previous_path)) as temp_file:
+                temp_file.write(previous_contents)
+            os.replace(temp_file.name, previous_path)
+            # Keeps the `uploaded_at` of the previous version's chunks
+            os.utime(previous_path, ns=(previous_stat.st_atime_ns, previous_stat.st_mtime_ns))
+            if full_path != previous_path:
+                self.file_manager.add_files_and_paths()
+            raise
+
+        # Unchanged chunks of the same file keep their ids: they are part of the new version
+        with self._lease() as run:
+            deleted = self._delete_chunks(previous_ids - self._chunk_ids(result or {}), run.near_duplicate_filter)
+        logger.info(f"Deleted {deleted} chunks of the previous version of {previous_path}")
+        if previous_path != full_path:
+            os.remove(previous_path)
         return full_path
 
+    def delete_file(self, filename: str) -> int:
+        """Deletes a file and its chunks; returns the number of chunks deleted."""
+        with self._files_lock:
+            full_path = self.file_manager.get_file_path(filename)
+            if full_path is None:
+                raise FileNotFoundError(f"File not found: {filename}")
+
+            with self._lease() as run:
+                deleted = self._delete_documents(full_path, run.near_duplicate_filter)
+            self.file_manager.delete_file(filename)
+            return deleted
+
+    def _delete_documents(self, full_path: str, near_duplicate_filter: Optional[NearDuplicateFilter]) -> int:
+        document_store = self.config.document_store
+        doc_ids = document_ids_by_file(document_store, full_path) if near_duplicate_filter is not None else []
+        deleted = delete_documents_by_file(document_store, full_path)
+        logger.info(f"Deleted {deleted} chunks of {full_path}")
+        if near_duplicate_filter is not None:
+            near_duplicate_filter.index.remove_file(full_path)
+            self._restore_duplicates(doc_ids, near_duplicate_filter)
+        return deleted
+
+    def _delete_chunks(self, doc_ids: Set[str], near_duplicate_filter: Optional[NearDuplicateFilter]) -> int:
+        if doc_ids:
+            self.config.document_store.delete_documents(list(doc_ids))
+            if near_duplicate_filter is not None:
+                near_duplicate_filter.index.remove(list(doc_ids))
+                self._restore_duplicates(list(doc_ids), near_duplicate_filter)
+        return len(doc_ids)
+
+    def _restore_duplicates(self, doc_ids: List[str], near_duplicate_filter: NearDuplicateFilter):
+        """Indexes again the files with near duplicates of deleted chunks, which were skipped or stored without an embedding."""
+        for file_path, duplicate_ids in near_duplicate_filter.index.duplicates_of(doc_ids).items():
+            # Linked duplicates would otherwise be kept as they are by the writers
+            self.config.document_store.delete_documents(duplicate_ids)
+            near_duplicate_filter.index.remove(duplicate_ids)
+            if file_path and Path(file_path).is_file():
+                logger.info(f"Indexing {file_path} again: {len(duplicate_ids)} of its chunks were near duplicates of deleted ones")
+                self.index_files(file_path)
+
     def rescan_files_and_paths(self) -> List[str]:
         return self.file_manager.add_files_and_paths()
@@ -0,0 +1,264 @@
+"""
+Index snapshots, to bootstrap an environment without converting and embedding its files again.
+
+A snapshot is a directory with the chunks of an index and their embeddings, the files they
+come from, and a manifest:
+
+- `chunks.parquet`: chunk id, content, meta (JSON) and embedding (float32 vector, null for
+  chunks indexed without one)
+- `files.parquet`: path relative to the file storage path, size, modification time,
+  SHA-256 and contents (null when exported with --no-files)
+- `snapshot.json`: format version, embedding dimension, counts, and the source's storage path
+
+Importing bulk loads the chunks into the index as they are, without running the indexing
+pipeline, and restores the files with their modification times. Chunks keep their ids;
+their file paths are rebased onto the target's storage path, so that deleting or replacing
+a file deletes its chunks.
+
+Usage (from backend/src, with the settings of the environment):
+
+    python -m indexing.snapshot export /path/to/snapshot [--tenant acme] [--no-files]
+    python -m indexing.snapshot import /path/to/snapshot [--tenant acme] [--no-files]
+
+Requires pyarrow ('pip install pyarrow', the 'snapshot' extra).
+"""
+from pathlib import Path
+import sys
+
+src_path = Path(__file__).resolve().parent.parent
+sys.path.append(str(src_path))
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+from haystack import Document
+from haystack.lazy_imports import LazyImport
+
+from common.document_store import (
+    bulk_loading, bulk_write_documents, embedding_dimension, initialize_document_store, iter_documents
+)
+from common.file_manager import FileManager
+from common.logs import configure_logging
+from common.tenants import tenant_storage_path, validate_tenant_id
+
+with LazyImport("Run 'pip install pyarrow' (the 'snapshot' extra) to export and import index snapshots") as pyarrow_import:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE, CHUNKS_FILE, FILES_FILE = "snapshot.json", "chunks.parquet", "files.parquet"
+
+# Bytes of file contents buffered before they are written as a row group
+FILES_ROW_GROUP_BYTES = 64 * 1024 * 1024
+
+
+def _chunks_schema(embedding_dim: int) -> "pa.Schema":
+    return pa.schema([
+        ("id", pa.string()),
+        ("content", pa.string()),
+        ("meta", pa.string()),
+        ("embedding", pa.list_(pa.float32(), embedding_dim)),
+    ])
+
+def _files_schema() -> "pa.Schema":
+    return pa.schema([
+        ("path", pa.string()),
+        ("size", pa.int64()),
+        ("modified_at", pa.float64()),
+        ("sha256", pa.string()),
+        ("content", pa.binary()),
+    ])
+
+def _chunks_table(documents: List[Document], schema: "pa.Schema", embedding_dim: int) -> "pa.Table":
+    vectors = np.zeros((len(documents), embedding_dim), dtype=np.float32)
+    missing = np.zeros(len(documents), dtype=bool)
+    for i, doc in enumerate(documents):
+        if doc.embedding is None:
+            missing[i] = True
+        elif len(doc.embedding) != embedding_dim:
+            raise ValueError(
+                f"Document {doc.id} has a {len(doc.embedding)}-dimensional embedding, expected {embedding_dim}"
+            )
+        else:
+            vectors[i] = doc.embedding
+    embeddings = pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), embedding_dim, mask=pa.array(missing))
+    return pa.Table.from_arrays(
+        [
+            pa.array([doc.id for doc in documents], pa.string()),
+            pa.array([doc.content for doc in documents], pa.string()),
+            pa.array([orjson.dumps(doc.meta, default=str).decode() for doc in documents], pa.string()),
+            embeddings,
+        ],
+        schema=schema,
+    )
+
+def _chunks_documents(batch: "pa.RecordBatch", source_root: str, target_root: str) -> List[Document]:
+    embeddings = batch.column("embedding")
+    valid = embeddings.is_valid().to_numpy(zero_copy_only=False)
+    # Vectors of the non-null embeddings, in order
+    vectors = iter(embeddings.flatten().to_numpy().reshape(-1, embeddings.type.list_size))
+
+    documents = []
+    for doc_id, content, meta, has_embedding in zip(
+        batch.column("id").to_pylist(), batch.column("content").to_pylist(), batch.column("meta").to_pylist(), valid
+    ):
+        meta = orjson.loads(meta)
+        file_path = meta.get("file_path")
+        # Chunks keep their ids, which `source_id`, `_split_overlap` and `near_duplicate_of` refer to
+        if source_root != target_root and isinstance(file_path, str) and file_path.startswith(source_root + os.sep):
+            meta["file_path"] = target_root + file_path[len(source_root):]
+        embedding = next(vectors).tolist() if has_embedding else None
+        documents.append(Document(id=doc_id, content=content, meta=meta, embedding=embedding))
+    return documents
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _export_files(storage_path: Path, path: Path, include_contents: bool) -> int:
+    file_paths = FileManager(storage_path).file_paths
+    schema = _files_schema()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        rows: Dict[str, list] = {name: [] for name in schema.names}
+        buffered = 0
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            content = Path(file_path).read_bytes() if include_contents else None
+            rows["path"].append(Path(file_path).relative_to(storage_path).as_posix())
+            rows["size"].append(stat.st_size)
+            rows["modified_at"].append(stat.st_mtime)
+            rows["sha256"].append(hashlib.sha256(content).hexdigest() if content is not None else _sha256(Path(file_path)))
+            rows["content"].append(content)
+            buffered += stat.st_size if include_contents else 0
+            if buffered >= FILES_ROW_GROUP_BYTES:
+                writer.write_table(pa.Table.from_pydict(rows, schema=schema))
+                rows = {name: [] for name in schema.names}
+                buffered = 0
+        if rows["path"]:
+            writer.write_table(pa.Table.from_pydict(rows, schema=schema))
+    return len(file_paths)
+
+def _import_files(storage_path: Path, path: Path) -> int:
+    root = storage_path.resolve()
+    restored = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=64):
+        for row in batch.to_pylist():
+            if row["content"] is None:
+                continue
+            target = (storage_path / row["path"]).resolve()
+            if not target.is_relative_to(root):
+                raise ValueError(f"Snapshot file path '{row['path']}' is outside the file storage path")
+            if hashlib.sha256(row["content"]).hexdigest() != row["sha256"]:
+                raise ValueError(f"Snapshot file '{row['path']}' is corrupt: its SHA-256 doesn't match")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(delete=False, dir=target.parent) as temp_file:
+                temp_file.write(row["content"])
+            os.replace(temp_file.name, target)
+            # Keeps the `uploaded_at` of the file's chunks
+            os.utime(target, (row["modified_at"], row["modified_at"]))
+            restored += 1
+    return restored
+
+
+def export_snapshot(document_store, storage_path: Path, path: Path, include_files: bool = True, batch_size: int = 1000) -> Dict[str, Any]:
+    """Writes a snapshot of the store's chunks and of the files in `storage_path` to the directory `path`."""
+    pyarrow_import.check()
+    path.mkdir(parents=True, exist_ok=True)
+    embedding_dim = embedding_dimension()
+    schema = _chunks_schema(embedding_dim)
+
+    chunks = embedded = 0
+    with pq.ParquetWriter(path / CHUNKS_FILE, schema, compression="zstd") as writer:
+        for documents in iter_documents(document_store, batch_size):
+            writer.write_table(_chunks_table(documents, schema, embedding_dim))
+            chunks += len(documents)
+            embedded += sum(doc.embedding is not None for doc in documents)
+    files = _export_files(storage_path, path / FILES_FILE, include_files)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "storage_path": str(storage_path),
+        "embedding_dim": embedding_dim,
+        "chunks": chunks,
+        "embedded_chunks": embedded,
+        "files": files,
+        "file_contents": include_files,
+    }
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+def import_snapshot(document_store, storage_path: Path, path: Path, restore_files: bool = True, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Bulk loads the chunks of the snapshot in the directory `path` into the store, overwriting
+    chunks with the same ids, and restores its files into `storage_path`.
+    """
+    pyarrow_import.check()
+    manifest = json.loads((path / MANIFEST_FILE).read_text())
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')}, expected {SNAPSHOT_FORMAT}")
+    if manifest["embedding_dim"] != embedding_dimension():
+        raise ValueError(
+            f"The snapshot has {manifest['embedding_dim']}-dimensional embeddings, but the configured embedder's "
+            f"are {embedding_dimension()}-dimensional"
+        )
+    if document_store.count_documents() > 0:
+        logger.warning("Importing a snapshot into a non-empty index: chunks with the same ids are overwritten")
+
+    files = _import_files(storage_path, path / FILES_FILE) if restore_files and manifest["file_contents"] else 0
+    chunks = 0
+    with bulk_loading(document_store):
+        for batch in pq.ParquetFile(path / CHUNKS_FILE).iter_batches(batch_size=batch_size):
+            documents = _chunks_documents(batch, manifest["storage_path"], str(storage_path))
+            chunks += bulk_write_documents(document_store, documents)
+    return {"chunks": chunks, "files": files}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Exports or imports a snapshot of an index: its chunks with their embeddings, and its files."
+    )
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", type=Path, help="Snapshot directory")
+    parser.add_argument("--tenant", type=validate_tenant_id, help="Tenant of the index (default: the default tenant)")
+    parser.add_argument(
+        "--no-files", action="store_true",
+        help="Export: list the files without their contents. Import: don't restore the files"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks read or written at a time")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    document_store = initialize_document_store(args.tenant)
+    storage_path = tenant_storage_path(args.tenant)
+    start = time.perf_counter()
+    if args.command == "export":
+        summary = export_snapshot(document_store, storage_path, args.path, not args.no_files, args.batch_size)
+    else:
+        summary = import_snapshot(document_store, storage_path, args.path, not args.no_files, args.batch_size)
+    seconds = time.perf_counter() - start
+
+    logger.info(
+        f"{args.command.capitalize()}ed {summary['chunks']} chunks and {summary['files']} files in {seconds:.1f}s "
+        f"({summary['chunks'] / max(seconds, 1e-9):.0f} chunks/s)",
+        extra={"event": f"snapshot_{args.command}", "seconds": round(seconds, 3), **summary},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from haystack import component, default_from_dict, default_to_dict
+from haystack.core.serialization import component_from_dict, component_to_dict, import_class_by_name
+from haystack.components.embedders import OpenAITextEmbedder, SentenceTransformersTextEmbedder
+
+from common.cancellation import DISCONNECT_POLL_SECONDS, current_cancellation
+from common.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Collects items submitted concurrently from many threads and processes them in batches.
+
+    A dispatcher thread waits for the first item, then keeps collecting items until either
+    `max_batch_size` items are queued or `max_delay_ms` has elapsed. The batch is handed to
+    `batch_fn` and each result is fanned back out to the thread that submitted the item.
+    A submitter stops waiting when its search is cancelled; its item is dropped from the
+    batch if that has not started yet. Threads are started lazily on the first submission, so instances are safe to create
+    before a process forks.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_delay_ms: float = 5.0,
+        max_concurrent_batches: int = 4,
+        name: str = "micro_batch",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_concurrent_batches = max_concurrent_batches
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._executor = None
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Queues an item and blocks until its result is available. Within a cancellable search,
+        raises SearchCancelledError once the search is cancelled or its deadline passes;
+        otherwise raises TimeoutError after `timeout` seconds (default: the search timeout).
+        """
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        cancellation = current_cancellation()
+        if timeout is None:
+            timeout = settings.search_timeout_seconds or None
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                wait = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                if cancellation is not None:
+                    # Polled, as a disconnect isn't known in advance
+                    wait = DISCONNECT_POLL_SECONDS if wait is None else min(wait, DISCONNECT_POLL_SECONDS)
+                try:
+                    return future.result(timeout=wait)
+                except TimeoutError:
+                    if cancellation is not None:
+                        cancellation.check(self.name)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError(f"No result from {self.name} within {timeout:g}s") from None
+        except BaseException:
+            # Not processed at all, unless its batch already started
+            future.cancel()
+            raise
+
+    def _ensure_started(self):
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_batches, thread_name_prefix="micro-batch"
+                )
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="micro-batch-dispatcher", daemon=True
+                )
+                self._dispatcher.start()
+
+    def _collect_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[tuple]):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        logger.debug(f"Processing micro-batch of {len(items)} items")
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def batch_embed_fn(embedder) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Returns a function that embeds a list of texts in a single call to the embedder's backend,
+    applying the same prefix/suffix handling as the embedder's own `run` method.
+    """
+    if isinstance(embedder, OpenAITextEmbedder):
+        def embed_openai(texts: List[str]) -> List[List[float]]:
+            inputs = [(embedder.prefix + text + embedder.suffix).replace("\n", " ") for text in texts]
+            args: Dict[str, Any] = {"model": embedder.model, "input": inputs}
+            if embedder.dimensions is not None:
+                args["dimensions"] = embedder.dimensions
+            response = embedder.client.embeddings.create(**args)
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        return embed_openai
+
+    if isinstance(embedder, SentenceTransformersTextEmbedder):
+        def embed_sentence_transformers(texts: List[str]) -> List[List[float]]:
+            if embedder.embedding_backend is None:
+                raise RuntimeError("The embedding model has not been loaded. Please call warm_up() before running.")
+            return embedder.embedding_backend.embed(
+                [embedder.prefix + text + embedder.suffix for text in texts],
+                batch_size=embedder.batch_size,
+                show_progress_bar=False,
+                normalize_embeddings=embedder.normalize_embeddings,
+                precision=embedder.precision,
+            )
+        return embed_sentence_transformers
+
+    # Any other text embedder: fall back to one call per text
+    return lambda texts: [embedder.run(text=text)["embedding"] for text in texts]
+
+
+@component
+class BatchingTextEmbedder:
+    """
+    Drop-in replacement for a text embedder that coalesces concurrent queries into batched calls.
+
+    Every pipeline run still embeds a single query, but queries arriving from concurrent
+    requests within `max_delay_ms` of each other share one embedding call.
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_delay_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_delay_ms = max_delay_ms
+        self.batcher = MicroBatcher(
+            batch_embed_fn(embedder), max_batch_size=max_batch_size, max_delay_ms=max_delay_ms, name="query_embedder"
+        )
+
+    def warm_up(self):
+        if hasattr(self.embedder, "warm_up"):
+            self.embedder.warm_up()
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        if not isinstance(text, str):
+            raise TypeError("BatchingTextEmbedder expects a string as input.")
+        return {"embedding": self.batcher.submit(text)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            embedder=component_to_dict(self.embedder, "embedder"),
+            max_batch_size=self.max_batch_size,
+            max_delay_ms=self.max_delay_ms,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BatchingTextEmbedder":
+        embedder_data = data["init_parameters"]["embedder"]
+        embedder_class = import_class_by_name(embedder_data["type"])
+        data["init_parameters"]["embedder"] = component_from_dict(embedder_class, embedder_data, "embedder")
+        return default_from_dict(cls, data)
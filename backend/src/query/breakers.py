@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from haystack import component, default_from_dict, default_to_dict
+from haystack.core.component.types import _empty
+from haystack.core.serialization import component_from_dict, component_to_dict, import_class_by_name
+
+from common.config import settings
+from common.cancellation import SearchCancelledError, check_cancelled, is_cancelled
+
+
+logger = logging.getLogger(__name__)
+
+# Upstream dependencies of a search, each with its own breaker
+DEPENDENCIES = ("embedder", "document_store", "llm")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class DependencyUnavailableError(Exception):
+    """A dependency failed, or its breaker is open; `retry_after` is the time in seconds until it is tried again."""
+
+    def __init__(self, dependency: str, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Tracks the calls to a dependency and stops calling it while it is failing or too slow.
+
+    The breaker keeps the outcome and latency of the last `window` calls. Calls slower
+    than `slo_ms` count against the dependency like failures, although their result is
+    used. Once at least `min_calls` are recorded and the share of failed or slow calls
+    reaches `failure_rate`, the breaker opens: calls are rejected at once for
+    `open_seconds`. Then it is half open and lets a single probe call through, which
+    closes it if it succeeds within the SLO, or opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slo_ms: float,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.slo_ms = slo_ms
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._calls: deque = deque(maxlen=window)  # (ok, duration_ms)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0, "fallbacks": 0}
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a call through again."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self._opened_at + self.open_seconds - self.clock(), 0.0)
+
+    def available(self) -> bool:
+        """Whether a call would be let through now, without taking the half open breaker's probe."""
+        with self._lock:
+            if self.state == OPEN:
+                return self.retry_after() == 0
+            return not (self.state == HALF_OPEN and self._probing)
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and self.retry_after() == 0:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._counts["rejected"] += 1
+            return False
+
+    def _release(self):
+        # A call cut short by the search's cancellation says nothing about the dependency
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _record(self, ok: bool, duration_ms: float):
+        slow = ok and duration_ms > self.slo_ms
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["failures"] += not ok
+            self._counts["slow_calls"] += slow
+            self._calls.append((ok and not slow, duration_ms))
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if ok and not slow:
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            bad = sum(1 for good, _ in self._calls if not good)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls and bad / len(self._calls) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self._counts["opened"] += 1
+        logger.warning(
+            f"Circuit breaker '{self.name}' opened for {self.open_seconds:.0f} s",
+            extra={"event": "breaker_opened", "dependency": self.name},
+        )
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Calls fn through the breaker; raises DependencyUnavailableError if it is open or fn fails."""
+        if not self._acquire():
+            raise DependencyUnavailableError(
+                self.name, f"{self.name} unavailable (circuit open)", retry_after=self.retry_after()
+            )
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except SearchCancelledError:
+            self._release()
+            raise
+        except Exception as e:
+            if is_cancelled():
+                self._release()
+                check_cancelled(self.name)
+            self._record(False, (time.perf_counter() - start) * 1000)
+            raise DependencyUnavailableError(self.name, f"{self.name} failed: {e}") from e
+        self._record(True, (time.perf_counter() - start) * 1000)
+        return result
+
+    def record_fallback(self):
+        """Counts a search that went on without the dependency."""
+        with self._lock:
+            self._counts["fallbacks"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            durations = sorted(duration for _, duration in self._calls)
+            good = sum(1 for ok, _ in self._calls if ok)
+            return {
+                "state": self.state,
+                "retry_after_s": round(self.retry_after(), 1),
+                "slo_ms": self.slo_ms,
+                # Over the window: calls that succeeded within the SLO, and latency percentiles
+                "slo_attainment": round(good / len(self._calls), 3) if self._calls else None,
+                "p50_ms": round(durations[len(durations) // 2], 1) if durations else None,
+                "p95_ms": round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 1) if durations else None,
+                **self._counts,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Returns the breaker of a dependency, shared by every pipeline and tenant of the process."""
+    with _breakers_lock:
+        if dependency not in _breakers:
+            if dependency not in DEPENDENCIES:
+                raise ValueError(f"Invalid dependency '{dependency}', must be one of: {', '.join(DEPENDENCIES)}")
+            _breakers[dependency] = CircuitBreaker(
+                dependency,
+                slo_ms=getattr(settings, f"breaker_{dependency}_slo_ms"),
+                failure_rate=settings.breaker_failure_rate,
+                window=settings.breaker_window,
+                min_calls=settings.breaker_min_calls,
+                open_seconds=settings.breaker_open_seconds,
+            )
+        return _breakers[dependency]
+
+def breaker_stats() -> Dict[str, Any]:
+    return {dependency: get_breaker(dependency).stats() for dependency in DEPENDENCIES}
+
+
+@component
+class GuardedComponent:
+    """
+    Runs a pipeline component through the circuit breaker of the dependency it calls.
+
+    The wrapper has the same inputs and outputs as the wrapped component. A failure of the
+    component, or an open breaker, raises DependencyUnavailableError naming the dependency,
+    so that the caller can go on without it. Whether or not breakers are enabled, the
+    dependency isn't called for a cancelled search, and a call failing because the search
+    was cancelled meanwhile raises SearchCancelledError instead, without counting against it.
+    """
+
+    def __init__(self, wrapped, dependency: str):
+        self.wrapped = wrapped
+        self.dependency = dependency
+        self.breaker = get_breaker(dependency) if settings.breaker_enabled else None
+        for name, socket in wrapped.__haystack_input__._sockets_dict.items():
+            component.set_input_type(self, name, socket.type, _empty if socket.is_mandatory else socket.default_value)
+        component.set_output_types(
+            self, **{name: socket.type for name, socket in wrapped.__haystack_output__._sockets_dict.items()}
+        )
+
+    def warm_up(self):
+        if hasattr(self.wrapped, "warm_up"):
+            self.wrapped.warm_up()
+
+    def run(self, **kwargs):
+        check_cancelled(self.dependency)
+        if self.breaker is not None:
+            return self.breaker.call(self.wrapped.run, **kwargs)
+        try:
+            return self.wrapped.run(**kwargs)
+        except Exception:
+            # e.g. a call timing out at the search's deadline
+            check_cancelled(self.dependency)
+            raise
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(self, wrapped=component_to_dict(self.wrapped, "wrapped"), dependency=self.dependency)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GuardedComponent":
+        wrapped_data = data["init_parameters"]["wrapped"]
+        wrapped_class = import_class_by_name(wrapped_data["type"])
+        data["init_parameters"]["wrapped"] = component_from_dict(wrapped_class, wrapped_data, "wrapped")
+        return default_from_dict(cls, data)
+
+def guard(instance, dependency: str) -> GuardedComponent:
+    """Wraps a component calling a dependency, in its circuit breaker unless breakers are disabled."""
+    return GuardedComponent(instance, dependency)
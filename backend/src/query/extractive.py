@@ -0,0 +1,112 @@
+import math
+import re
+from typing import Any, Dict, List, Tuple
+
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack.dataclasses import ExtractedAnswer
+
+
+_WORD = re.compile(r"\w+")
+# A sentence and its trailing whitespace
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)\s*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it of on or that the this to was were what when where "
+    "which who why will with".split()
+)
+
+def content_terms(text: str) -> List[str]:
+    return [t for t in _WORD.findall(text.lower()) if t not in _STOPWORDS]
+
+def _sentences(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the sentences of text, without trailing whitespace."""
+    spans = []
+    for m in _SENTENCE.finditer(text):
+        start, end = m.start(), m.start() + len(m.group().rstrip())
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+@component
+class SpanExtractor:
+    """
+    Extracts the best matching span of the top documents, without a reader model.
+
+    Candidate spans are runs of consecutive sentences up to `max_span_chars` long. A span's
+    score is the share of the query's term weight it contains, terms weighted by their
+    inverse document frequency over the documents read, so rare query terms count most.
+    The best span of each of the first `documents_to_read` documents becomes an
+    ExtractedAnswer, with up to `context_chars` of surrounding text as context.
+    """
+
+    def __init__(self, top_k: int = 1, documents_to_read: int = 3, max_span_chars: int = 300, context_chars: int = 200):
+        self.top_k = top_k
+        self.documents_to_read = documents_to_read
+        self.max_span_chars = max_span_chars
+        self.context_chars = context_chars
+
+    def _best_span(self, text: str, weights: Dict[str, float]) -> Tuple[float, int, int]:
+        total = sum(weights.values())
+        sentences = _sentences(text)
+        sentence_terms = [set(content_terms(text[start:end])) & weights.keys() for start, end in sentences]
+        best = (0.0, 0, 0)
+        for i, (start, _) in enumerate(sentences):
+            matched = set()
+            for j in range(i, len(sentences)):
+                end = sentences[j][1]
+                if end - start > self.max_span_chars and j > i:
+                    break
+                matched |= sentence_terms[j]
+                score = sum(weights[t] for t in matched) / total
+                # Prefer the shortest span reaching a score
+                if score > best[0] or (score == best[0] and score > 0 and end - start < best[2] - best[1]):
+                    best = (score, start, end)
+        return best
+
+    @component.output_types(answers=List[ExtractedAnswer])
+    def run(self, query: str, documents: List[Document]):
+        documents = [doc for doc in documents[:self.documents_to_read] if doc.content]
+        query_terms = set(content_terms(query))
+        if not documents or not query_terms:
+            return {"answers": []}
+
+        doc_terms = [set(content_terms(doc.content)) for doc in documents]
+        weights = {
+            term: math.log(1 + len(documents) / (1 + sum(term in terms for terms in doc_terms))) + 1e-3
+            for term in query_terms
+        }
+
+        answers = []
+        for doc in documents:
+            score, start, end = self._best_span(doc.content, weights)
+            if score <= 0:
+                continue
+            context_start = max(0, start - self.context_chars)
+            context_end = min(len(doc.content), end + self.context_chars)
+            answers.append(ExtractedAnswer(
+                query=query,
+                score=score,
+                data=doc.content[start:end],
+                document=doc,
+                context=doc.content[context_start:context_end],
+                document_offset=ExtractedAnswer.Span(start, end),
+                context_offset=ExtractedAnswer.Span(start - context_start, end - context_start),
+            ))
+
+        # Stable: among equal scores, the better ranked document comes first
+        answers.sort(key=lambda answer: answer.score, reverse=True)
+        return {"answers": answers[:self.top_k]}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            top_k=self.top_k,
+            documents_to_read=self.documents_to_read,
+            max_span_chars=self.max_span_chars,
+            context_chars=self.context_chars,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpanExtractor":
+        return default_from_dict(cls, data)
@@ -0,0 +1,38 @@
+# Gunicorn configuration for running the query service with multiple workers:
+#
+#   gunicorn -c python:query.gunicorn_conf query.main:app
+#
+# The app is imported once in the master process (preload_app) so pipelines and
+# models are loaded before forking and shared copy-on-write between workers.
+# Each worker otherwise keeps its own state (caches, connection pools, batchers); only
+# the 'file' rate limit and session backends are shared, through sqlite files.
+
+from common.config import settings
+from query.workers import worker_count
+
+
+bind = f"0.0.0.0:{settings.query_port}"
+workers = worker_count()
+worker_class = "query.workers.QueryWorker"
+preload_app = True
+
+# On SIGTERM workers stop accepting requests and get this long to finish in-flight ones
+graceful_timeout = settings.query_graceful_timeout
+# Slow LLM calls shouldn't get a worker killed as unresponsive
+timeout = settings.query_graceful_timeout + 30
+keepalive = 5
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (if any) must not be shared between processes
+    from query import main
+    if hasattr(main.document_store, "reset_connections"):
+        main.document_store.reset_connections()
+
+
+def on_starting(server):
+    if settings.session_backend == "memory" and workers > 1:
+        server.log.warning(
+            f"SESSION_BACKEND=memory with {workers} workers: each worker has its own sessions, so follow-up "
+            "questions landing on another worker start over. Use SESSION_BACKEND=file or QUERY_WORKERS=1"
+        )
@@ -4,33 +4,68 @@ import sys
 from contextlib import asynccontextmanager
 import json
 import logging
+import math
+import time
 from typing import List
 
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.middleware import Middleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 from common.api_utils import create_api
+from common.cancellation import DISCONNECT, SearchCancelledError, cancellation_stats, run_cancellable
 from common.models import SearchQuery, QueryResultsResponse
-from common.document_store import initialize_document_store
+from common.document_store import initialize_document_store, tenant_document_store
 from common.config import settings
+from common.logs import configure_logging
+from common.metrics import register_metrics
+from common.tenants import TenantCache, get_tenant, is_default_tenant
 from query.service import QueryService
-from query.serializer import serialize_query_result
+from query.sessions import FileSessionStore, SessionStore
+from query.breakers import DependencyUnavailableError, breaker_stats
+from query.serializer import extractive_result_dict, query_result_dict, retrieval_result_dict
+from query.ratelimit import FileBucketStore, Lane, MemoryBucketStore, RateLimiter, RateLimitMiddleware, llm_tokens_used
 
 
-logging.basicConfig(
-    format="%(levelname)s - %(name)s - [%(process)d] - %(message)s",
-    level=settings.log_level
-)
+configure_logging()
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
-# Set Haystack logger to INFO level
-logging.getLogger("haystack").setLevel(settings.haystack_log_level)
-
 # Create a single instance of QueryService
 document_store = initialize_document_store()
+if hasattr(document_store, "pool_stats"):
+    register_metrics("opensearch", document_store.pool_stats)
 query_service = QueryService(document_store)
+# Load models at import time so a preloading multi-worker server shares them between workers
+query_service.warm_up()
+
+# Other tenants get their own pipeline and caches, searching only their index, on first use;
+# the embedding and reranking models are shared
+tenant_services = TenantCache(
+    lambda tenant: QueryService(tenant_document_store(document_store, tenant), tenant=tenant, models_from=query_service),
+    max_tenants=settings.max_cached_tenants
+)
+register_metrics("tenants", tenant_services.stats)
+if settings.breaker_enabled:
+    register_metrics("breakers", breaker_stats)
+
+def create_session_store():
+    # Conversations of the follow-up questions with a session id; a session's questions may
+    # go to any worker, so several workers need the shared file store
+    params = dict(
+        max_sessions=settings.session_max_sessions,
+        ttl_seconds=settings.session_ttl_seconds,
+        max_turns=settings.session_max_turns
+    )
+    if settings.session_backend == "file":
+        return FileSessionStore(settings.session_state_path, **params)
+    return SessionStore(**params)
+
+session_store = create_session_store()
+register_metrics("sessions", session_store.stats)
+register_metrics("cancellations", cancellation_stats)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -41,17 +76,51 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down")
     # Add any cleanup code here if needed
 
-app = create_api(title="RAG Query Service", lifespan=lifespan)
-
-def get_query_service():
-    if query_service.pipeline is None:
+def create_rate_limiter() -> RateLimiter:
+    if settings.rate_limit_backend == "file":
+        store = FileBucketStore(settings.rate_limit_state_path)
+    else:
+        store = MemoryBucketStore()
+    return RateLimiter(
+        store,
+        interactive=Lane("interactive", settings.rate_limit_requests_per_minute, settings.rate_limit_burst),
+        batch=Lane(
+            "batch",
+            settings.rate_limit_batch_requests_per_minute,
+            settings.rate_limit_batch_burst,
+            max_concurrency=settings.rate_limit_batch_concurrency
+        ),
+        llm_tokens_per_minute=settings.rate_limit_llm_tokens_per_minute,
+        trust_proxy=settings.rate_limit_trust_proxy,
+        api_key_hashes=settings.rate_limit_api_key_hashes
+    )
+
+middleware = []
+if settings.rate_limit_enabled:
+    rate_limiter = create_rate_limiter()
+    register_metrics("rate_limits", rate_limiter.stats)
+    middleware.append(Middleware(RateLimitMiddleware, limiter=rate_limiter, paths=["/search"]))
+
+app = create_api(title="RAG Query Service", lifespan=lifespan, middleware=middleware)
+
+def get_query_service(tenant: str = Depends(get_tenant)):
+    service = query_service if is_default_tenant(tenant) else tenant_services.get(tenant)
+    if service.pipeline is None:
         raise HTTPException(status_code=500, detail="QueryService not initialized")
-    return query_service
+    return service
+
+async def call_session_store(fn, *args):
+    # The file store may wait for other workers' writes: it must not stall the event loop
+    if session_store.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
 
 @app.post("/search", response_model=QueryResultsResponse)
 async def search(
     query: SearchQuery,
-    service: QueryService = Depends(get_query_service)
+    request: Request,
+    service: QueryService = Depends(get_query_service),
+    tenant: str = Depends(get_tenant)
 ) -> QueryResultsResponse:
     """
     Perform a search based on the provided query and filters.
@@ -68,23 +137,99 @@ async def search(
 
     Description:
     This endpoint accepts a POST request with a SearchQuery object and returns search results.
-    It uses the QueryService to perform the search based on the provided query and filters.
+    It uses the QueryService to perform the search based on the provided query and filters,
+    over the documents of the tenant named in the X-Tenant-ID header (the default tenant if absent).
     If successful, it returns a SearchResponse with the results. If an error occurs, it logs
     the error and raises an HTTPException with a 500 status code.
+    With `include_content` false, documents are returned without their content.
+    `mode` "retrieve" returns the ranked documents without answers, and "extractive" the best
+    matching span of the top documents as the answer; neither calls the LLM.
+    With a `session_id`, a generative search follows up on the previous questions of the session.
+    A search is cancelled if the client disconnects, or after SEARCH_TIMEOUT_SECONDS with a 504:
+    it stops before its next stage (embedding, retrieval, generation), its OpenSearch and
+    OpenAI calls time out at the deadline, and a streamed answer stops being generated.
+    While the embedder or the LLM is unavailable, searches go on without it, listing it in
+    `degraded`; while the document store is, they fail at once with a 503.
     """
-    logger.info(f"Received search query: {query.query}")
+    start = time.perf_counter()
+    log_extra = {}
 
     try:
-        answer = service.search(query.query, query.filters)
-        response = serialize_query_result(query.query, answer)
-
-        logger.info(f"QueryResultsResponse:\n{response}")
-
-        return response
+        # Run the blocking pipeline in a worker thread so concurrent searches overlap
+        # (and their query embeddings can be batched together)
+        # Encoded straight from dicts, without building and validating the response models
+        if query.mode == "retrieve":
+            documents, degraded = await run_cancellable(request, settings.search_timeout_seconds, service.retrieve, query.query, query.filters)
+            content = retrieval_result_dict(
+                query.query, documents, include_content=query.include_content, degraded=degraded
+            )
+        elif query.mode == "extractive":
+            answers, documents, degraded = await run_cancellable(request, settings.search_timeout_seconds, service.extract, query.query, query.filters)
+            content = extractive_result_dict(
+                query.query, answers, documents, include_content=query.include_content, degraded=degraded
+            )
+        else:
+            if query.session_id is not None:
+                session = await call_session_store(session_store.get, tenant, query.session_id)
+                answer = await run_cancellable(request, settings.search_timeout_seconds, service.search_in_session, query.query, query.filters, session)
+                await call_session_store(session_store.record, tenant, query.session_id, query.query, answer, query.filters)
+            else:
+                answer = await run_cancellable(request, settings.search_timeout_seconds, service.search, query.query, query.filters)
+            documents = answer.documents
+            degraded = answer.meta.get("degraded", [])
+            # Charged to the client's LLM token budget by the rate limiter
+            if "llm" not in degraded:
+                request.state.llm_tokens = llm_tokens_used(answer)
+            content = query_result_dict(query.query, answer, include_content=query.include_content)
+            if query.session_id is not None:
+                content["session_id"] = query.session_id
+                log_extra = {"session_id": query.session_id, "reused_documents": answer.meta["reused_documents"]}
+
+        logger.info(
+            f"Search {content['query_id']} returned {len(documents)} documents",
+            extra={
+                "event": "search",
+                "query_id": content["query_id"],
+                "tenant": tenant,
+                "mode": query.mode,
+                "query": query.query,
+                "documents": len(documents),
+                "degraded": degraded,
+                **log_extra,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "sample": True,
+            }
+        )
+        if settings.log_payloads:
+            logger.debug("Search response", extra={"response": content})
+
+        return ORJSONResponse(content)
+    except SearchCancelledError as e:
+        logger.info(
+            str(e),
+            extra={
+                "event": "search_cancelled",
+                "tenant": tenant,
+                "mode": query.mode,
+                "reason": e.reason,
+                "stage": e.stage,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+        )
+        if e.reason == DISCONNECT:
+            # Nobody reads the response: 499 is nginx's code for a request closed by the client
+            return Response(status_code=499)
+        raise HTTPException(status_code=504, detail=str(e))
+    except DependencyUnavailableError as e:
+        # No search is possible without the document store: fail fast rather than pile up requests
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    uvicorn.run(app, host="0.0.0.0", port=settings.query_port)
@@ -0,0 +1,165 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack.core.serialization import component_from_dict, component_to_dict, import_class_by_name
+
+
+logger = logging.getLogger(__name__)
+
+class ScoreCache:
+    """Thread-safe LRU cache of (query, document id) -> relevance score."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._scores: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[str, str], score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+
+    def __len__(self):
+        return len(self._scores)
+
+
+@component
+class BudgetedRanker:
+    """
+    Reranks retrieved documents with a cross-encoder, within a latency budget.
+
+    Scores are cached per (query, document id), so only documents not seen for the query
+    are sent to the model, in a single batched call. If scoring takes longer than
+    `latency_budget_ms`, the documents are returned in their incoming (fused) order
+    instead; scoring that already started keeps running in the background and still
+    fills the cache, while scoring still waiting for the model is dropped.
+
+    At most `max_pending` scorings are running or waiting for the model at once: when
+    that many are, searches use the fused order right away instead of queueing.
+    """
+
+    def __init__(
+        self,
+        ranker,
+        top_k: int = 5,
+        latency_budget_ms: float = 300.0,
+        cache_size: int = 10000,
+        max_pending: int = 2,
+    ):
+        self.ranker = ranker
+        self.top_k = top_k
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self.max_pending = max_pending
+        self.cache = ScoreCache(cache_size)
+        # A single scoring thread: the cross-encoder already batches and uses all cores
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def warm_up(self):
+        if hasattr(self.ranker, "warm_up"):
+            self.ranker.warm_up()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ranker")
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _score(self, query: str, documents: List[Document], deadline: float) -> Optional[Dict[str, float]]:
+        if time.monotonic() >= deadline:
+            # The caller fell back to the fused order while this waited for the model
+            return None
+        # The ranker sets scores in place: work on copies, the caller may already have
+        # fallen back to the originals
+        ranked = self.ranker.run(
+            query=query, documents=[copy.copy(doc) for doc in documents], top_k=len(documents)
+        )["documents"]
+        scores = {doc.id: doc.score for doc in ranked}
+        for doc_id, score in scores.items():
+            self.cache.put((query, doc_id), score)
+        return scores
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, documents: List[Document], top_k: Optional[int] = None):
+        top_k = top_k or self.top_k
+        if not documents:
+            return {"documents": []}
+
+        scores = {}
+        to_score = []
+        for doc in documents:
+            score = self.cache.get((query, doc.id))
+            if score is None:
+                to_score.append(doc)
+            else:
+                scores[doc.id] = score
+
+        if to_score:
+            with self._lock:
+                saturated = self._pending >= self.max_pending
+                if not saturated:
+                    self._pending += 1
+            if saturated:
+                logger.warning(f"Reranker busy with {self.max_pending} scorings, using fused ranking")
+                return {"documents": documents[:top_k]}
+
+            budget = self.latency_budget_ms / 1000.0
+            future = self._get_executor().submit(self._score, query, to_score, time.monotonic() + budget)
+            future.add_done_callback(self._release)
+            try:
+                scores.update(future.result(timeout=budget) or {})
+            except TimeoutError:
+                # Dropped if it is still waiting for the model
+                future.cancel()
+                logger.warning(
+                    f"Reranking {len(to_score)} documents exceeded {self.latency_budget_ms:.0f} ms, "
+                    "using fused ranking"
+                )
+                return {"documents": documents[:top_k]}
+
+        ranked = sorted(documents, key=lambda doc: scores.get(doc.id, float("-inf")), reverse=True)
+        result = []
+        for doc in ranked[:top_k]:
+            doc = copy.copy(doc)
+            doc.score = scores.get(doc.id)
+            result.append(doc)
+        return {"documents": result}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            ranker=component_to_dict(self.ranker, "ranker"),
+            top_k=self.top_k,
+            latency_budget_ms=self.latency_budget_ms,
+            cache_size=self.cache_size,
+            max_pending=self.max_pending,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BudgetedRanker":
+        ranker_data = data["init_parameters"]["ranker"]
+        ranker_class = import_class_by_name(ranker_data["type"])
+        data["init_parameters"]["ranker"] = component_from_dict(ranker_class, ranker_data, "ranker")
+        return default_from_dict(cls, data)
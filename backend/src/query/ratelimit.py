@@ -0,0 +1,332 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import orjson
+from haystack.dataclasses import GeneratedAnswer
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from common.api_utils import API_KEY_HEADER, PRIORITY_HEADER
+
+
+logger = logging.getLogger(__name__)
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(now - updated, 0.0) * rate)
+
+def _take(tokens: float, capacity: float, rate: float, cost: float, require: float) -> Tuple[float, float]:
+    """Returns (tokens left, seconds to wait): nothing is taken when fewer than `require` tokens are left."""
+    if tokens >= require:
+        return tokens - cost, 0.0
+    if rate <= 0:
+        return tokens, math.inf
+    return tokens, (min(require, capacity) - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets in the memory of the process: each worker limits its own share of the traffic."""
+
+    # Consuming doesn't block: the middleware calls it on the event loop
+    blocking = False
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, max_buckets: int = 100_000):
+        self.clock = clock
+        self.max_buckets = max_buckets
+        # Tokens, last update, capacity and rate of each bucket
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0, require: Optional[float] = None) -> float:
+        """
+        Refills the bucket at `rate` tokens per second up to `capacity`, then takes `cost` tokens
+        if at least `require` (by default `cost`) are left. Returns 0 if they were taken, else the
+        seconds until they would be. A `require` of 0 always takes, possibly into debt.
+        """
+        require = cost if require is None else require
+        with self._lock:
+            now = self.clock()
+            tokens, updated, _, _ = self._buckets.get(key, (capacity, now, capacity, rate))
+            tokens, wait = _take(_refill(tokens, updated, now, capacity, rate), capacity, rate, cost, require)
+            self._buckets[key] = (tokens, now, capacity, rate)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now: float):
+        # Buckets that refilled completely, each at its own lane's rate, hold no state worth keeping
+        for key, (tokens, updated, capacity, rate) in list(self._buckets.items()):
+            if _refill(tokens, updated, now, capacity, rate) >= capacity:
+                del self._buckets[key]
+
+
+class FileBucketStore:
+    """
+    Token buckets in a local sqlite file, shared by all worker processes of a host so that
+    limits apply to the service as a whole.
+    """
+
+    # Consuming may wait for other processes' writes: the middleware calls it in a worker thread
+    blocking = True
+
+    def __init__(self, path: Path, clock: Callable[[], float] = time.time):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection opened before the server forked its workers isn't shared with them
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0, require: Optional[float] = None) -> float:
+        require = cost if require is None else require
+        with self._lock:
+            self._connection()
+            # Locks the database for writing, so the read-modify-write is atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens, wait = _take(_refill(tokens, updated, now, capacity, rate), capacity, rate, cost, require)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+
+@dataclass
+class Lane:
+    """A priority lane: its per-client request rate and, optionally, how many of its requests run at once."""
+    name: str
+    requests_per_minute: float
+    burst: int
+    max_concurrency: Optional[int] = None
+    queue_timeout: float = 10.0
+
+
+class RateLimiter:
+    """
+    Per-client limits for the query service.
+
+    Clients are identified by their API key (X-API-Key header), if it is one of the keys
+    whose SHA-256 digests are in `api_key_hashes`, or else by their IP address: unknown keys
+    can't open buckets of their own.
+    Each client has a token bucket of requests per lane, and a budget of LLM tokens per
+    minute shared by its lanes: a search using the LLM is admitted while the budget is
+    positive, and the tokens it used are charged once it completes.
+
+    Requests choose the batch lane with an `X-Priority: batch` header. Batch requests get
+    their own rate and at most `max_concurrency` of them run at once per worker, so that
+    bulk jobs can't take the capacity reserved for interactive searches.
+    """
+
+    def __init__(
+        self,
+        store,
+        interactive: Lane,
+        batch: Lane,
+        llm_tokens_per_minute: float = 0,
+        trust_proxy: bool = False,
+        api_key_hashes: Sequence[str] = (),
+    ):
+        self.store = store
+        self.lanes = {interactive.name: interactive, batch.name: batch}
+        self.interactive = interactive
+        self.llm_tokens_per_minute = llm_tokens_per_minute
+        self.trust_proxy = trust_proxy
+        self.api_key_hashes = frozenset(digest.lower() for digest in api_key_hashes)
+        self._stats_lock = threading.Lock()
+        self._stats = {name: {"admitted": 0, "rate_limited": 0, "over_budget": 0, "queue_timeouts": 0} for name in self.lanes}
+        self._llm_tokens_charged = 0
+
+    def client_id(self, headers: Headers, client: Optional[Tuple[str, int]]) -> str:
+        api_key = headers.get(API_KEY_HEADER)
+        if api_key:
+            digest = hashlib.sha256(api_key.encode()).hexdigest()
+            # Keys are not kept, even in the shared state file
+            if digest in self.api_key_hashes:
+                return "key:" + digest[:16]
+        if self.trust_proxy:
+            # Behind the nginx proxy, the client address is passed in X-Real-IP; of X-Forwarded-For,
+            # only the hop the proxy appended is trusted, the others are sent by the client
+            forwarded = headers.get("x-real-ip") or headers.get("x-forwarded-for", "").split(",")[-1].strip()
+            if forwarded:
+                return "ip:" + forwarded
+        return "ip:" + (client[0] if client else "unknown")
+
+    def lane(self, headers: Headers) -> Lane:
+        return self.lanes.get(headers.get(PRIORITY_HEADER, "").lower(), self.interactive)
+
+    def admit(self, client: str, lane: Lane, uses_llm: bool = True) -> Tuple[float, Optional[str]]:
+        """
+        Returns (0, None) if the request may run, else (seconds to wait, reason). Requests
+        that don't use the LLM aren't held back by the LLM token budget.
+        """
+        wait = self.store.consume(
+            f"{lane.name}:{client}", capacity=lane.burst, rate=lane.requests_per_minute / 60
+        )
+        if wait > 0:
+            self.record(lane, "rate_limited")
+            return wait, "Rate limit exceeded"
+        if uses_llm and self.llm_tokens_per_minute > 0:
+            # Checks the budget is positive without taking from it
+            wait = self.store.consume(
+                f"llm:{client}", capacity=self.llm_tokens_per_minute, rate=self.llm_tokens_per_minute / 60,
+                cost=0, require=1
+            )
+            if wait > 0:
+                self.record(lane, "over_budget")
+                return wait, "LLM token budget exceeded"
+        self.record(lane, "admitted")
+        return 0.0, None
+
+    def charge(self, client: str, llm_tokens: int):
+        if self.llm_tokens_per_minute > 0 and llm_tokens > 0:
+            self.store.consume(
+                f"llm:{client}", capacity=self.llm_tokens_per_minute, rate=self.llm_tokens_per_minute / 60,
+                cost=llm_tokens, require=0
+            )
+            with self._stats_lock:
+                self._llm_tokens_charged += llm_tokens
+
+    def record(self, lane: Lane, outcome: str):
+        with self._stats_lock:
+            self._stats[lane.name][outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"lanes": {name: dict(counts) for name, counts in self._stats.items()},
+                    "llm_tokens_charged": self._llm_tokens_charged}
+
+
+def llm_tokens_used(answer: GeneratedAnswer) -> int:
+    """Tokens used to generate an answer, as reported by the LLM, else estimated at 4 characters per token."""
+    usage = answer.meta.get("usage") if answer.meta else None
+    if isinstance(usage, dict) and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    characters = len(answer.query or "") + len(answer.data or "")
+    characters += sum(len(doc.content or "") for doc in answer.documents)
+    return characters // 4
+
+
+# Search modes answering without the LLM
+NON_LLM_MODES = ("extractive", "retrieve")
+
+def _uses_llm(body: bytes) -> bool:
+    """Whether a search request may use the LLM; requests that can't be parsed are assumed to."""
+    try:
+        mode = orjson.loads(body).get("mode")
+    except (orjson.JSONDecodeError, AttributeError):
+        return True
+    return mode not in NON_LLM_MODES
+
+async def _buffer_body(receive) -> Tuple[bytes, Callable]:
+    """Reads the request body; returns it and a `receive` that replays it, then receives as usual."""
+    chunks, message = [], {"more_body": True}
+    while message.get("more_body", False):
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+    body = b"".join(chunks)
+    pending = [{"type": "http.request", "body": body, "more_body": False} if message["type"] == "http.request" else message]
+
+    async def replay():
+        # Later calls, e.g. to detect a disconnect, go to the server
+        return pending.pop() if pending else await receive()
+
+    return body, replay
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying a RateLimiter to the given paths.
+
+    Rejected requests get a 429 with a Retry-After header, and batch requests that waited
+    `queue_timeout` for a free slot of their lane a 503. Endpoints report the LLM tokens a
+    request used in `request.state.llm_tokens`, which are charged to the client's budget.
+    The request body is read first, to exempt searches in a `mode` without the LLM from
+    the budget, and is passed on to the endpoint unchanged.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, paths: Sequence[str] = ("/search",)):
+        self.app = app
+        self.limiter = limiter
+        self.paths = set(paths)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {
+            lane.name: asyncio.Semaphore(lane.max_concurrency) for lane in limiter.lanes.values() if lane.max_concurrency
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        client = self.limiter.client_id(headers, scope.get("client"))
+        lane = self.limiter.lane(headers)
+        body, receive = await _buffer_body(receive)
+        wait, reason = await self._call(self.limiter.admit, client, lane, _uses_llm(body))
+        if reason is not None:
+            await self._reject(send, 429, reason, wait)
+            return
+
+        semaphore = self._semaphores.get(lane.name)
+        if semaphore is not None:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=lane.queue_timeout)
+            except asyncio.TimeoutError:
+                self.limiter.record(lane, "queue_timeouts")
+                await self._reject(send, 503, f"Too many concurrent {lane.name} requests", 1.0)
+                return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+            await self._call(self.limiter.charge, client, scope.get("state", {}).get("llm_tokens", 0))
+
+    async def _call(self, fn, *args):
+        # Stores that may block (sqlite's busy timeout) must not stall the event loop
+        if getattr(self.limiter.store, "blocking", False):
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float):
+        body = orjson.dumps({"detail": detail})
+        retry_after = "3600" if math.isinf(retry_after) else str(max(1, math.ceil(retry_after)))
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,54 +1,89 @@
 import os
 import uuid
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from haystack.dataclasses import GeneratedAnswer, Document
-from common.models import (
-    QueryResultsResponse,
-    ResultModel,
-    AnswerModel,
-    DocumentModel,
-    FileModel
-)
+from haystack.dataclasses import Document, ExtractedAnswer, GeneratedAnswer
+from common.models import QueryResultsResponse
 
 
-def serialize_query_result(query: str, answer: GeneratedAnswer) -> QueryResultsResponse:
+# Search responses are built as plain dicts and encoded directly: building the nested
+# Pydantic models per document, then validating them again as the response model,
+# costs more than the encoding itself. The shape matches QueryResultsResponse.
+
+def _result_dict(
+    query: str, answers: List[Dict[str, Any]], documents: List[Document], include_content: bool, degraded: List[str]
+):
     query_id = uuid.uuid4().hex[:8]
-    
-    result = ResultModel(
-        query_id=query_id,
-        query=query,
-        answers=[serialize_answer(answer)],
-        documents=[serialize_document(doc) for doc in answer.documents]
-    )
 
-    return QueryResultsResponse(query_id=query_id, results=[result])
+    result = {
+        "query_id": query_id,
+        "query": query,
+        "answers": answers,
+        "documents": [serialize_document(doc, include_content) for doc in documents],
+    }
+
+    return {"query_id": query_id, "results": [result], "degraded": degraded}
 
-def serialize_answer(answer: GeneratedAnswer) -> AnswerModel:
-    return AnswerModel(
-        answer=answer.data,
-        type="generative",
-        document_ids=[doc.id for doc in answer.documents],
-        meta={"_references": []},
-        file=serialize_file(answer.documents[0] if answer.documents else None)
+def query_result_dict(query: str, answer: GeneratedAnswer, include_content: bool = True) -> Dict[str, Any]:
+    degraded = answer.meta.get("degraded", [])
+    # Without the LLM, there is no answer: only the retrieved documents
+    answers = [serialize_answer(answer)] if answer.data is not None or "llm" not in degraded else []
+    return _result_dict(query, answers, answer.documents, include_content, degraded)
+
+def extractive_result_dict(
+    query: str,
+    answers: List[ExtractedAnswer],
+    documents: List[Document],
+    include_content: bool = True,
+    degraded: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    return _result_dict(
+        query, [serialize_extracted_answer(answer) for answer in answers], documents, include_content, degraded or []
     )
 
-def serialize_document(doc: Document) -> DocumentModel:
-    return DocumentModel(
-        id=str(doc.id),
-        content=doc.content,
-        content_type="text",
-        meta={
+def retrieval_result_dict(
+    query: str, documents: List[Document], include_content: bool = True, degraded: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    return _result_dict(query, [], documents, include_content, degraded or [])
+
+def serialize_query_result(query: str, answer: GeneratedAnswer, include_content: bool = True) -> QueryResultsResponse:
+    return QueryResultsResponse.model_validate(query_result_dict(query, answer, include_content))
+
+def serialize_answer(answer: GeneratedAnswer) -> Dict[str, Any]:
+    return {
+        "answer": answer.data,
+        "type": "generative",
+        "document_ids": [doc.id for doc in answer.documents],
+        "meta": {"_references": []},
+        "file": serialize_file(answer.documents[0] if answer.documents else None),
+    }
+
+def serialize_extracted_answer(answer: ExtractedAnswer) -> Dict[str, Any]:
+    return {
+        "answer": answer.data or "",
+        "type": "extractive",
+        "document_ids": [answer.document.id] if answer.document else [],
+        "meta": {"_references": []},
+        "file": serialize_file(answer.document),
+        "score": answer.score,
+        "context": answer.context,
+        "offsets_in_context": [answer.context_offset.start, answer.context_offset.end] if answer.context_offset else None,
+        "offsets_in_document": [answer.document_offset.start, answer.document_offset.end] if answer.document_offset else None,
+    }
+
+def serialize_document(doc: Document, include_content: bool = True) -> Dict[str, Any]:
+    return {
+        "id": str(doc.id),
+        "content": doc.content if include_content else None,
+        "content_type": "text",
+        "meta": {
             "file_name": doc.meta.get("file_name") or os.path.basename(doc.meta.get("file_path", "")),
             "split_idx_start": doc.meta.get("split_idx_start"),
         },
-        score=doc.score
-    )
+        "score": doc.score,
+    }
 
-def serialize_file(doc: Document | None) -> FileModel:
+def serialize_file(doc: Document | None) -> Dict[str, str]:
     if not doc:
-        return FileModel(id="", name="")
-    return FileModel(
-        id="",
-        name=os.path.basename(doc.meta.get("file_path", ""))
-    )
+        return {"id": "", "name": ""}
+    return {"id": "", "name": os.path.basename(doc.meta.get("file_path", ""))}
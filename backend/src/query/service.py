@@ -1,33 +1,59 @@
 from pathlib import Path
 import sys
 
+from contextlib import contextmanager
 from dataclasses import dataclass
 import logging
-from typing import Optional
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
-from haystack import Pipeline
+from haystack import Document, Pipeline
+from haystack.dataclasses import ExtractedAnswer, GeneratedAnswer
 from haystack.components.embedders import SentenceTransformersTextEmbedder
 from haystack.components.embedders import OpenAITextEmbedder
 from haystack.components.joiners import DocumentJoiner
 from haystack.components.builders import PromptBuilder
 from haystack.components.generators.openai import OpenAIGenerator
 from haystack.components.builders.answer_builder import AnswerBuilder
-from haystack_integrations.components.retrievers.opensearch import OpenSearchBM25Retriever, OpenSearchEmbeddingRetriever
+from haystack.components.rankers import TransformersSimilarityRanker
 from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
 
+from common.cancellation import count_streamed_chunk
 from common.config import settings
-from common.pipeline_loader import load_pipeline
+from common.document_store import create_retrievers
+from common.pipeline_loader import PipelineReloader, load_pipeline
+from common.tenants import is_default_tenant
+from common.llm_client import use_shared_client
 from query.serializer import serialize_query_result
+from query.batching import BatchingTextEmbedder
+from query.ranker import BudgetedRanker
+from query.extractive import SpanExtractor
+from query.breakers import DependencyUnavailableError, get_breaker, guard
+from query.sessions import Session, condense_history, embedding_similarity, query_coverage
 
 
 logger = logging.getLogger(__name__)
 
+# Search modes, from the full RAG pipeline to retrieval only
+MODES = ("generative", "extractive", "retrieve")
+
 @dataclass
 class QueryConfig:
     document_store: OpenSearchDocumentStore
+    tenant: Optional[str] = None
     pipeline_filename: str = "query.yml"
     embedder_model: str = "intfloat/multilingual-e5-base"
     llm_name: str = "gpt-4o"
+    embedding_batch_max_size: int = settings.embedding_batch_max_size
+    embedding_batch_max_delay_ms: float = settings.embedding_batch_max_delay_ms
+    retriever_top_k: int = settings.retriever_top_k
+    reranker_enabled: bool = settings.reranker_enabled
+    reranker_model: str = settings.reranker_model
+    reranker_top_k: int = settings.reranker_top_k
+    reranker_latency_budget_ms: float = settings.reranker_latency_budget_ms
+    # Models shared by the pipelines of all tenants; created by the first pipeline if None
+    text_embedder: Optional[Any] = None
+    similarity_ranker: Optional[Any] = None
     prompt_template: str = """
     Given the following context, answer the question.
     Context:
@@ -37,36 +63,138 @@ class QueryConfig:
     Question: {{query}}
     Answer:
     """
+    # Prompt of follow-up questions, with the previous turns of the conversation
+    conversation_template: str = """
+    Given the following context and conversation, answer the last question.
+    Context:
+    {% for document in documents %}
+        {{ document.content }}
+    {% endfor %}
+    Conversation:
+    {% for turn in history %}
+        Question: {{ turn.query }}
+        Answer: {{ turn.answer }}
+    {% endfor %}
+    Question: {{query}}
+    Answer:
+    """
 
-def create_query_pipeline(config: QueryConfig) -> Pipeline:
+def create_text_embedder(config: QueryConfig):
+    if settings.use_openai_embedder:
+        return use_shared_client(OpenAITextEmbedder(
+            api_base_url=settings.openai_base_url,
+            timeout=settings.openai_timeout,
+            max_retries=settings.openai_max_retries
+        ))
+    return SentenceTransformersTextEmbedder(model=config.embedder_model)
+
+def create_generator(config: QueryConfig):
+    if settings.generator != "openai":
+        raise ValueError(f"Invalid generator: {settings.generator}")
+    streaming = {}
+    if settings.llm_streaming:
+        # Streamed, the generation stops when a cancelled search stops reading it;
+        # the token usage is then reported in the last chunk
+        streaming = {
+            "streaming_callback": count_streamed_chunk,
+            "generation_kwargs": {"stream_options": {"include_usage": True}},
+        }
+    return use_shared_client(OpenAIGenerator(
+        model=config.llm_name,
+        api_base_url=settings.openai_base_url,
+        timeout=settings.openai_timeout,
+        max_retries=settings.openai_max_retries,
+        **streaming
+    ))
+
+def create_query_pipeline(config: QueryConfig, mode: str = "generative", bm25_only: bool = False) -> Pipeline:
+    """
+    Builds the query pipeline of a search mode: "generative" answers with the LLM,
+    "extractive" extracts the best matching span of the top documents and "retrieve"
+    stops at the ranked documents. The last two don't include the prompt builder and LLM.
+    With `bm25_only`, the pipeline retrieves by keywords only, without the query embedder.
+
+    The components calling the embedder, the document store and the LLM run through
+    their dependency's circuit breaker.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid search mode '{mode}', must be one of: {', '.join(MODES)}")
     p = Pipeline()
 
-    if settings.use_openai_embedder:
-        p.add_component(
-            instance=OpenAITextEmbedder(),
-            name="query_embedder"
-        )
-    else:
+    bm25_retriever, embedding_retriever = create_retrievers(config.document_store, top_k=config.retriever_top_k)
+
+    if not bm25_only:
+        # Coalesce query embeddings from concurrent requests into batched calls
+        if config.embedding_batch_max_size > 1:
+            # The wrapped embedder is not a pipeline component itself, so pipelines can share it
+            if config.text_embedder is None:
+                config.text_embedder = create_text_embedder(config)
+            query_embedder = BatchingTextEmbedder(
+                embedder=config.text_embedder,
+                max_batch_size=config.embedding_batch_max_size,
+                max_delay_ms=config.embedding_batch_max_delay_ms
+            )
+        else:
+            query_embedder = create_text_embedder(config)
+
         p.add_component(
-            instance=SentenceTransformersTextEmbedder(model=config.embedder_model),
+            instance=guard(query_embedder, "embedder"),
             name="query_embedder"
         )
 
     p.add_component(
-        instance=OpenSearchBM25Retriever(document_store=config.document_store), 
+        instance=guard(bm25_retriever, "document_store"),
         name="bm25_retriever"
     )  # BM25 Retriever
 
-    p.add_component(
-        instance=OpenSearchEmbeddingRetriever(document_store=config.document_store), 
-        name="embedding_retriever"
-    )  # Embedding Retriever (OpenSearch)
+    if not bm25_only:
+        p.add_component(
+            instance=guard(embedding_retriever, "document_store"),
+            name="embedding_retriever"
+        )  # Embedding Retriever
 
+    # With a reranker, fuse both result lists by rank: that order is also the fallback
+    # when reranking runs over its latency budget. Without an LLM, the fused order is the result
+    fuse = config.reranker_enabled or mode != "generative"
     p.add_component(
-        instance=DocumentJoiner(join_mode="concatenate"), 
+        instance=DocumentJoiner(
+            join_mode="reciprocal_rank_fusion" if fuse else "concatenate",
+            top_k=config.retriever_top_k if mode != "generative" else None
+        ),
         name="document_joiner"
     )  # Document Joiner
 
+    if config.reranker_enabled:
+        if config.similarity_ranker is None:
+            config.similarity_ranker = TransformersSimilarityRanker(
+                model=config.reranker_model, top_k=config.reranker_top_k
+            )
+        # Each pipeline wraps the shared model in its own ranker, with its own score cache
+        p.add_component(
+            instance=BudgetedRanker(
+                ranker=config.similarity_ranker,
+                top_k=config.reranker_top_k,
+                latency_budget_ms=config.reranker_latency_budget_ms
+            ),
+            name="ranker"
+        )  # Cross-encoder Reranker
+
+    # Connect the retrieval components
+    p.connect("bm25_retriever.documents", "document_joiner.documents")
+    if not bm25_only:
+        p.connect("query_embedder.embedding", "embedding_retriever.query_embedding")
+        p.connect("embedding_retriever.documents", "document_joiner.documents")
+    if config.reranker_enabled:
+        p.connect("document_joiner.documents", "ranker.documents")
+
+    if mode == "retrieve":
+        return p
+
+    if mode == "extractive":
+        p.add_component(instance=SpanExtractor(), name="span_extractor")  # Span Extractor
+        p.connect("ranker.documents" if config.reranker_enabled else "document_joiner.documents", "span_extractor.documents")
+        return p
+
     p.add_component(
         instance=PromptBuilder(template=config.prompt_template), 
         name="prompt_builder"
@@ -77,60 +205,284 @@ def create_query_pipeline(config: QueryConfig) -> Pipeline:
         name="answer_builder"
     )  # Answer Builder
 
-    if settings.generator == "openai":
-        p.add_component(
-            instance=OpenAIGenerator(model=config.llm_name),
-            name="llm"
-        )
-    else:
-        raise ValueError(f"Invalid generator: {settings.generator}")
+    p.add_component(instance=guard(create_generator(config), "llm"), name="llm")  # LLM
 
-    # Connect components to each other
-    p.connect("bm25_retriever.documents", "document_joiner.documents")
-    p.connect("query_embedder.embedding", "embedding_retriever.query_embedding")
-    p.connect("embedding_retriever.documents", "document_joiner.documents")
-    p.connect("document_joiner.documents", "prompt_builder.documents")
+    # Connect the generation components
+    if config.reranker_enabled:
+        p.connect("ranker.documents", "prompt_builder.documents")
+        p.connect("ranker.documents", "answer_builder.documents")
+    else:
+        p.connect("document_joiner.documents", "prompt_builder.documents")
+        p.connect(
+            "document_joiner.documents" if bm25_only else "embedding_retriever.documents", "answer_builder.documents"
+        )
     p.connect("prompt_builder.prompt", "llm.prompt")
-    p.connect("embedding_retriever.documents", "answer_builder.documents")
     p.connect("llm.replies", "answer_builder.replies")
+    # Passes the LLM's token usage on in the answer's meta
+    p.connect("llm.meta", "answer_builder.meta")
+
+    return p
+
+def create_generation_pipeline(config: QueryConfig) -> Pipeline:
+    """
+    Builds the pipeline answering a question of a conversation from given documents,
+    retrieved beforehand or reused from the previous question.
+    """
+    p = Pipeline()
+    p.add_component(
+        instance=PromptBuilder(template=config.conversation_template, required_variables=["query"]),
+        name="prompt_builder"
+    )  # Prompt Builder
+    p.add_component(instance=AnswerBuilder(), name="answer_builder")  # Answer Builder
+    p.add_component(instance=guard(create_generator(config), "llm"), name="llm")  # LLM
 
+    p.connect("prompt_builder.prompt", "llm.prompt")
+    p.connect("llm.replies", "answer_builder.replies")
+    p.connect("llm.meta", "answer_builder.meta")
     return p
 
 class QueryService:
-    def __init__(self, document_store):
-        self.config = QueryConfig(document_store=document_store)
+    def __init__(self, document_store, tenant: Optional[str] = None, models_from: Optional["QueryService"] = None):
+        """
+        :param tenant: Tenant whose documents are searched; the default tenant if None.
+        :param models_from: Service whose embedding and reranking models are reused instead of loading them again.
+        """
+        self.config = QueryConfig(document_store=document_store, tenant=tenant)
+        if models_from is not None:
+            self.config.text_embedder = models_from.config.text_embedder
+            self.config.similarity_ranker = models_from.config.similarity_ranker
         self.pipeline = None
+        self.reloader = None
 
-        if settings.pipelines_from_yaml:
+        # YAML definitions name their document store index: they are only used for the default tenant
+        if settings.pipelines_from_yaml and is_default_tenant(tenant):
             try:
                 self.pipeline = load_pipeline(settings.pipelines_dir, self.config.pipeline_filename)
+                if self.pipeline is not None and settings.pipeline_reload_interval > 0:
+                    self.reloader = PipelineReloader(
+                        settings.pipelines_dir, self.config.pipeline_filename, pipeline=self.pipeline
+                    )
             except Exception as e:
                 logger.warning(f"Failed to load pipeline from YAML: {e}. Falling back to default pipeline.")
 
         if self.pipeline is None:
             self.pipeline = create_query_pipeline(self.config)
 
+        # Pipelines without the LLM, built once, for searches that don't need a generated answer
+        self.fast_pipelines = {mode: create_query_pipeline(self.config, mode) for mode in ("extractive", "retrieve")}
+        # Keyword-only pipelines, for when the embedder is unavailable; built on first use
+        self.bm25_pipelines: Dict[str, Pipeline] = {}
+        self._bm25_lock = threading.Lock()
+        # Answers follow-up questions of a session from documents already at hand
+        self.generation_pipeline = create_generation_pipeline(self.config)
+
         #print(f"\n--- Query Pipeline ---\n{self.pipeline.dumps()}")
 
-    def search(self, query: str, filters: Optional[dict] = None):
-        if self.pipeline is None:
-            raise ValueError("Query pipeline has not been initialized")
+    def warm_up(self):
+        """Loads models ahead of the first query, e.g. before forking worker processes."""
+        if self.pipeline is not None:
+            self.pipeline.warm_up()
+        for pipeline in self.fast_pipelines.values():
+            pipeline.warm_up()
+        self.generation_pipeline.warm_up()
+
+    @contextmanager
+    def _generative_pipeline(self) -> Iterator[Optional[Pipeline]]:
+        """
+        The pipeline of generative searches. From a YAML definition, the current one, leased for
+        the search: searches already running finish on a pipeline replaced by a reload.
+        """
+        if self.reloader is None:
+            yield self.pipeline
+            return
+        with self.reloader.lease() as pipeline:
+            yield pipeline
 
+    def _bm25_pipeline(self, mode: str) -> Pipeline:
+        with self._bm25_lock:
+            if mode not in self.bm25_pipelines:
+                pipeline = create_query_pipeline(self.config, mode, bm25_only=True)
+                pipeline.warm_up()
+                self.bm25_pipelines[mode] = pipeline
+            return self.bm25_pipelines[mode]
+
+    def _params(self, mode: str, query: str, filters: Optional[dict], bm25_only: bool = False) -> dict:
         # Component names here should match pipeline definition!
-        pipeline_params = {
-            "bm25_retriever": {"query": query, "filters": filters},
-            "query_embedder": {"text": query},
-            "answer_builder": {"query": query},
-            "prompt_builder": {"query": query}
-        }
+        params = {"bm25_retriever": {"query": query, "filters": filters}}
+        if not bm25_only:
+            params["embedding_retriever"] = {"filters": filters}
+            params["query_embedder"] = {"text": query}
+        if mode == "generative":
+            params["answer_builder"] = {"query": query}
+            params["prompt_builder"] = {"query": query}
+        elif mode == "extractive":
+            params["span_extractor"] = {"query": query}
+        if self.config.reranker_enabled:
+            params["ranker"] = {"query": query}
+        return params
+
+    @property
+    def _ranked_output(self) -> str:
+        return "ranker" if self.config.reranker_enabled else "document_joiner"
+
+    def _run(
+        self,
+        mode: str,
+        query: str,
+        filters: Optional[dict],
+        generative_pipeline: Optional[Pipeline] = None,
+        include_outputs_from: Set[str] = frozenset(),
+    ) -> Tuple[str, dict, List[str]]:
+        """
+        Runs the pipeline of a search mode without the dependencies that are unavailable:
+        keyword retrieval only without the embedder, and the ranked documents only, without
+        an answer, without the LLM. Returns the mode that ran, its results, with the outputs
+        of `include_outputs_from` that ran, and the dependencies that were left out.
+        """
+        degraded = []
+        bm25_only = False
+        if settings.breaker_enabled:
+            # Open breakers are skipped at once, instead of failing every search
+            if not get_breaker("embedder").available():
+                bm25_only = True
+                degraded.append("embedder")
+            if mode == "generative" and not get_breaker("llm").available():
+                mode = "retrieve"
+                degraded.append("llm")
+
+        while True:
+            if bm25_only:
+                pipeline = self._bm25_pipeline(mode)
+            else:
+                pipeline = (generative_pipeline or self.pipeline) if mode == "generative" else self.fast_pipelines[mode]
+            outputs = {name for name in include_outputs_from if name in pipeline.graph.nodes}
+            if mode == "extractive":
+                outputs.add(self._ranked_output)
+            try:
+                if outputs:
+                    results = pipeline.run(self._params(mode, query, filters, bm25_only), include_outputs_from=outputs)
+                else:
+                    results = pipeline.run(self._params(mode, query, filters, bm25_only))
+                break
+            except DependencyUnavailableError as e:
+                # The document store is needed by every mode: the search fails
+                if e.dependency == "embedder" and not bm25_only:
+                    bm25_only = True
+                elif e.dependency == "llm" and mode == "generative":
+                    mode = "retrieve"
+                else:
+                    raise
+                degraded.append(e.dependency)
+
+        for dependency in degraded:
+            get_breaker(dependency).record_fallback()
+            logger.warning(
+                f"Search degraded, {dependency} unavailable",
+                extra={"event": "degraded", "dependency": dependency, "sample": True}
+            )
+        return mode, results, degraded
+
+    def retrieve(self, query: str, filters: Optional[dict] = None) -> Tuple[List[Document], List[str]]:
+        """Returns the ranked documents matching the query, without generating an answer, and the dependencies left out."""
+        _, results, degraded = self._run("retrieve", query, filters)
+        return results[self._ranked_output]["documents"], degraded
+
+    def extract(
+        self, query: str, filters: Optional[dict] = None
+    ) -> Tuple[List[ExtractedAnswer], List[Document], List[str]]:
+        """Returns the best matching spans of the top documents, the ranked documents and the dependencies left out."""
+        _, results, degraded = self._run("extractive", query, filters)
+        return results["span_extractor"]["answers"], results[self._ranked_output]["documents"], degraded
 
-        logger.info("Running query pipeline...")
+    def search(self, query: str, filters: Optional[dict] = None) -> GeneratedAnswer:
+        """
+        Returns the generated answer, with the dependencies left out in its `degraded` meta.
+        Without the LLM, the answer has no data and holds the ranked documents.
+        """
+        with self._generative_pipeline() as pipeline:
+            if pipeline is None:
+                raise ValueError("Query pipeline has not been initialized")
 
-        # Run the query pipeline
-        results = self.pipeline.run(pipeline_params)
+            logger.debug("Running query pipeline...")
 
-        logger.debug(f"Query pipeline.run() results:\n{results}")
+            # Run the query pipeline
+            mode, results, degraded = self._run("generative", query, filters, pipeline)
 
+        if settings.log_payloads:
+            logger.debug("Query pipeline results", extra={"results": results})
+
+        if mode != "generative":
+            return GeneratedAnswer(
+                data=None, query=query, documents=results[self._ranked_output]["documents"], meta={"degraded": degraded}
+            )
         answer = results['answer_builder']['answers'][0]
+        if degraded:
+            answer.meta["degraded"] = degraded
+
+        return answer
+
+    def search_in_session(self, query: str, filters: Optional[dict], session: Session) -> GeneratedAnswer:
+        """
+        Returns the generated answer to a question following up on the session's previous
+        ones, which are given to the LLM, cut short, along with the documents.
 
+        The documents of the previous question are used again, without retrieving, if the
+        filters are the same and they contain most of the question's terms; a follow-up
+        like "why?" has no terms of its own and always reuses them. A question with fewer
+        of their terms reuses them if its embedding is close to the previous query's or
+        to one of the documents'. The answer's `reused_documents` meta tells whether they
+        were, and its `query_embedding` meta is the one of the question it retrieved for.
+        """
+        reused = False
+        if session.documents is not None and session.filters == filters:
+            reused = query_coverage(query, session.documents) >= settings.session_reuse_min_coverage
+            if not reused and settings.session_reuse_min_similarity <= 1:
+                query_embedding = self._embed_query(query)
+                reused = (
+                    query_embedding is not None
+                    and embedding_similarity(query_embedding, session) >= settings.session_reuse_min_similarity
+                )
+        query_embedding = None
+        if reused:
+            documents, degraded = session.documents, []
+        else:
+            # The ranked documents, as the prompt of a search gets them, with their embeddings
+            _, results, degraded = self._run("retrieve", query, filters, include_outputs_from={"query_embedder"})
+            documents = results[self._ranked_output]["documents"]
+            query_embedding = results.get("query_embedder", {}).get("embedding")
+
+        history = condense_history(session.turns, settings.session_max_turns, settings.session_history_chars)
+        answer = None
+        if not settings.breaker_enabled or get_breaker("llm").available():
+            try:
+                results = self.generation_pipeline.run({
+                    "prompt_builder": {"query": query, "documents": documents, "history": history},
+                    "answer_builder": {"query": query, "documents": documents},
+                })
+                answer = results["answer_builder"]["answers"][0]
+            except DependencyUnavailableError as e:
+                if e.dependency != "llm":
+                    raise
+        if answer is None:
+            # Without the LLM, as search(): the documents, without an answer
+            degraded = degraded + ["llm"]
+            get_breaker("llm").record_fallback()
+            logger.warning(
+                "Search degraded, llm unavailable", extra={"event": "degraded", "dependency": "llm", "sample": True}
+            )
+            answer = GeneratedAnswer(data=None, query=query, documents=documents, meta={})
+
+        if degraded:
+            answer.meta["degraded"] = degraded
+        answer.meta["reused_documents"] = reused
+        answer.meta["query_embedding"] = query_embedding
         return answer
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """The query's embedding, or None while the embedder is unavailable."""
+        if settings.breaker_enabled and not get_breaker("embedder").available():
+            return None
+        try:
+            return self.fast_pipelines["retrieve"].get_component("query_embedder").run(text=query)["embedding"]
+        except DependencyUnavailableError:
+            return None
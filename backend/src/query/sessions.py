@@ -0,0 +1,311 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from haystack import Document
+from haystack.dataclasses import GeneratedAnswer
+
+from query.extractive import content_terms
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Turn:
+    query: str
+    answer: str
+
+
+@dataclass
+class Session:
+    """
+    A conversation: its turns, and the documents, with their embeddings, the filters and
+    the query embedding of its last retrieval.
+    """
+    turns: List[Turn] = field(default_factory=list)
+    documents: Optional[List[Document]] = None
+    filters: Optional[dict] = None
+    query_embedding: Optional[List[float]] = None
+    updated_at: float = 0.0
+
+
+def condense_history(turns: List[Turn], max_turns: int, max_answer_chars: int) -> List[Dict[str, str]]:
+    """The last `max_turns` turns for the prompt, answers cut to about `max_answer_chars`."""
+    history = []
+    for turn in turns[-max_turns:] if max_turns > 0 else []:
+        answer = turn.answer
+        if len(answer) > max_answer_chars:
+            # Cut at the last word boundary within the limit
+            answer = answer[:max_answer_chars].rsplit(" ", 1)[0] + " ..."
+        history.append({"query": turn.query, "answer": answer})
+    return history
+
+def query_coverage(query: str, documents: List[Document]) -> float:
+    """
+    Share of the query's content terms found in the documents. A query without content
+    terms ("why?", "and then?") only makes sense as a follow-up, and is fully covered.
+    """
+    terms = set(content_terms(query))
+    if not terms:
+        return 1.0
+    found = set()
+    for doc in documents:
+        found |= terms.intersection(content_terms(doc.content or ""))
+        if found == terms:
+            break
+    return len(found) / len(terms)
+
+def embedding_similarity(query_embedding: List[float], session: Session) -> float:
+    """
+    Highest cosine similarity of a query embedding to the session's last retrieved query
+    and documents; 0 if none of them has an embedding.
+    """
+    embeddings = [doc.embedding for doc in session.documents or [] if doc.embedding is not None]
+    if session.query_embedding is not None:
+        embeddings.append(session.query_embedding)
+    embeddings = [embedding for embedding in embeddings if len(embedding) == len(query_embedding)]
+    if not embeddings:
+        return 0.0
+    matrix, query = np.asarray(embeddings, dtype=np.float32), np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return float(np.max(matrix @ query / np.maximum(norms, 1e-12)))
+
+def _record_turn(session: Session, query: str, answer: GeneratedAnswer, filters: Optional[dict], max_turns: int):
+    if answer.data is not None:
+        session.turns = (session.turns + [Turn(query, answer.data)])[-max_turns:]
+    # The answer's documents are the ones its prompt was built from, with their embeddings
+    session.documents = answer.documents
+    session.filters = filters
+    if not answer.meta.get("reused_documents"):
+        session.query_embedding = answer.meta.get("query_embedding")
+
+
+class SessionStore:
+    """
+    Conversations of the process, by (tenant, session id), for follow-up questions.
+
+    At most `max_sessions` are kept: a session idle for `ttl_seconds` expires, and the
+    least recently used one is dropped when a new one needs room. Sessions are kept in
+    the memory of each worker process: with several workers, use `FileSessionStore`.
+    """
+
+    # Only touches memory: the search endpoint calls it on the event loop
+    blocking = False
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 1800.0,
+        max_turns: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.clock = clock
+        self._sessions: "OrderedDict[Tuple[str, str], Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0, "reused_documents": 0}
+
+    def _evict(self, now: float):
+        # Least recently used first: expired sessions are at the front
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.updated_at >= self.ttl_seconds:
+                self._counts["expired"] += 1
+            elif len(self._sessions) > self.max_sessions:
+                self._counts["evicted"] += 1
+            else:
+                break
+            del self._sessions[key]
+
+    def get(self, tenant: str, session_id: str) -> Session:
+        """Returns the session, or a new one if it doesn't exist or expired."""
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            session = self._sessions.get((tenant, session_id))
+            if session is None:
+                self._counts["created"] += 1
+                return Session(updated_at=now)
+            self._sessions.move_to_end((tenant, session_id))
+            self._counts["resumed"] += 1
+            return session
+
+    def record(
+        self,
+        tenant: str,
+        session_id: str,
+        query: str,
+        answer: GeneratedAnswer,
+        filters: Optional[dict],
+    ):
+        """
+        Adds a turn to the session, keeping the documents it was answered from, and the
+        embeddings of its retrieval, for the next one.
+        """
+        with self._lock:
+            now = self.clock()
+            session = self._sessions.pop((tenant, session_id), None) or Session()
+            _record_turn(session, query, answer, filters, self.max_turns)
+            session.updated_at = now
+            self._sessions[(tenant, session_id)] = session
+            if answer.meta.get("reused_documents"):
+                self._counts["reused_documents"] += 1
+            self._evict(now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, **self._counts}
+
+
+def _session_data(session: Session) -> bytes:
+    documents = None if session.documents is None else [doc.to_dict(flatten=False) for doc in session.documents]
+    return orjson.dumps(
+        {
+            "turns": [asdict(turn) for turn in session.turns],
+            "documents": documents,
+            "filters": session.filters,
+            "query_embedding": session.query_embedding,
+        },
+        default=str,
+    )
+
+def _session_from_data(data: bytes, updated_at: float) -> Session:
+    data = orjson.loads(data)
+    documents = data["documents"]
+    return Session(
+        turns=[Turn(**turn) for turn in data["turns"]],
+        documents=None if documents is None else [Document.from_dict(doc) for doc in documents],
+        filters=data["filters"],
+        query_embedding=data.get("query_embedding"),
+        updated_at=updated_at,
+    )
+
+
+class FileSessionStore:
+    """
+    Conversations in a local sqlite file, shared by all worker processes of a host so that
+    the follow-up questions of a session can go to any of them. Sessions expire and are
+    evicted as in `SessionStore`.
+    """
+
+    # Reads and writes may wait for other processes' writes: the search endpoint calls them in a worker thread
+    blocking = True
+
+    def __init__(
+        self,
+        path: Path,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 1800.0,
+        max_turns: int = 20,
+        clock: Callable[[], float] = time.time,
+    ):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counts = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0, "reused_documents": 0}
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection opened before the server forked its workers isn't shared with them
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (tenant TEXT, session_id TEXT, data BLOB, updated_at REAL, "
+                "used_at REAL, PRIMARY KEY (tenant, session_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_used_at ON sessions (used_at)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        with self._lock:
+            conn = self._connection()
+            # Locks the database for writing, so that reads and writes are atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, self.clock())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        self._counts["expired"] += conn.execute(
+            "DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl_seconds,)
+        ).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            # Least recently used first
+            self._counts["evicted"] += conn.execute(
+                "DELETE FROM sessions WHERE rowid IN (SELECT rowid FROM sessions ORDER BY used_at LIMIT ?)", (excess,)
+            ).rowcount
+
+    def get(self, tenant: str, session_id: str) -> Session:
+        """Returns the session, or a new one if it doesn't exist or expired."""
+        def get(conn: sqlite3.Connection, now: float) -> Session:
+            self._evict(conn, now)
+            row = conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE tenant = ? AND session_id = ?", (tenant, session_id)
+            ).fetchone()
+            if row is None:
+                self._counts["created"] += 1
+                return Session(updated_at=now)
+            conn.execute("UPDATE sessions SET used_at = ? WHERE tenant = ? AND session_id = ?", (now, tenant, session_id))
+            self._counts["resumed"] += 1
+            return _session_from_data(*row)
+
+        return self._transaction(get)
+
+    def record(
+        self,
+        tenant: str,
+        session_id: str,
+        query: str,
+        answer: GeneratedAnswer,
+        filters: Optional[dict],
+    ):
+        """
+        Adds a turn to the session, keeping the documents it was answered from, and the
+        embeddings of its retrieval, for the next one.
+        """
+        def record(conn: sqlite3.Connection, now: float):
+            row = conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE tenant = ? AND session_id = ?", (tenant, session_id)
+            ).fetchone()
+            session = _session_from_data(*row) if row else Session()
+            _record_turn(session, query, answer, filters, self.max_turns)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (tenant, session_id, data, updated_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (tenant, session_id, _session_data(session), now, now)
+            )
+            if answer.meta.get("reused_documents"):
+                self._counts["reused_documents"] += 1
+            self._evict(conn, now)
+
+        self._transaction(record)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {"sessions": sessions, "max_sessions": self.max_sessions, **self._counts}
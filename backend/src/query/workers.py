@@ -0,0 +1,44 @@
+import math
+import os
+
+try:
+    from uvicorn_worker import UvicornWorker
+except ImportError:
+    from uvicorn.workers import UvicornWorker
+
+from common.config import settings
+
+
+def available_cpus() -> int:
+    """
+    Returns the number of CPUs this process may use, honouring the container CPU quota
+    (cgroup v2 `cpu.max`) when there is one.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+def worker_count() -> int:
+    return settings.query_workers if settings.query_workers > 0 else available_cpus()
+
+
+class QueryWorker(UvicornWorker):
+    """
+    Uvicorn worker for the query service.
+
+    Caps the number of concurrent requests per worker (excess requests get a 503) and,
+    on SIGTERM, stops accepting connections and lets in-flight searches, including their
+    LLM calls, finish before the gunicorn graceful timeout expires.
+    """
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "limit_concurrency": settings.query_worker_concurrency,
+        "timeout_graceful_shutdown": max(settings.query_graceful_timeout - 5, 1),
+    }
@@ -0,0 +1,110 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import threading
+import pytest
+from unittest.mock import Mock
+
+from common.cancellation import DISCONNECT, Cancellation, SearchCancelledError, _current
+from query.batching import MicroBatcher, BatchingTextEmbedder
+
+
+def test_micro_batcher_coalesces_concurrent_items():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_delay_ms=200)
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.submit(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    # All items were submitted together, so far fewer calls than items
+    assert len(calls) < 8
+    assert sum(len(c) for c in calls) == 8
+
+def test_micro_batcher_respects_max_batch_size():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_delay_ms=100)
+    threads = [threading.Thread(target=batcher.submit, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(sizes) <= 2
+    assert sum(sizes) == 6
+
+def test_micro_batcher_propagates_errors():
+    batcher = MicroBatcher(Mock(side_effect=RuntimeError("embedder down")), max_delay_ms=1)
+
+    with pytest.raises(RuntimeError, match="embedder down"):
+        batcher.submit("query")
+
+def test_micro_batcher_stops_waiting_when_cancelled():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def batch_fn(items):
+        calls.append(items)
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_delay_ms=1, max_concurrent_batches=1, name="query_embedder")
+    threading.Thread(target=batcher.submit, args=("busy",), daemon=True).start()
+    started.wait(5)
+
+    cancellation = Cancellation()
+    token = _current.set(cancellation)
+    try:
+        threading.Timer(0.05, cancellation.cancel, args=(DISCONNECT,)).start()
+        with pytest.raises(SearchCancelledError) as error:
+            batcher.submit("cancelled")
+    finally:
+        _current.reset(token)
+        release.set()
+
+    assert error.value.stage == "query_embedder"
+    assert batcher.submit("next") == "next"
+    # The cancelled item was dropped before its batch ran
+    assert ["cancelled"] not in calls
+
+def test_micro_batcher_times_out():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda items: release.wait(5) and items, max_delay_ms=1)
+
+    with pytest.raises(TimeoutError, match="within 0.05s"):
+        batcher.submit("slow", timeout=0.05)
+    release.set()
+
+def test_batching_text_embedder_falls_back_to_run():
+    embedder = Mock()
+    embedder.run.side_effect = lambda text: {"embedding": [float(len(text))]}
+
+    batching_embedder = BatchingTextEmbedder(embedder=embedder, max_delay_ms=1)
+    result = batching_embedder.run(text="abc")
+
+    assert result == {"embedding": [3.0]}
+    embedder.run.assert_called_once_with(text="abc")
@@ -0,0 +1,123 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from typing import List
+
+import pytest
+from haystack import Document, component
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+import query.breakers
+from common.config import settings
+from query.breakers import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DependencyUnavailableError, GuardedComponent
+from query.service import QueryService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def fail():
+    raise ConnectionError("upstream down")
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(query.breakers, "_breakers", {})
+    monkeypatch.setattr(settings, "breaker_enabled", True)
+
+def test_breaker_opens_and_probes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("llm", slo_ms=1000, failure_rate=0.5, window=4, min_calls=4, open_seconds=10, clock=clock)
+
+    for _ in range(2):
+        breaker.call(lambda: "ok")
+    for _ in range(2):
+        with pytest.raises(DependencyUnavailableError, match="upstream down"):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+
+    # Rejected without calling while open
+    with pytest.raises(DependencyUnavailableError, match="circuit open") as rejected:
+        breaker.call(lambda: "ok")
+    assert rejected.value.retry_after == 10
+    assert not breaker.available()
+
+    # A failed probe opens it again, a successful one closes it
+    clock.now = 10
+    assert breaker.available()
+    with pytest.raises(DependencyUnavailableError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    clock.now = 20
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+    stats = breaker.stats()
+    assert stats["opened"] == 2 and stats["rejected"] == 1 and stats["failures"] == 3
+
+def test_slow_calls_count_against_the_slo():
+    breaker = CircuitBreaker("embedder", slo_ms=-1, failure_rate=1.0, window=3, min_calls=3)
+
+    for _ in range(3):
+        assert breaker.call(lambda: "slow but ok") == "slow but ok"
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_calls"] == 3 and breaker.stats()["slo_attainment"] == 0
+
+def test_half_open_breaker_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker("llm", slo_ms=1000, window=1, min_calls=1, open_seconds=1, clock=clock)
+    with pytest.raises(DependencyUnavailableError):
+        breaker.call(fail)
+
+    clock.now = 1
+    assert breaker._acquire()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.available() and not breaker._acquire()
+
+@component
+class Retriever:
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, top_k: int = 3):
+        return {"documents": [Document(content=query)] * top_k}
+
+def test_guarded_component_has_the_wrapped_sockets():
+    guarded = GuardedComponent(Retriever(), "document_store")
+
+    assert set(guarded.__haystack_input__._sockets_dict) == {"query", "top_k"}
+    assert not guarded.__haystack_input__._sockets_dict["top_k"].is_mandatory
+    assert len(guarded.run(query="q")["documents"]) == 3
+    assert GuardedComponent.from_dict(guarded.to_dict()).dependency == "document_store"
+
+
+class Failing:
+    def run(self, **kwargs):
+        raise TimeoutError("timed out")
+
+def test_search_goes_on_without_embedder_and_llm():
+    store = InMemoryDocumentStore()
+    store.write_documents([Document(content="The cat sat on the mat", id="cat"), Document(content="Dogs bark", id="dog")])
+    service = QueryService(document_store=store)
+    for pipeline in (service.pipeline, *service.fast_pipelines.values()):
+        pipeline.get_component("query_embedder").wrapped = Failing()
+    for pipeline in (service.pipeline, service._bm25_pipeline("generative")):
+        pipeline.get_component("llm").wrapped = Failing()
+
+    documents, degraded = service.retrieve("cat")
+    assert documents[0].id == "cat" and degraded == ["embedder"]
+
+    answer = service.search("cat")
+    assert answer.data is None
+    assert answer.meta["degraded"] == ["embedder", "llm"]
+    assert answer.documents[0].id == "cat"
+
+    stats = query.breakers.breaker_stats()
+    assert stats["embedder"]["failures"] == 2 and stats["embedder"]["fallbacks"] == 2
+    assert stats["llm"]["failures"] == 1
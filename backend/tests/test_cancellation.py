@@ -0,0 +1,141 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import asyncio
+import threading
+from typing import List
+
+import httpx
+import pytest
+from haystack import Document, component
+
+import common.cancellation
+import query.breakers
+from common.config import settings
+from common.cancellation import DEADLINE, DISCONNECT, CancellationStats, SearchCancelledError, run_cancellable
+from common.llm_client import CancellableTransport
+from query.breakers import CLOSED, GuardedComponent
+
+
+class Client:
+    def __init__(self):
+        self.connected = True
+
+    async def is_disconnected(self):
+        return not self.connected
+
+@component
+class Retriever:
+    def __init__(self):
+        self.calls = 0
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str):
+        self.calls += 1
+        return {"documents": [Document(content=query)]}
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(query.breakers, "_breakers", {})
+    monkeypatch.setattr(settings, "breaker_enabled", True)
+    monkeypatch.setattr(common.cancellation, "_stats", CancellationStats())
+
+def test_search_stops_at_the_next_stage_once_the_client_is_gone():
+    retriever = Retriever()
+    guarded = GuardedComponent(retriever, "document_store")
+    first_stage_done = threading.Event()
+    client_gone = threading.Event()
+
+    def search(query):
+        guarded.run(query=query)
+        first_stage_done.set()
+        client_gone.wait(5)
+        return guarded.run(query=query)
+
+    async def main():
+        client = Client()
+        task = asyncio.ensure_future(run_cancellable(client, None, search, "q"))
+        while not first_stage_done.is_set():
+            await asyncio.sleep(0.01)
+        client.connected = False
+        await asyncio.sleep(0.3)
+        client_gone.set()
+        return await task
+
+    with pytest.raises(SearchCancelledError) as cancelled:
+        asyncio.run(main())
+    assert cancelled.value.reason == DISCONNECT and cancelled.value.stage == "document_store"
+    assert retriever.calls == 1
+    # The cancelled call doesn't count against the dependency
+    assert guarded.breaker.stats()["calls"] == 1
+
+    stats = common.cancellation.cancellation_stats()
+    assert stats["cancelled"] == 1 and stats["by_reason"] == {DISCONNECT: 1}
+    assert stats["stopped_at"] == {"document_store": 1} and stats["wasted_ms"] > 0
+
+def test_search_of_a_connected_client_completes():
+    guarded = GuardedComponent(Retriever(), "document_store")
+
+    result = asyncio.run(run_cancellable(Client(), 10, lambda: guarded.run(query="q")))
+
+    assert result["documents"][0].content == "q"
+    # Outside of a cancellable search, nothing is cancelled
+    assert guarded.run(query="q")["documents"]
+    assert common.cancellation.cancellation_stats()["cancelled"] == 0
+
+class SlowCall:
+    def run(self, query: str):
+        raise TimeoutError("timed out at the deadline")
+
+def test_calls_failing_past_the_deadline_are_cancelled():
+    guarded = GuardedComponent(Retriever(), "llm")
+    guarded.wrapped = SlowCall()
+
+    with pytest.raises(SearchCancelledError) as cancelled:
+        asyncio.run(run_cancellable(Client(), 0.05, lambda: (threading.Event().wait(0.1), guarded.run(query="q"))))
+
+    assert cancelled.value.reason == DEADLINE
+    assert guarded.breaker.state == CLOSED and guarded.breaker.stats()["failures"] == 0
+
+class EventStream(httpx.BaseTransport):
+    def __init__(self):
+        self.closed = False
+
+    def handle_request(self, request):
+        transport = self
+
+        class Stream(httpx.SyncByteStream):
+            def __iter__(self):
+                for i in range(100):
+                    yield f"data: {i}\n\n".encode()
+
+            def close(self):
+                transport.closed = True
+
+        self.timeout = request.extensions["timeout"]
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=Stream())
+
+def test_streamed_responses_stop_when_the_search_is_cancelled():
+    upstream = EventStream()
+    client = httpx.Client(transport=CancellableTransport(upstream), timeout=30)
+
+    def search():
+        received = 0
+        with client.stream("POST", "https://api.example.com/v1/chat/completions") as response:
+            for _ in response.iter_raw():
+                received += 1
+                if received == 3:
+                    common.cancellation.current_cancellation().cancel(DISCONNECT)
+        return received
+
+    with pytest.raises(SearchCancelledError):
+        asyncio.run(run_cancellable(Client(), 10, search))
+    assert upstream.closed
+    assert upstream.timeout["read"] <= 10
+    # Outside of a search, streams are read to the end
+    with client.stream("POST", "https://api.example.com/v1/chat/completions") as response:
+        assert len(list(response.iter_raw())) == 100
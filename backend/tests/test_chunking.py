@@ -0,0 +1,98 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pytest
+from haystack import Document
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+from indexing.chunking import DocumentChunker, pack_spans, recursive_spans, sentence_spans
+from indexing.preprocessors import FastDocumentSplitter
+from indexing.service import IndexingConfig, create_indexing_pipeline
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+def test_sentence_chunks_keep_whole_sentences():
+    text = " ".join(f"Sentence number {i} has six words." for i in range(20))
+    document = Document(content=text, meta={"file_path": "a.txt"})
+
+    chunks = DocumentChunker(split_by="sentence", split_length=20, split_overlap=6).run(documents=[document])["documents"]
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert words(chunk.content) <= 20
+        assert chunk.content.startswith("Sentence") and chunk.content.rstrip().endswith(".")
+        assert text[chunk.meta["split_idx_start"]:].startswith(chunk.content)
+        assert chunk.meta["source_id"] == document.id
+    # Each chunk starts with the last sentence of the previous one
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.content.rstrip().endswith(chunk.content.split(".")[0] + ".")
+
+def test_recursive_chunks_follow_sections():
+    sections = [f"Heading {i}\n\n" + " ".join(["word"] * 37) + "." for i in range(4)]
+    text = "\n\n".join(sections)
+
+    spans = recursive_spans(text, 40)
+    assert all(words(text[start:end]) <= 40 for start, end in spans)
+    assert "".join(text[start:end] for start, end in spans) == text
+
+    chunks = DocumentChunker(split_by="recursive", split_length=40, split_overlap=0).run(
+        documents=[Document(content=text)]
+    )["documents"]
+    assert [chunk.content.split("\n")[0] for chunk in chunks] == [f"Heading {i}" for i in range(4)]
+
+def test_token_chunks_fit_the_token_budget():
+    text = " ".join(["tokenization"] * 100)
+
+    chunks = DocumentChunker(split_by="token", split_length=40, split_overlap=8).run(
+        documents=[Document(content=text)]
+    )["documents"]
+
+    # Without tiktoken, 12 characters count as 3 tokens: 13 words per chunk, 2 of them overlapping
+    assert len(chunks) > 1
+    assert all(words(chunk.content) <= 13 for chunk in chunks)
+
+def test_strategy_per_file_type_and_page_numbers():
+    chunker = DocumentChunker(split_by="word", split_by_type={"text/markdown": "sentence"}, split_length=6, split_overlap=0)
+    text = "One two three. Four five.\fSix seven eight nine ten eleven."
+    markdown = Document(content=text, meta={"file_type": "text/markdown"})
+    plain = Document(content=text, meta={"file_type": "text/plain"})
+
+    chunks = chunker.run(documents=[markdown])["documents"]
+    assert [chunk.content for chunk in chunks] == ["One two three. Four five.\f", "Six seven eight nine ten eleven."]
+    assert [chunk.meta["page_number"] for chunk in chunks] == [1, 2]
+
+    expected = FastDocumentSplitter(split_by="word", split_length=6, split_overlap=0).run(documents=[plain])
+    assert [doc.id for doc in chunker.run(documents=[plain])["documents"]] == [doc.id for doc in expected["documents"]]
+
+def test_pack_spans_overlap_moves_forward():
+    assert pack_spans([(0, 1)] * 4, [3, 3, 3, 3], max_size=6, overlap=3) == [(0, 2), (1, 3), (2, 4)]
+    # A span larger than a chunk is a chunk of its own
+    assert pack_spans([(0, 1)] * 3, [1, 9, 1], max_size=4, overlap=0) == [(0, 1), (1, 2), (2, 3)]
+    assert sentence_spans("Done. Next one! \"Quoted.\" Last") == [(0, 6), (6, 16), (16, 26), (26, 30)]
+
+def test_invalid_strategy_and_serialization():
+    with pytest.raises(ValueError, match="Invalid chunking strategy"):
+        DocumentChunker(split_by_type={"text/plain": "semantic"})
+
+    chunker = DocumentChunker(split_by="recursive", split_by_type={"application/pdf": "sentence"}, split_length=100)
+    restored = DocumentChunker.from_dict(chunker.to_dict())
+    assert restored.split_by == "recursive" and restored.split_by_type == {"application/pdf": "sentence"}
+
+def test_pipeline_chunks_before_cleaning_with_structure():
+    store = InMemoryDocumentStore()
+
+    pipeline = create_indexing_pipeline(IndexingConfig(document_store=store, split_by="word", split_by_type={}))
+    assert isinstance(pipeline.get_component("document_splitter"), FastDocumentSplitter)
+    assert list(pipeline.graph.successors("document_cleaner")) == ["document_splitter"]
+
+    pipeline = create_indexing_pipeline(
+        IndexingConfig(document_store=store, split_by="word", split_by_type={"text/markdown": "recursive"})
+    )
+    assert isinstance(pipeline.get_component("document_splitter"), DocumentChunker)
+    assert list(pipeline.graph.successors("document_splitter")) == ["document_cleaner"]
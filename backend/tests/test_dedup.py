@@ -0,0 +1,119 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from unittest.mock import Mock
+
+import pytest
+
+from haystack import Document
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
+
+from indexing.dedup import MinHasher, NearDuplicateFilter
+from indexing.service import IndexingConfig, IndexingService, create_indexing_pipeline
+
+
+WORDS = [f"word{i}" for i in range(200)]
+TEXT = " ".join(WORDS)
+NEAR_DUPLICATE = " ".join(WORDS[:100] + ["changed"] + WORDS[101:])
+OTHER = " ".join(reversed(WORDS))
+
+def test_minhash_similarity():
+    hasher = MinHasher()
+    signature = hasher.signature(TEXT)
+
+    assert (hasher.signature(NEAR_DUPLICATE) == signature).mean() > 0.9
+    assert (hasher.signature(OTHER) == signature).mean() < 0.1
+
+def test_skip_near_duplicates():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    first = Document(content=TEXT, meta={"file_path": "a.txt"})
+
+    result = dedup.run(documents=[first, Document(content=NEAR_DUPLICATE), Document(content=OTHER)])
+
+    assert [doc.content for doc in result["documents"]] == [TEXT, OTHER]
+    assert result["duplicates"] == []
+    dedup.commit()
+    # Indexing the same chunk again isn't a duplicate of itself
+    assert dedup.run(documents=[first])["documents"] == [first]
+    dedup.commit()
+    stats = dedup.stats()
+    assert stats["checked"] == 4
+    assert stats["duplicates"] == 1
+    assert stats["characters_saved"] == len(NEAR_DUPLICATE)
+    assert stats["indexed_chunks"] == 2
+
+def test_link_near_duplicates():
+    dedup = NearDuplicateFilter(threshold=0.8, mode="link")
+    first = Document(content=TEXT)
+
+    result = dedup.run(documents=[first, Document(content=NEAR_DUPLICATE)])
+
+    assert result["documents"] == [first]
+    assert result["duplicates"][0].meta["near_duplicate_of"] == first.id
+
+def test_new_version_of_a_file_is_not_a_duplicate_of_the_previous_one():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    previous = Document(content=TEXT, meta={"file_path": "a.txt"})
+    dedup.run(documents=[previous])
+    dedup.commit()
+
+    new = Document(content=NEAR_DUPLICATE, meta={"file_path": "a.txt"})
+    assert dedup.run(documents=[new])["documents"] == [new]
+    dedup.commit()
+    assert dedup.run(documents=[Document(content=NEAR_DUPLICATE, meta={"file_path": "b.txt"})])["documents"] == []
+
+    # Deleting the previous version's chunks leaves the new version's
+    assert dedup.index.remove([previous.id]) == 1
+    assert dedup.index.query(dedup.hasher.signature(TEXT), 0.8) == (new.id, pytest.approx(0.95, abs=0.05))
+
+def test_index_is_persistent(tmp_path):
+    index_path = str(tmp_path / "dedup.sqlite")
+    dedup = NearDuplicateFilter(index_path=index_path)
+    dedup.run(documents=[Document(content=TEXT)])
+    dedup.commit()
+    # A failed run's signatures aren't kept
+    dedup.run(documents=[Document(content=OTHER)])
+    dedup.discard()
+
+    result = NearDuplicateFilter(index_path=index_path).run(
+        documents=[Document(content=NEAR_DUPLICATE), Document(content=" ".join(reversed(WORDS[1:])))]
+    )
+
+    assert [doc.content for doc in result["documents"]] == [" ".join(reversed(WORDS[1:]))]
+    assert len(dedup.index) == 1
+
+def test_indexing_pipeline_with_near_duplicate_filter(tmp_path):
+    config = IndexingConfig(
+        document_store=Mock(spec=OpenSearchDocumentStore),
+        near_duplicate_mode="link",
+        near_duplicate_index_path=tmp_path / "dedup.sqlite",
+    )
+    pipeline = create_indexing_pipeline(config)
+
+    assert isinstance(pipeline.get_component("near_duplicate_filter"), NearDuplicateFilter)
+    assert pipeline.get_component("duplicate_writer") is not None
+
+def test_deleting_a_file_indexes_its_duplicates_again(tmp_path):
+    store = InMemoryDocumentStore()
+    service = IndexingService(document_store=store)
+    near_duplicate_filter = NearDuplicateFilter(threshold=0.8, mode="link")
+    service.index_files = Mock()
+    a_path, b_path = tmp_path / "a.txt", tmp_path / "b.txt"
+    b_path.write_text(NEAR_DUPLICATE)
+    original = Document(content=TEXT, meta={"file_path": str(a_path)})
+    duplicate = Document(content=NEAR_DUPLICATE, meta={"file_path": str(b_path)})
+    result = near_duplicate_filter.run(documents=[original, duplicate])
+    near_duplicate_filter.commit()
+    store.write_documents(result["documents"] + result["duplicates"])
+
+    assert service._delete_documents(str(a_path), near_duplicate_filter) == 1
+
+    # The duplicate, stored without an embedding, is dropped and its file indexed again
+    assert store.count_documents() == 0
+    service.index_files.assert_called_once_with(str(b_path))
+    assert near_duplicate_filter.index.duplicates_of([original.id]) == {}
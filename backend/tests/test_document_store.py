@@ -0,0 +1,141 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from unittest.mock import Mock, patch
+from haystack import Document
+from haystack.components.retrievers.in_memory import InMemoryBM25Retriever
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from opensearchpy import OpenSearch
+
+from common.local_store import LocalBM25Retriever, LocalDocumentStore, LocalEmbeddingRetriever
+from common.document_store import (
+    PooledOpenSearchDocumentStore,
+    create_retrievers,
+    delete_documents_by_file,
+    initialize_document_store,
+    tenant_document_store,
+)
+
+
+@patch("haystack_integrations.document_stores.opensearch.document_store.OpenSearch")
+def test_index_existence_checked_once(mock_opensearch):
+    mock_opensearch.return_value.indices.exists.return_value = True
+    store = PooledOpenSearchDocumentStore(hosts="http://localhost:9200")
+
+    assert store.client is store.client
+    mock_opensearch.assert_called_once()
+    mock_opensearch.return_value.indices.exists.assert_called_once()
+
+def test_initialize_document_store_configures_pool():
+    store = initialize_document_store()
+
+    assert isinstance(store, PooledOpenSearchDocumentStore)
+    assert store.to_dict()["init_parameters"]["pool_maxsize"] == 20
+
+def test_initialize_document_store_maps_filterable_metadata():
+    store = initialize_document_store()
+    properties = store._mappings["properties"]
+
+    assert properties["embedding"]["method"]["engine"] == "lucene"
+    assert properties["uploaded_at"] == {"type": "date"}
+    assert properties["tenant"] == {"type": "keyword"}
+
+    _, embedding_retriever = create_retrievers(store)
+    assert embedding_retriever._efficient_filtering is True
+
+def test_no_efficient_filtering_without_supporting_engine():
+    store = PooledOpenSearchDocumentStore(hosts="http://localhost:9200")
+
+    _, embedding_retriever = create_retrievers(store)
+
+    assert embedding_retriever._efficient_filtering is False
+
+def test_pool_stats():
+    store = PooledOpenSearchDocumentStore(hosts="http://localhost:9200", pool_maxsize=5)
+    assert store.pool_stats() == {"connections": []}
+
+    # Client creation doesn't open connections
+    store._client = OpenSearch(hosts="http://localhost:9200", pool_maxsize=5)
+    stats = store.pool_stats()["connections"]
+
+    assert len(stats) == 1
+    assert stats[0]["maxsize"] == 5
+    assert stats[0]["in_use"] == 0
+    assert stats[0]["opened"] == 0
+
+@patch("common.document_store.settings")
+def test_memory_document_store_is_shared(mock_settings):
+    mock_settings.document_store = "memory"
+
+    store = initialize_document_store()
+    bm25, embedding = create_retrievers(store, top_k=3)
+
+    assert initialize_document_store() is store
+    assert isinstance(bm25, InMemoryBM25Retriever) and bm25.top_k == 3
+    assert embedding.document_store is store
+
+def test_delete_documents_by_file_in_memory():
+    store = InMemoryDocumentStore()
+    store.write_documents([
+        Document(content="a", meta={"file_path": "/files/a.txt"}),
+        Document(content="b", meta={"file_path": "/files/a.txt"}),
+        Document(content="c", meta={"file_path": "/files/c.txt"}),
+    ])
+
+    assert delete_documents_by_file(store, "/files/a.txt") == 2
+    assert [doc.content for doc in store.filter_documents()] == ["c"]
+
+def test_delete_documents_by_file_uses_delete_by_query():
+    store = PooledOpenSearchDocumentStore(hosts="http://localhost:9200", index="docs")
+    store._client = Mock()
+    store._index_ready = True
+    store._client.delete_by_query.return_value = {"deleted": 3}
+
+    assert delete_documents_by_file(store, "/files/a.txt") == 3
+    store._client.delete_by_query.assert_called_once_with(
+        index="docs", body={"query": {"term": {"file_path": "/files/a.txt"}}}, refresh=True, conflicts="proceed"
+    )
+
+@patch("common.document_store.settings")
+def test_memory_document_store_per_tenant(mock_settings):
+    mock_settings.document_store = "memory"
+
+    default = initialize_document_store()
+    acme = tenant_document_store(default, "acme")
+
+    assert acme is not default
+    assert tenant_document_store(default, "acme") is acme
+    assert tenant_document_store(default, None) is default
+
+@patch("haystack_integrations.document_stores.opensearch.document_store.OpenSearch")
+def test_tenant_store_shares_connections(mock_opensearch):
+    mock_opensearch.return_value.indices.exists.return_value = True
+    store = PooledOpenSearchDocumentStore(hosts="http://localhost:9200")
+
+    tenant_store = tenant_document_store(store, "acme")
+
+    assert tenant_store._index == "tenant-acme"
+    assert tenant_store.client is store.client
+    mock_opensearch.assert_called_once()
+    mock_opensearch.return_value.indices.exists.assert_any_call(index="tenant-acme")
+
+@patch("common.document_store.settings")
+def test_local_document_store_per_tenant(mock_settings, tmp_path):
+    mock_settings.document_store = "local"
+    mock_settings.use_openai_embedder = False
+    mock_settings.file_storage_path = tmp_path
+
+    default = initialize_document_store()
+    acme = tenant_document_store(default, "acme")
+    bm25, embedding = create_retrievers(acme, top_k=3)
+
+    assert isinstance(default, LocalDocumentStore) and default.embedding_dim == 768
+    assert default.path == tmp_path / ".index" / "default"
+    assert acme.path == tmp_path / ".index" / "tenant-acme"
+    assert tenant_document_store(default, "acme") is acme
+    assert isinstance(bm25, LocalBM25Retriever) and bm25.top_k == 3
+    assert isinstance(embedding, LocalEmbeddingRetriever) and embedding.document_store is acme
@@ -0,0 +1,38 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from haystack import Document
+
+from query.extractive import SpanExtractor
+
+
+DOCUMENTS = [
+    Document(content="OpenSearch stores the chunks. The reranker reorders them by relevance. Nothing else happens here."),
+    Document(content="The indexing service splits files into chunks. Chunks are embedded with the embedding model."),
+]
+
+def test_extracts_best_span_with_offsets():
+    answers = SpanExtractor(top_k=2).run(query="How are chunks embedded?", documents=DOCUMENTS)["answers"]
+
+    best = answers[0]
+    assert best.document is DOCUMENTS[1]
+    assert best.data == "Chunks are embedded with the embedding model."
+    assert best.document.content[best.document_offset.start:best.document_offset.end] == best.data
+    assert best.context[best.context_offset.start:best.context_offset.end] == best.data
+    assert best.score > answers[1].score
+
+def test_span_length_is_capped():
+    extractor = SpanExtractor(max_span_chars=40, context_chars=0)
+
+    answer = extractor.run(query="reranker relevance chunks", documents=DOCUMENTS[:1])["answers"][0]
+
+    assert answer.data == "The reranker reorders them by relevance."
+    assert answer.context == answer.data
+
+def test_no_answer_without_matching_terms():
+    assert SpanExtractor().run(query="kubernetes", documents=DOCUMENTS)["answers"] == []
+    assert SpanExtractor().run(query="the of", documents=DOCUMENTS)["answers"] == []
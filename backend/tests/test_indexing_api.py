@@ -47,10 +47,48 @@ def test_get_files(mock_indexing_service):
 
     response = client.get("/files")
     assert response.status_code == 200
-    assert response.json() == {"files": ["file1.txt", "file2.txt"]}
+    assert response.json() == {"files": ["file1.txt", "file2.txt"], "total": 2}
     mock_indexing_service.rescan_files_and_paths.assert_called_once()
     app.dependency_overrides.clear()
 
+def test_get_files_paged_and_revalidated(mock_indexing_service):
+    app.dependency_overrides[get_indexing_service] = lambda: mock_indexing_service
+    mock_indexing_service.rescan_files_and_paths.return_value = ["file1.txt", "file2.txt", "file3.txt"]
+
+    response = client.get("/files", params={"offset": 1, "limit": 1})
+    assert response.json() == {"files": ["file2.txt"], "total": 3}
+
+    unchanged = client.get("/files", params={"offset": 1, "limit": 1}, headers={"If-None-Match": response.headers["etag"]})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+
+    # The ETag is the page's: another page of the same list is returned
+    other_page = client.get("/files", params={"offset": 2, "limit": 1}, headers={"If-None-Match": response.headers["etag"]})
+    assert other_page.status_code == 200 and other_page.json()["files"] == ["file3.txt"]
+
+    mock_indexing_service.rescan_files_and_paths.return_value = ["file1.txt"]
+    changed = client.get("/files", params={"offset": 1, "limit": 1}, headers={"If-None-Match": response.headers["etag"]})
+    assert changed.status_code == 200 and changed.json() == {"files": [], "total": 1}
+    app.dependency_overrides.clear()
+
+# Test /files/{name} delete
+def test_delete_file(mock_indexing_service):
+    app.dependency_overrides[get_indexing_service] = lambda: mock_indexing_service
+    mock_indexing_service.delete_file.return_value = 4
+
+    response = client.delete("/files/file1.txt")
+    assert response.status_code == 200
+    assert response.json() == {"file_id": "file1.txt", "status": "deleted", "documents_deleted": 4}
+    mock_indexing_service.delete_file.assert_called_once_with("file1.txt")
+    app.dependency_overrides.clear()
+
+def test_delete_missing_file(mock_indexing_service):
+    app.dependency_overrides[get_indexing_service] = lambda: mock_indexing_service
+    mock_indexing_service.delete_file.side_effect = FileNotFoundError("missing.txt")
+
+    response = client.delete("/files/missing.txt")
+    assert response.status_code == 404
+    app.dependency_overrides.clear()
+
 # Test /
 def test_root():
     response = client.get("/")
@@ -1,7 +1,11 @@
+import os
+import threading
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 from pathlib import Path
 
+from haystack import Document
+
 from indexing.service import IndexingService, IndexingConfig
 from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
 
@@ -67,4 +71,94 @@ def test_index_files_processing(indexing_service):
         # Just verify it was called, since the actual arguments might vary
         assert mock_write.call_count > 0
     finally:
-        test_file.unlink() 
\ No newline at end of file
+        test_file.unlink() 
+
+@patch("indexing.service.document_ids_by_file", return_value=["old", "unchanged"])
+def test_save_uploaded_file_replaces_previous_version(mock_ids, indexing_service, tmp_path):
+    previous_path = tmp_path / "file.txt"
+    previous_path.write_text("old content")
+    store = indexing_service.config.document_store
+    calls = Mock()
+    calls.attach_mock(store.delete_documents, "delete_documents")
+    indexing_service.file_manager.get_file_path = Mock(return_value=str(previous_path))
+    indexing_service.file_manager.save_file = Mock(return_value=str(previous_path))
+    indexing_service.index_files = calls.index_files
+    indexing_service.index_files.return_value = {
+        "document_embedder": {"documents": [Document(id="unchanged", content="a"), Document(id="new", content="b")]}
+    }
+
+    indexing_service.save_uploaded_file("file.txt", b"new content")
+
+    # The new version is indexed first, then the previous version's other chunks are deleted
+    assert calls.mock_calls == [
+        call.index_files(str(previous_path), with_chunks=True),
+        call.delete_documents(["old"]),
+    ]
+
+@patch("indexing.service.document_ids_by_file", side_effect=[["old"], ["old", "partial"]])
+def test_failed_replacement_keeps_previous_version(mock_ids, indexing_service, tmp_path):
+    previous_path = tmp_path / "file.txt"
+    previous_path.write_text("old content")
+    os.utime(previous_path, (1700000000, 1700000000))
+    indexing_service.file_manager.get_file_path = Mock(return_value=str(previous_path))
+    indexing_service.file_manager.save_file = Mock(
+        side_effect=lambda name, contents: previous_path.write_bytes(contents) and str(previous_path)
+    )
+    indexing_service.index_files = Mock(side_effect=RuntimeError("embedder unavailable"))
+
+    with pytest.raises(RuntimeError):
+        indexing_service.save_uploaded_file("file.txt", b"new content")
+
+    # Chunks written of the new version are deleted, and the previous file is put back
+    indexing_service.config.document_store.delete_documents.assert_called_once_with(["partial"])
+    assert previous_path.read_text() == "old content"
+    assert os.stat(previous_path).st_mtime == 1700000000
+
+@patch("indexing.service.delete_documents_by_file", return_value=3)
+def test_delete_file(mock_delete, indexing_service):
+    indexing_service.file_manager.get_file_path = Mock(return_value="/path/to/saved/file.txt")
+    indexing_service.file_manager.delete_file = Mock()
+
+    assert indexing_service.delete_file("file.txt") == 3
+    mock_delete.assert_called_once_with(indexing_service.config.document_store, "/path/to/saved/file.txt")
+    indexing_service.file_manager.delete_file.assert_called_once_with("file.txt")
+
+def test_delete_missing_file(indexing_service):
+    indexing_service.file_manager.get_file_path = Mock(return_value=None)
+
+    with pytest.raises(FileNotFoundError):
+        indexing_service.delete_file("missing.txt")
+
+def test_delete_waits_for_a_replacement(indexing_service, tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("content")
+    indexing_service.file_manager.get_file_path = Mock(return_value=str(path))
+    indexing_service.file_manager.save_file = Mock(return_value=str(path))
+    indexing_service.file_manager.delete_file = Mock()
+    started, release = threading.Event(), threading.Event()
+    events = []
+
+    def index_files(full_path, with_chunks=False):
+        started.set()
+        release.wait(5)
+        events.append("indexed")
+        return {}
+    indexing_service.index_files = index_files
+
+    def delete_documents(store, full_path):
+        events.append("deleted")
+        return 1
+
+    with patch("indexing.service.document_ids_by_file", return_value=[]), \
+            patch("indexing.service.delete_documents_by_file", side_effect=delete_documents):
+        upload = threading.Thread(target=indexing_service.save_uploaded_file, args=("file.txt", b"new"))
+        upload.start()
+        started.wait(5)
+        delete = threading.Thread(target=indexing_service.delete_file, args=("file.txt",))
+        delete.start()
+        delete.join(0.2)
+        release.set()
+        upload.join(5)
+        delete.join(5)
+
+    assert events == ["indexed", "deleted"]
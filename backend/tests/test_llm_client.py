@@ -0,0 +1,117 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from haystack.components.embedders import OpenAITextEmbedder
+
+from common.llm_client import create_openai_client, use_shared_client, get_openai_client
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible embeddings endpoint with scripted failures and delays."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            n = server.requests
+        if n <= server.fail_first:
+            return self._send(500, {"error": {"message": "upstream error", "type": "server_error"}})
+        if n in server.slow_requests:
+            time.sleep(server.slow_delay)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        self._send(200, {
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), float(n)]}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        })
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_openai():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.fail_first = 0
+    server.slow_requests = set()
+    server.slow_delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def test_client_retries_failed_calls(fake_openai):
+    fake_openai.fail_first = 2
+    client = create_openai_client(api_key="test", base_url=base_url(fake_openai), max_retries=2)
+
+    response = client.embeddings.create(model="test-embedding", input="hello")
+
+    assert response.data[0].embedding == [5.0, 3.0]
+    assert fake_openai.requests == 3
+
+def test_client_gives_up_after_max_retries(fake_openai):
+    fake_openai.fail_first = 10
+    client = create_openai_client(api_key="test", base_url=base_url(fake_openai), max_retries=1)
+
+    with pytest.raises(Exception):
+        client.embeddings.create(model="test-embedding", input="hello")
+    assert fake_openai.requests == 2
+
+def test_client_deadline(fake_openai):
+    fake_openai.slow_requests = {1}
+    fake_openai.slow_delay = 1.0
+    client = create_openai_client(api_key="test", base_url=base_url(fake_openai), timeout=0.2, max_retries=0)
+
+    start = time.perf_counter()
+    with pytest.raises(Exception):
+        client.embeddings.create(model="test-embedding", input="hello")
+    assert time.perf_counter() - start < 0.9
+
+def test_hedged_request_returns_fastest_response(fake_openai):
+    fake_openai.slow_requests = {1}
+    fake_openai.slow_delay = 1.0
+    client = create_openai_client(
+        api_key="test", base_url=base_url(fake_openai), hedge_delay_ms=50, max_retries=0
+    )
+
+    start = time.perf_counter()
+    response = client.embeddings.create(model="test-embedding", input="hello")
+
+    assert time.perf_counter() - start < 0.9
+    # The hedged (second) request answered first
+    assert response.data[0].embedding == [5.0, 2.0]
+
+def test_components_share_one_client():
+    first = use_shared_client(OpenAITextEmbedder())
+    second = use_shared_client(OpenAITextEmbedder())
+
+    assert first.client is second.client is get_openai_client()
@@ -0,0 +1,149 @@
+from pathlib import Path
+import sys
+import threading
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pytest
+from haystack import Document
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack.document_stores.types import DuplicatePolicy
+
+from common.local_store import LocalBM25Retriever, LocalDocumentStore, LocalEmbeddingRetriever
+
+
+def make_documents():
+    return [
+        Document(
+            id=str(i),
+            content=f"Chunk {i} about {'cats' if i % 2 else 'dogs'}",
+            embedding=[1.0, i / 10, 0.0, 0.0] if i < 8 else None,
+            meta={"file_path": f"/files/{i % 3}.txt", "uploaded_at": f"2024-01-{i + 1:02d}T00:00:00", "page": i},
+        )
+        for i in range(10)
+    ]
+
+def test_documents_persist(tmp_path):
+    store = LocalDocumentStore(tmp_path, embedding_dim=4)
+    assert store.write_documents(make_documents()) == 10
+
+    reopened = LocalDocumentStore(tmp_path, embedding_dim=4)
+    documents = reopened.filter_documents()
+
+    assert reopened.count_documents() == 10
+    assert [doc.meta["page"] for doc in documents] == list(range(10))
+    assert documents[1].embedding == pytest.approx([0.995, 0.0995, 0, 0], abs=1e-3)  # normalized
+    assert documents[9].embedding is None
+    with pytest.raises(ValueError, match="4-dimensional"):
+        LocalDocumentStore(tmp_path, embedding_dim=8).count_documents()
+
+@pytest.mark.parametrize("filters", [
+    {"field": "meta.file_path", "operator": "==", "value": "/files/1.txt"},
+    {"field": "meta.page", "operator": ">=", "value": 7},
+    {"field": "meta.uploaded_at", "operator": "<", "value": "2024-01-04T00:00:00"},
+    {"operator": "OR", "conditions": [
+        {"field": "meta.file_path", "operator": "in", "value": ["/files/0.txt"]},
+        {"operator": "NOT", "conditions": [{"field": "meta.page", "operator": "<", "value": 8}]},
+    ]},
+])
+def test_filters_match_haystack_semantics(tmp_path, filters):
+    store = LocalDocumentStore(tmp_path, embedding_dim=4)
+    store.write_documents(make_documents())
+    reference = InMemoryDocumentStore()
+    reference.write_documents(make_documents())
+
+    assert {doc.id for doc in store.filter_documents(filters)} == {doc.id for doc in reference.filter_documents(filters)}
+
+def test_retrievers_filter_before_ranking(tmp_path):
+    store = LocalDocumentStore(tmp_path, embedding_dim=4)
+    store.write_documents(make_documents())
+    filters = {"field": "meta.file_path", "operator": "==", "value": "/files/2.txt"}
+
+    bm25 = LocalBM25Retriever(store, top_k=2).run(query="cats", filters=filters)["documents"]
+    embedding = LocalEmbeddingRetriever(store, top_k=2).run(query_embedding=[1.0, 0.7, 0, 0])["documents"]
+    filtered = LocalEmbeddingRetriever(store, top_k=2).run(query_embedding=[1.0, 0.7, 0, 0], filters=filters)["documents"]
+
+    assert [doc.id for doc in bm25] == ["5"]
+    assert [doc.id for doc in embedding] == ["7", "6"]
+    assert [doc.id for doc in filtered] == ["5", "2"]
+    assert embedding[0].score > embedding[1].score and embedding[0].embedding is None
+
+def test_duplicate_policies(tmp_path):
+    store = LocalDocumentStore(tmp_path, embedding_dim=4)
+    store.write_documents(make_documents())
+    changed = Document(id="3", content="Replaced", embedding=[0.0, 1.0, 0.0, 0.0])
+
+    with pytest.raises(DuplicateDocumentError):
+        store.write_documents([changed])
+    assert store.write_documents([changed], policy=DuplicatePolicy.SKIP) == 0
+    assert store.write_documents([changed], policy=DuplicatePolicy.OVERWRITE) == 1
+
+    assert store.count_documents() == 10
+    assert store.filter_documents({"field": "id", "operator": "==", "value": "3"})[0].content == "Replaced"
+    assert store.bm25_retrieval("replaced")[0].id == "3"
+
+def test_stores_share_a_directory(tmp_path):
+    writer = LocalDocumentStore(tmp_path, embedding_dim=4)
+    reader = LocalDocumentStore(tmp_path, embedding_dim=4)
+    assert reader.count_documents() == 0
+
+    writer.write_documents(make_documents())
+    assert reader.embedding_retrieval([1.0, 0.0, 0.0, 0.0], top_k=1)[0].id == "0"
+
+    # Deleting most rows rewrites the embeddings file
+    extra = [Document(content=f"extra {i}", embedding=[0.0, 0.0, 1.0, i]) for i in range(2000)]
+    writer.write_documents(extra)
+    writer.delete_documents([doc.id for doc in extra] + ["0"])
+
+    assert sorted(path.name for path in tmp_path.glob("*.f32")) == ["embeddings-1.f32"]
+    assert reader.count_documents() == 9
+    assert reader.embedding_retrieval([1.0, 0.0, 0.0, 0.0], top_k=1)[0].id == "1"
+    assert reader.bm25_retrieval("extra") == []
+
+def test_stores_reload_only_changes(tmp_path):
+    writer = LocalDocumentStore(tmp_path, embedding_dim=4)
+    reader = LocalDocumentStore(tmp_path, embedding_dim=4)
+    writer.write_documents(make_documents())
+    assert reader.count_documents() == 10
+    loaded = dict(reader._snapshot.documents)
+
+    writer.delete_documents(["1"])
+    writer.write_documents([Document(id="3", content="Replaced", embedding=[0.0, 1.0, 0.0, 0.0])],
+                           policy=DuplicatePolicy.OVERWRITE)
+    writer.write_documents([Document(id="new", content="New dogs", embedding=[0.0, 0.0, 0.0, 1.0])])
+
+    assert reader.count_documents() == 10
+    documents = reader._snapshot.documents
+    # Unchanged documents aren't parsed again
+    assert all(documents[key] is doc for key, doc in loaded.items() if doc.id not in ("1", "3"))
+    assert reader.filter_documents({"field": "id", "operator": "==", "value": "3"})[0].content == "Replaced"
+    assert reader.embedding_retrieval([0.0, 0.0, 0.0, 1.0], top_k=1)[0].id == "new"
+    assert reader.embedding_retrieval([0.0, 1.0, 0.0, 0.0], top_k=1)[0].id == "3"
+    assert "1" not in {doc.id for doc in reader.bm25_retrieval("cats")}
+
+def test_searches_run_alongside_writes(tmp_path):
+    store = LocalDocumentStore(tmp_path, embedding_dim=4)
+    store.write_documents(make_documents())
+    errors = []
+
+    def search():
+        try:
+            for _ in range(50):
+                assert store.bm25_retrieval("cats", top_k=3)
+                assert store.embedding_retrieval([1.0, 0.0, 0.0, 0.0], top_k=3)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(20):
+        store.write_documents([Document(content=f"more cats {i}", embedding=[1.0, 0.5, 0.0, i])])
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.count_documents() == 30
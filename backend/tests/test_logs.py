@@ -0,0 +1,41 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import json
+import logging
+
+from common.logs import JsonFormatter, SamplingFilter
+
+
+def make_record(msg: str, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record("Search done", event="search", documents=3, sample=True))
+
+    entry = json.loads(line)
+    assert entry["message"] == "Search done"
+    assert entry["level"] == "INFO"
+    assert entry["event"] == "search" and entry["documents"] == 3
+    assert "sample" not in entry
+
+def test_json_formatter_caps_large_values():
+    formatter = JsonFormatter(max_chars=20)
+
+    entry = json.loads(formatter.format(make_record("x" * 50, sources=[f"/files/{i}.pdf" for i in range(100)])))
+
+    assert entry["message"].startswith("x" * 20) and entry["message"].endswith("(50 chars)")
+    assert isinstance(entry["sources"], str) and len(entry["sources"]) < 50
+
+def test_sampling_filter_only_samples_flagged_records():
+    sampling = SamplingFilter(rate=0.0)
+
+    assert not sampling.filter(make_record("per request", sample=True))
+    assert sampling.filter(make_record("startup"))
+    assert SamplingFilter(rate=1.0).filter(make_record("per request", sample=True))
@@ -0,0 +1,39 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import os
+
+from haystack import Document
+
+from indexing.metadata import MetadataEnricher
+
+
+def test_enrich_metadata(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("# Notes")
+    os.utime(path, (0, 86400))
+    documents = [Document(content="a", meta={"file_path": str(path)}), Document(content="b")]
+
+    result = MetadataEnricher(tenant="acme").run(documents=documents)["documents"]
+
+    assert result[0].meta == {
+        "file_path": str(path),
+        "file_name": "notes.md",
+        "file_type": "text/markdown",
+        "uploaded_at": "1970-01-02T00:00:00+00:00",
+        "tenant": "acme",
+    }
+    assert result[1].meta == {"tenant": "acme"}
+
+def test_missing_file_has_no_upload_date():
+    document = Document(content="a", meta={"file_path": "/nonexistent/report.pdf"})
+
+    meta = MetadataEnricher().run(documents=[document])["documents"][0].meta
+
+    assert meta["file_type"] == "application/pdf"
+    assert "uploaded_at" not in meta
+    assert "tenant" not in meta
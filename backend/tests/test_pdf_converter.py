@@ -0,0 +1,64 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+from haystack.dataclasses import ByteStream
+
+from indexing.pdf_converter import ParallelPDFToDocument
+from synthetic import make_pdf
+
+
+PAGES = [f"Page {i} talks about topic{i}" for i in range(1, 9)] + [""]
+
+def test_pages_to_documents(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf(PAGES))
+
+    documents = ParallelPDFToDocument(max_workers=1).run(sources=[path])["documents"]
+
+    # The empty last page is skipped
+    assert [doc.meta["page_number"] for doc in documents] == list(range(1, 9))
+    assert "topic3" in documents[2].content
+    assert documents[0].meta["file_path"] == str(path)
+
+def test_parallel_extraction_matches_serial():
+    source = ByteStream(make_pdf(PAGES), meta={"file_path": "report.pdf"})
+    converter = ParallelPDFToDocument(max_workers=2, min_pages_per_worker=2)
+
+    try:
+        parallel = converter.run(sources=[source])["documents"]
+    finally:
+        converter.close()
+    serial = ParallelPDFToDocument(max_workers=1).run(sources=[source])["documents"]
+
+    assert [doc.content for doc in parallel] == [doc.content for doc in serial]
+
+def test_page_cache(tmp_path):
+    converter = ParallelPDFToDocument(max_workers=1, cache_dir=str(tmp_path))
+    first = converter.run(sources=[ByteStream(make_pdf(PAGES[:4]))])["documents"]
+    assert converter.cache.stats() == {"hits": 0, "misses": 4}
+
+    # A different file sharing three pages only extracts the new one
+    second = converter.run(sources=[ByteStream(make_pdf(PAGES[1:5]))])["documents"]
+
+    assert converter.cache.stats() == {"hits": 3, "misses": 5}
+    assert [doc.content for doc in second[:3]] == [doc.content for doc in first[1:]]
+
+def test_page_cache_hits_with_indirect_font_parts(tmp_path):
+    # Real PDFs reference their font widths and descriptors indirectly
+    data = make_pdf(PAGES[:3], indirect_font_parts=True)
+    converter = ParallelPDFToDocument(max_workers=1, cache_dir=str(tmp_path))
+
+    first = converter.run(sources=[ByteStream(data)])["documents"]
+    second = converter.run(sources=[ByteStream(data)])["documents"]
+
+    assert converter.cache.stats() == {"hits": 3, "misses": 3}
+    assert [doc.content for doc in second] == [doc.content for doc in first]
+
+def test_invalid_source_is_skipped():
+    documents = ParallelPDFToDocument().run(sources=[ByteStream(b"not a pdf")])["documents"]
+    assert documents == []
@@ -0,0 +1,94 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import os
+
+from haystack import Pipeline
+from haystack.components.retrievers.in_memory import InMemoryBM25Retriever
+from haystack.components.writers import DocumentWriter
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+from common import pipeline_loader
+from common.pipeline_loader import PipelineReloader, load_pipeline
+
+
+def write_pipeline(path: Path, top_k: int = 10):
+    store = InMemoryDocumentStore(index="test")
+    p = Pipeline()
+    p.add_component("retriever", InMemoryBM25Retriever(document_store=store, top_k=top_k))
+    p.add_component("writer", DocumentWriter(document_store=store))
+    path.write_text(p.dumps())
+
+def test_load_pipeline_shares_document_stores(tmp_path):
+    write_pipeline(tmp_path / "test.yml")
+
+    pipeline = load_pipeline(tmp_path, "test.yml", cache_dir=None)
+
+    retriever, writer = pipeline.get_component("retriever"), pipeline.get_component("writer")
+    assert retriever.document_store is writer.document_store
+
+def test_load_pipeline_caches_definition(tmp_path):
+    write_pipeline(tmp_path / "test.yml")
+    cache_dir = tmp_path / "cache"
+
+    load_pipeline(tmp_path, "test.yml", cache_dir=cache_dir)
+    cached = list(cache_dir.glob("test-*.marshal"))
+    assert len(cached) == 1
+
+    # A changed definition replaces the cache entry
+    write_pipeline(tmp_path / "test.yml", top_k=3)
+    pipeline = load_pipeline(tmp_path, "test.yml", cache_dir=cache_dir)
+    assert pipeline.get_component("retriever").top_k == 3
+    assert list(cache_dir.glob("test-*.marshal")) != cached
+    assert len(list(cache_dir.glob("test-*.marshal"))) == 1
+
+def test_reloader_loads_changed_definition(tmp_path):
+    path = tmp_path / "test.yml"
+    write_pipeline(path)
+    reloader = PipelineReloader(tmp_path, "test.yml", interval=0, cache_dir=None)
+
+    assert reloader.reload_if_changed() is None
+
+    write_pipeline(path, top_k=3)
+    os.utime(path, ns=(0, 1))
+    # The changed definition is built in the background
+    assert reloader.reload_if_changed() is None
+    reloader.wait()
+    pipeline = reloader.reload_if_changed()
+    assert pipeline.get_component("retriever").top_k == 3
+
+    # A broken definition is ignored
+    path.write_text("components: [")
+    os.utime(path, ns=(0, 2))
+    reloader.reload_if_changed()
+    reloader.wait()
+    assert reloader.reload_if_changed() is None
+    assert reloader.pipeline is pipeline
+
+def test_reloader_closes_replaced_pipeline_after_its_runs(tmp_path, monkeypatch):
+    closed = []
+    monkeypatch.setattr(pipeline_loader, "close_pipeline", closed.append)
+    path = tmp_path / "test.yml"
+    write_pipeline(path)
+    current = load_pipeline(tmp_path, "test.yml", cache_dir=None)
+    reloader = PipelineReloader(
+        tmp_path, "test.yml", interval=0, cache_dir=None, pipeline=current,
+        prepare=lambda pipeline: pipeline.get_component("retriever").top_k,
+    )
+
+    with reloader.lease() as leased:
+        assert leased is current
+        write_pipeline(path, top_k=3)
+        os.utime(path, ns=(0, 1))
+        reloader.reload_if_changed()
+        reloader.wait()
+        with reloader.lease() as new:
+            assert new is not current and new.get_component("retriever").top_k == 3
+            assert reloader.prepared(new) == 3
+        # The replaced pipeline is still running, with its own prepared state
+        assert closed == [] and reloader.prepared(leased) == 10
+    assert closed == [current] and reloader.prepared(current) is None
@@ -0,0 +1,52 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import random
+
+import pytest
+from haystack import Document
+from haystack.components.preprocessors import DocumentCleaner, DocumentSplitter
+
+from indexing.preprocessors import FastDocumentCleaner, FastDocumentSplitter
+
+
+def random_texts(n: int):
+    rng = random.Random(0)
+    pieces = ["a", "bb", "é", " ", "  ", "\n", "\n\n", "\f", "\t", ".", "\xa0", " \n ", "word"]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 80))) for _ in range(n)]
+
+def as_tuples(documents):
+    return [(doc.id, doc.content, doc.meta) for doc in documents]
+
+def test_cleaner_matches_document_cleaner():
+    documents = [Document(content=text, meta={"file_path": "a.txt"}) for text in random_texts(300)]
+
+    expected = DocumentCleaner().run(documents=documents)["documents"]
+    actual = FastDocumentCleaner().run(documents=documents)["documents"]
+
+    assert as_tuples(actual) == as_tuples(expected)
+
+@pytest.mark.parametrize("split_by", ["word", "sentence", "page", "passage", "line"])
+@pytest.mark.parametrize("split_length,split_overlap,split_threshold", [(1, 0, 0), (3, 1, 0), (5, 2, 2), (4, 0, 3)])
+def test_splitter_matches_document_splitter(split_by, split_length, split_overlap, split_threshold):
+    documents = [Document(content=text, meta={"file_path": "a.txt"}) for text in random_texts(100)]
+    params = dict(
+        split_by=split_by, split_length=split_length, split_overlap=split_overlap, split_threshold=split_threshold
+    )
+
+    expected = DocumentSplitter(**params).run(documents=documents)["documents"]
+    actual = FastDocumentSplitter(**params).run(documents=documents)["documents"]
+
+    assert as_tuples(actual) == as_tuples(expected)
+
+def test_splitter_keeps_page_number():
+    document = Document(content="one two three\ffour five", meta={"page_number": 7})
+
+    splits = FastDocumentSplitter(split_by="word", split_length=1).run(documents=[document])["documents"]
+
+    assert [doc.meta["page_number"] for doc in splits] == [7, 7, 7, 8]
+    assert [doc.meta["split_idx_start"] for doc in splits] == [0, 4, 8, 19]
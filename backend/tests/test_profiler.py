@@ -0,0 +1,103 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import json
+
+from typing import List
+
+from haystack import Document, Pipeline, component
+from haystack.components.converters import MarkdownToDocument, TextFileToDocument
+from haystack.components.joiners import DocumentJoiner
+from haystack.components.preprocessors import DocumentSplitter
+from haystack.components.routers import FileTypeRouter
+from haystack.components.writers import DocumentWriter
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+from indexing.profiler import PipelineProfiler
+
+
+def create_pipeline(document_store):
+    p = Pipeline()
+    p.add_component("file_type_router", FileTypeRouter(mime_types=["text/plain", "text/markdown"]))
+    p.add_component("text_file_converter", TextFileToDocument())
+    p.add_component("markdown_converter", MarkdownToDocument())
+    p.add_component("document_joiner", DocumentJoiner(join_mode="concatenate"))
+    p.add_component("document_splitter", DocumentSplitter(split_by="word", split_length=10, split_overlap=0))
+    p.add_component("document_writer", DocumentWriter(document_store=document_store))
+    p.connect("file_type_router.text/plain", "text_file_converter.sources")
+    p.connect("file_type_router.text/markdown", "markdown_converter.sources")
+    p.connect("text_file_converter", "document_joiner.documents")
+    p.connect("markdown_converter", "document_joiner.documents")
+    p.connect("document_joiner", "document_splitter")
+    p.connect("document_splitter", "document_writer")
+    return p
+
+def test_profile_per_stage_and_mime_type(tmp_path):
+    text_file = tmp_path / "a.txt"
+    text_file.write_text(" ".join(["word"] * 25))
+    markdown_file = tmp_path / "b.md"
+    markdown_file.write_text("# Title\n\nSome markdown text")
+    sources = [str(text_file), str(markdown_file)]
+
+    pipeline = create_pipeline(InMemoryDocumentStore())
+    profiler = PipelineProfiler(pipeline)
+    with profiler.profile(sources) as report:
+        pipeline.run({"file_type_router": {"sources": sources}})
+
+    stages = report["stages"]
+    assert set(stages) == set(pipeline.graph.nodes)
+    assert stages["document_splitter"]["documents_in"] == 2
+    assert stages["document_splitter"]["documents_out"] == 4
+    assert 0 < sum(stage["share"] for stage in stages.values()) <= 1
+
+    text = report["mime_types"]["text/plain"]
+    assert text["files"] == 1
+    assert text["bytes"] == text_file.stat().st_size
+    assert text["documents"] == {"text_file_converter": 1, "document_joiner": 1, "document_splitter": 3}
+    assert text["conversion_time_s"] > 0
+    assert report["mime_types"]["text/markdown"]["documents"]["document_splitter"] == 1
+
+    assert "Indexed 2 files" in profiler.summary(report)
+    path = profiler.write_report(report, tmp_path / "profiles")
+    assert json.loads(path.read_text())["files"] == 2
+
+def test_no_recording_outside_profile(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_text("some text")
+    pipeline = create_pipeline(InMemoryDocumentStore())
+    profiler = PipelineProfiler(pipeline)
+
+    pipeline.run({"file_type_router": {"sources": [str(source)]}})
+
+    assert profiler.last_report is None
+
+
+@component
+class MemoryHungry:
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        buffer = bytearray(32 * 1024 * 1024)
+        del buffer
+        return {"documents": documents}
+
+def test_run_peak_memory_is_the_highest_stage_peak(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_text(" ".join(["word"] * 25))
+    pipeline = Pipeline()
+    pipeline.add_component("text_file_converter", TextFileToDocument())
+    pipeline.add_component("memory_hungry", MemoryHungry())
+    pipeline.add_component("document_splitter", DocumentSplitter(split_by="word", split_length=10, split_overlap=0))
+    pipeline.connect("text_file_converter", "memory_hungry")
+    pipeline.connect("memory_hungry", "document_splitter")
+    profiler = PipelineProfiler(pipeline)
+
+    with profiler.profile([str(source)]) as report:
+        pipeline.run({"text_file_converter": {"sources": [str(source)]}})
+
+    # Later stages reset tracemalloc's peak: the run's peak still includes the first stage's
+    assert report["stages"]["memory_hungry"]["peak_memory_mb"] >= 32
+    assert report["peak_memory_mb"] >= report["stages"]["memory_hungry"]["peak_memory_mb"]
@@ -6,6 +6,9 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
 from query.main import app, get_query_service
+from query.breakers import DependencyUnavailableError
+from query.sessions import SessionStore
+from common.cancellation import DEADLINE, DISCONNECT, SearchCancelledError
 from common.models import SearchResponse
 
 
@@ -56,6 +59,107 @@ def test_search_endpoint_success(mock_query_service):
     mock_query_service.search.assert_called_once_with("test query", {"language": "python"})
     app.dependency_overrides.clear()
 
+def test_search_endpoint_without_content(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.search.return_value = GeneratedAnswer(
+        query="test query",
+        data="Test answer",
+        documents=[Document(content="test content", id="doc1", score=0.5, meta={"file_path": "/files/test.txt"})]
+    )
+
+    response = client.post("/search", json={"query": "test query", "include_content": False})
+
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert result["answers"][0]["document_ids"] == ["doc1"]
+    assert result["documents"] == [{
+        "id": "doc1",
+        "content": None,
+        "content_type": "text",
+        "meta": {"file_name": "test.txt", "split_idx_start": None},
+        "score": 0.5,
+    }]
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_retrieve_mode(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.retrieve.return_value = ([Document(content="test content", id="doc1", score=0.5)], ["embedder"])
+
+    response = client.post("/search", json={"query": "test query", "mode": "retrieve"})
+
+    assert response.status_code == 200
+    assert response.json()["degraded"] == ["embedder"]
+    result = response.json()["results"][0]
+    assert result["answers"] == []
+    assert [doc["id"] for doc in result["documents"]] == ["doc1"]
+    mock_query_service.retrieve.assert_called_once_with("test query", None)
+    mock_query_service.search.assert_not_called()
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_without_llm(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.search.return_value = GeneratedAnswer(
+        query="test query", data=None, documents=[Document(content="test content", id="doc1")], meta={"degraded": ["llm"]}
+    )
+
+    response = client.post("/search", json={"query": "test query"})
+
+    assert response.status_code == 200
+    assert response.json()["degraded"] == ["llm"]
+    assert response.json()["results"][0]["answers"] == []
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_with_session(mock_query_service, monkeypatch):
+    monkeypatch.setattr("query.main.session_store", SessionStore())
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.search_in_session.side_effect = lambda query, filters, session: GeneratedAnswer(
+        query=query,
+        data=f"answer after {len(session.turns)} turns",
+        documents=[Document(content="test content", id="doc1")],
+        meta={"reused_documents": bool(session.turns)}
+    )
+
+    for _ in range(2):
+        response = client.post("/search", json={"query": "test query", "session_id": "conversation-1"})
+
+    assert response.status_code == 200
+    assert response.json()["session_id"] == "conversation-1"
+    assert response.json()["results"][0]["answers"][0]["answer"] == "answer after 1 turns"
+    mock_query_service.search.assert_not_called()
+    assert client.post("/search", json={"query": "test query", "session_id": "not a valid id"}).status_code == 422
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_document_store_unavailable(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.search.side_effect = DependencyUnavailableError(
+        "document_store", "document_store unavailable (circuit open)", retry_after=12.5
+    )
+
+    response = client.post("/search", json={"query": "test query"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "13"
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_client_disconnected(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.search.side_effect = SearchCancelledError(DISCONNECT, "llm")
+
+    response = client.post("/search", json={"query": "test query"})
+
+    assert response.status_code == 499
+    app.dependency_overrides.clear()
+
+def test_search_endpoint_deadline_expired(mock_query_service):
+    app.dependency_overrides[get_query_service] = lambda: mock_query_service
+    mock_query_service.retrieve.side_effect = SearchCancelledError(DEADLINE, "document_store")
+
+    response = client.post("/search", json={"query": "test query", "mode": "retrieve"})
+
+    assert response.status_code == 504
+    assert "deadline" in response.json()["detail"]
+    app.dependency_overrides.clear()
+
 # Test input validation
 def test_search_endpoint_empty_query(mock_query_service):
     """Test that empty queries are rejected"""
@@ -66,9 +170,9 @@ def test_search_endpoint_empty_query(mock_query_service):
         json={"query": "", "filters": None}
     )
 
-    # The current implementation returns 500 for empty queries
-    assert response.status_code == 500
-    assert "validation error" in response.json()["detail"].lower()
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "query"]
+    mock_query_service.search.assert_not_called()
 
     app.dependency_overrides.clear()
 
@@ -125,3 +229,10 @@ def test_root():
     assert response.status_code == 200
     assert "message" in response.json()
     assert "documentation" in response.json()
+
+# Test metrics endpoint
+def test_metrics():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "connections" in response.json()["opensearch"]
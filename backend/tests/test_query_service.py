@@ -38,6 +38,7 @@ def test_search(query_service):
     # Verify
     mock_pipeline.run.assert_called_once_with({
         "bm25_retriever": {"query": "test query", "filters": {"filter": "value"}},
+        "embedding_retriever": {"filters": {"filter": "value"}},
         "query_embedder": {"text": "test query"},
         "answer_builder": {"query": "test query"},
         "prompt_builder": {"query": "test query"}
@@ -58,7 +59,9 @@ def test_pipeline_yaml_loading(mock_load_pipeline, mock_document_store):
     mock_pipeline = Mock()
     mock_load_pipeline.return_value = mock_pipeline
     
-    with patch("query.service.settings") as mock_settings:
+    # The retrieval-only and extractive pipelines are still built in code
+    with patch("query.service.settings") as mock_settings, patch("query.service.create_query_pipeline"), \
+            patch("query.service.create_generation_pipeline"):
         mock_settings.pipelines_from_yaml = True
         service = QueryService(document_store=mock_document_store)
         
@@ -83,4 +86,23 @@ def test_search_with_no_results(query_service):
     result = query_service.search("nonexistent query")
     assert isinstance(result, GeneratedAnswer)
     assert result.data == "No relevant information found"
-    assert len(result.documents) == 0
\ No newline at end of file
+    assert len(result.documents) == 0
+def test_fast_pipelines_skip_the_llm(query_service):
+    for mode in ("extractive", "retrieve"):
+        components = set(query_service.fast_pipelines[mode].graph.nodes)
+        assert {"query_embedder", "bm25_retriever", "embedding_retriever", "document_joiner"} <= components
+        assert not components & {"prompt_builder", "llm", "answer_builder"}
+    assert "span_extractor" in query_service.fast_pipelines["extractive"].graph.nodes
+
+def test_retrieve(query_service):
+    documents = [Document(content="test content", id="doc1")]
+    mock_pipeline = Mock()
+    mock_pipeline.run.return_value = {"document_joiner": {"documents": documents}}
+    query_service.fast_pipelines["retrieve"] = mock_pipeline
+
+    assert query_service.retrieve("test query", {"filter": "value"}) == (documents, [])
+    mock_pipeline.run.assert_called_once_with({
+        "bm25_retriever": {"query": "test query", "filters": {"filter": "value"}},
+        "embedding_retriever": {"filters": {"filter": "value"}},
+        "query_embedder": {"text": "test query"},
+    })
@@ -0,0 +1,95 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import time
+from typing import List
+from unittest.mock import Mock, patch
+
+import pytest
+from haystack import Document, component
+from haystack_integrations.document_stores.opensearch import OpenSearchDocumentStore
+
+from query.ranker import BudgetedRanker
+from query.service import QueryConfig, create_query_pipeline
+
+
+@component
+class FakeCrossEncoder:
+    """Scores documents by content length, optionally slowly."""
+
+    def __init__(self, model: str = "", top_k: int = 10, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    @component.output_types(documents=List[Document])
+    def run(self, query: str, documents: List[Document], top_k: int = 10):
+        self.calls.append([doc.id for doc in documents])
+        time.sleep(self.delay)
+        for doc in documents:
+            doc.score = float(len(doc.content))
+        return {"documents": sorted(documents, key=lambda d: d.score, reverse=True)[:top_k]}
+
+
+@pytest.fixture
+def documents():
+    return [Document(id=f"doc{i}", content="x" * i, score=1.0 / i) for i in range(1, 5)]
+
+def test_ranker_reorders_and_truncates(documents):
+    ranker = BudgetedRanker(ranker=FakeCrossEncoder(), top_k=2)
+
+    result = ranker.run(query="q", documents=documents)["documents"]
+
+    assert [doc.id for doc in result] == ["doc4", "doc3"]
+    assert result[0].score == 4.0
+    # Input documents are left untouched
+    assert documents[3].score == 0.25
+
+def test_ranker_uses_score_cache(documents):
+    encoder = FakeCrossEncoder()
+    ranker = BudgetedRanker(ranker=encoder, top_k=2)
+
+    ranker.run(query="q", documents=documents[:2])
+    ranker.run(query="q", documents=documents)
+
+    # Only the documents not scored yet for this query go to the model
+    assert encoder.calls == [["doc1", "doc2"], ["doc3", "doc4"]]
+
+def test_ranker_falls_back_when_over_budget(documents):
+    ranker = BudgetedRanker(ranker=FakeCrossEncoder(delay=0.5), top_k=2, latency_budget_ms=50)
+
+    result = ranker.run(query="q", documents=documents)["documents"]
+
+    assert [doc.id for doc in result] == ["doc1", "doc2"]
+
+def test_ranker_drops_stale_scorings_and_bounds_the_queue(documents):
+    encoder = FakeCrossEncoder(delay=0.3)
+    ranker = BudgetedRanker(ranker=encoder, top_k=2, latency_budget_ms=50, max_pending=2)
+
+    # The first scoring runs past the budget; the second waits for it and is dropped
+    for query in ("q1", "q2"):
+        assert [doc.id for doc in ranker.run(query=query, documents=documents)["documents"]] == ["doc1", "doc2"]
+    time.sleep(0.5)
+    assert len(encoder.calls) == 1
+    assert len(ranker.cache) == 4
+
+    # While the model is busy with max_pending scorings, searches don't queue
+    ranker = BudgetedRanker(ranker=FakeCrossEncoder(delay=0.3), top_k=2, latency_budget_ms=50, max_pending=1)
+    ranker.run(query="q1", documents=documents)
+    ranker.run(query="q2", documents=documents)
+    time.sleep(0.5)
+    assert len(ranker.ranker.calls) == 1
+    ranker.run(query="q2", documents=documents)
+    time.sleep(0.5)
+    assert len(ranker.ranker.calls) == 2
+
+@patch("query.service.TransformersSimilarityRanker", FakeCrossEncoder)
+def test_query_pipeline_with_reranker():
+    config = QueryConfig(document_store=Mock(spec=OpenSearchDocumentStore), reranker_enabled=True)
+    pipeline = create_query_pipeline(config)
+
+    assert isinstance(pipeline.get_component("ranker"), BudgetedRanker)
+    assert pipeline.get_component("document_joiner").join_mode.value == "reciprocal_rank_fusion"
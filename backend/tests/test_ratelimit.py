@@ -0,0 +1,153 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import hashlib
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+from haystack.dataclasses import Document, GeneratedAnswer
+
+from query.ratelimit import FileBucketStore, Lane, MemoryBucketStore, RateLimiter, RateLimitMiddleware, llm_tokens_used
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_memory_bucket_refills():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock)
+
+    assert [store.consume("a", capacity=2, rate=1) for _ in range(3)] == [0, 0, 1.0]
+    assert store.consume("b", capacity=2, rate=1) == 0
+
+    clock.now += 1
+    assert store.consume("a", capacity=2, rate=1) == 0
+
+def test_bucket_debt_delays_requests():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock)
+
+    store.consume("llm", capacity=100, rate=10, cost=250, require=0)
+
+    # 150 tokens in debt: 15 seconds to be positive again
+    assert store.consume("llm", capacity=100, rate=10, cost=0, require=1) == (1 + 150) / 10
+
+def test_prune_keeps_buckets_of_other_lanes():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock, max_buckets=1)
+
+    # A slow lane's bucket, not refilled yet when a fast lane's call prunes
+    store.consume("slow", capacity=10, rate=0.1, cost=5)
+    clock.now += 10
+    store.consume("fast", capacity=1, rate=100)
+
+    assert "slow" in store._buckets
+    assert store.consume("slow", capacity=10, rate=0.1, cost=7) > 0
+
+def test_file_buckets_are_shared(tmp_path):
+    clock = FakeClock()
+    first = FileBucketStore(tmp_path / "limits.sqlite", clock=clock)
+    second = FileBucketStore(tmp_path / "limits.sqlite", clock=clock)
+
+    assert first.consume("a", capacity=1, rate=1) == 0
+    assert second.consume("a", capacity=1, rate=1) == 1.0
+
+def make_client(limiter: RateLimiter, llm_tokens: int = 0) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, paths=["/search"])
+
+    @app.post("/search")
+    async def search(request: Request):
+        request.state.llm_tokens = llm_tokens
+        # The body read by the middleware reaches the endpoint
+        return {"ok": True, "body": (await request.body()).decode()}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return TestClient(app)
+
+def test_middleware_limits_per_client_and_lane():
+    limiter = RateLimiter(
+        MemoryBucketStore(),
+        interactive=Lane("interactive", requests_per_minute=1, burst=2),
+        batch=Lane("batch", requests_per_minute=1, burst=1, max_concurrency=1),
+        trust_proxy=True,
+        api_key_hashes=[hashlib.sha256(b"secret").hexdigest()],
+    )
+    client = make_client(limiter)
+
+    statuses = [client.post("/search", headers={"X-Real-IP": "10.0.0.1"}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = client.post("/search", headers={"X-Real-IP": "10.0.0.1"})
+    assert int(response.headers["retry-after"]) > 0
+
+    # Other clients and lanes have their own buckets; other paths aren't limited
+    assert client.post("/search", headers={"X-Real-IP": "10.0.0.2"}).status_code == 200
+    assert client.post("/search", headers={"X-API-Key": "secret", "X-Real-IP": "10.0.0.1"}).status_code == 200
+    # Unknown keys are ignored: the client is its IP address
+    assert client.post("/search", headers={"X-API-Key": "random", "X-Real-IP": "10.0.0.1"}).status_code == 429
+    assert client.post("/search", headers={"X-Real-IP": "10.0.0.1", "X-Priority": "batch"}).status_code == 200
+    assert client.get("/health", headers={"X-Real-IP": "10.0.0.1"}).status_code == 200
+
+    assert limiter.stats()["lanes"]["interactive"]["rate_limited"] == 3
+
+def test_middleware_charges_llm_tokens():
+    limiter = RateLimiter(
+        MemoryBucketStore(),
+        interactive=Lane("interactive", requests_per_minute=600, burst=10),
+        batch=Lane("batch", requests_per_minute=600, burst=10),
+        llm_tokens_per_minute=1000,
+    )
+    client = make_client(limiter, llm_tokens=1500)
+
+    assert client.post("/search", json={"query": "q"}).status_code == 200
+    response = client.post("/search", json={"query": "q"})
+    assert response.status_code == 429
+    assert response.json() == {"detail": "LLM token budget exceeded"}
+    assert limiter.stats()["llm_tokens_charged"] == 1500
+
+    # Searches without the LLM aren't held back by the budget
+    response = client.post("/search", json={"query": "q", "mode": "retrieve"})
+    assert response.status_code == 200
+    assert response.json()["body"] == '{"query":"q","mode":"retrieve"}'
+
+def test_middleware_with_file_store(tmp_path):
+    limiter = RateLimiter(
+        FileBucketStore(tmp_path / "limits.sqlite"),
+        interactive=Lane("interactive", requests_per_minute=1, burst=1),
+        batch=Lane("batch", requests_per_minute=1, burst=1),
+    )
+    client = make_client(limiter)
+
+    assert [client.post("/search", json={"query": "q"}).status_code for _ in range(2)] == [200, 429]
+
+def test_client_id_trusts_only_the_proxy():
+    lanes = dict(interactive=Lane("interactive", requests_per_minute=1, burst=1), batch=Lane("batch", requests_per_minute=1, burst=1))
+    client = ("10.0.0.9", 1234)
+    proxied = RateLimiter(MemoryBucketStore(), trust_proxy=True, **lanes)
+
+    assert proxied.client_id(Headers({"x-real-ip": "10.0.0.1"}), client) == "ip:10.0.0.1"
+    # The hops before the one the proxy appended are sent by the client
+    assert proxied.client_id(Headers({"x-forwarded-for": "1.2.3.4, 10.0.0.2"}), client) == "ip:10.0.0.2"
+
+    # Not behind a proxy: headers are ignored
+    direct = RateLimiter(MemoryBucketStore(), **lanes)
+    assert direct.client_id(Headers({"x-real-ip": "10.0.0.1", "x-forwarded-for": "1.2.3.4"}), client) == "ip:10.0.0.9"
+
+def test_llm_tokens_used():
+    answer = GeneratedAnswer(data="an answer", query="question", documents=[Document(content="x" * 400)], meta={})
+    assert llm_tokens_used(answer) == (9 + 8 + 400) // 4
+
+    answer.meta["usage"] = {"prompt_tokens": 90, "completion_tokens": 10, "total_tokens": 100}
+    assert llm_tokens_used(answer) == 100
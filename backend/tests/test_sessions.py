@@ -0,0 +1,158 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pytest
+from haystack import Document
+from haystack.dataclasses import GeneratedAnswer
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+import query.breakers
+from common.config import settings
+from query.service import QueryService
+from query.sessions import (
+    FileSessionStore, Session, SessionStore, Turn, condense_history, embedding_similarity, query_coverage
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def answer(query, data, documents=()):
+    return GeneratedAnswer(data=data, query=query, documents=list(documents), meta={})
+
+def test_sessions_expire_and_are_evicted():
+    clock = FakeClock()
+    store = SessionStore(max_sessions=2, ttl_seconds=60, max_turns=2, clock=clock)
+    for i in range(3):
+        store.record("default", "a", f"q{i}", answer(f"q{i}", f"a{i}", [Document(content="x", embedding=[1.0])]), None)
+
+    session = store.get("default", "a")
+    assert [turn.query for turn in session.turns] == ["q1", "q2"]
+    assert session.documents[0].embedding == [1.0]
+    # Sessions are kept per tenant
+    assert store.get("other", "a").turns == []
+
+    store.record("default", "b", "q", answer("q", "a"), None)
+    store.get("default", "a")  # a is now the most recently used
+    store.record("default", "c", "q", answer("q", "a"), None)
+    assert store.get("default", "b").turns == []
+
+    clock.now = 60
+    assert store.get("default", "a").turns == []
+    stats = store.stats()
+    assert stats["sessions"] == 0 and stats["evicted"] == 1 and stats["expired"] == 2
+
+def test_file_sessions_are_shared_between_workers(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "sessions.sqlite"
+    worker, other_worker = (FileSessionStore(path, max_sessions=2, ttl_seconds=60, max_turns=2, clock=clock) for _ in range(2))
+    documents = [Document(content="x", meta={"file_path": "a.txt"}, embedding=[1.0], score=0.5)]
+    worker.record("default", "a", "q0", answer("q0", "a0", documents), {"field": "meta.lang", "operator": "==", "value": "en"})
+    clock.now = 1
+    retrieved = answer("q1", "a1", documents)
+    retrieved.meta["query_embedding"] = [0.5]
+    other_worker.record("default", "a", "q1", retrieved, None)
+
+    clock.now = 2
+    session = worker.get("default", "a")
+    assert [turn.query for turn in session.turns] == ["q0", "q1"] and session.updated_at == 1
+    # Documents keep their embeddings, and the session the embedding of the query they were retrieved for
+    assert session.documents == documents and session.query_embedding == [0.5]
+    assert session.filters is None
+    assert other_worker.get("other", "a").turns == []
+
+    other_worker.record("default", "b", "q", answer("q", "a"), None)
+    clock.now = 3
+    worker.get("default", "a")  # a is now the most recently used
+    worker.record("default", "c", "q", answer("q", "a"), None)
+    assert other_worker.get("default", "b").turns == []
+
+    clock.now = 63
+    assert worker.get("default", "a").turns == []
+    assert worker.stats()["sessions"] == 0
+    assert other_worker.stats()["evicted"] == 0 and worker.stats()["evicted"] == 1
+
+def test_condensed_history_and_coverage():
+    turns = [Turn("first", "short"), Turn("second", "a rather long answer about cats"), Turn("third", "ok")]
+
+    assert condense_history(turns, max_turns=2, max_answer_chars=12) == [
+        {"query": "second", "answer": "a rather ..."},
+        {"query": "third", "answer": "ok"},
+    ]
+    assert condense_history(turns, max_turns=0, max_answer_chars=12) == []
+
+    documents = [Document(content="Cats sleep all day"), Document(content="Dogs bark at night")]
+    assert query_coverage("Where are the cats that sleep?", documents) == 1.0
+    assert query_coverage("Cats and birds sleep?", documents) == pytest.approx(2 / 3)
+    assert query_coverage("Why?", documents) == 1.0
+
+    session = Session(documents=[Document(content="a", embedding=[1.0, 0.0]), Document(content="b")], query_embedding=[0.0, 2.0])
+    assert embedding_similarity([3.0, 0.0], session) == pytest.approx(1.0)
+    assert embedding_similarity([1.0, 1.0], session) == pytest.approx(2 ** -0.5)
+    assert embedding_similarity([1.0, 1.0], Session(documents=[Document(content="b")])) == 0.0
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def run(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return {"replies": [f"answer {len(self.prompts)}"], "meta": [{"usage": {"total_tokens": 10}}]}
+
+def test_follow_up_questions_reuse_documents(monkeypatch):
+    monkeypatch.setattr(query.breakers, "_breakers", {})
+    # Without the embedder, searches retrieve by keywords
+    monkeypatch.setattr(settings, "breaker_enabled", True)
+    document_store = InMemoryDocumentStore()
+    document_store.write_documents([
+        Document(content="The cat sat on the mat", id="cat"),
+        Document(content="Dogs bark at the postman", id="dog"),
+    ])
+    service = QueryService(document_store=document_store)
+    llm = FakeLLM()
+    service.generation_pipeline.get_component("llm").wrapped = llm
+    store = SessionStore()
+
+    first = service.search_in_session("Where did the cat sit?", None, store.get("default", "s"))
+    store.record("default", "s", "Where did the cat sit?", first, None)
+    follow_up = service.search_in_session("Why?", None, store.get("default", "s"))
+    other = service.search_in_session("Do dogs bark?", {"field": "id", "operator": "==", "value": "dog"}, store.get("default", "s"))
+
+    assert first.data == "answer 1" and not first.meta["reused_documents"]
+    assert follow_up.meta["reused_documents"] and follow_up.documents == first.documents
+    assert "Question: Where did the cat sit?" in llm.prompts[1] and "Answer: answer 1" in llm.prompts[1]
+    # Different filters retrieve again
+    assert not other.meta["reused_documents"] and [doc.id for doc in other.documents] == ["dog"]
+
+class FakeEmbedder:
+    def run(self, text):
+        return {"embedding": [0.0, 1.0], "meta": {}}
+
+def test_follow_up_questions_reuse_documents_by_embedding(monkeypatch):
+    monkeypatch.setattr(query.breakers, "_breakers", {})
+    document_store = InMemoryDocumentStore()
+    document_store.write_documents([Document(content="The cat sat on the mat", id="cat", embedding=[1.0, 0.0])])
+    service = QueryService(document_store=document_store)
+    service.generation_pipeline.get_component("llm").wrapped = FakeLLM()
+    service.fast_pipelines["retrieve"].get_component("query_embedder").wrapped = FakeEmbedder()
+    session = Session(documents=document_store.filter_documents(), query_embedding=[0.9, 0.1])
+    embeddings = {"Which rug was that feline on?": [1.0, 0.05], "Unrelated question about taxes?": [0.0, 1.0]}
+    monkeypatch.setattr(service, "_embed_query", embeddings.get)
+
+    # Few of its terms are in the documents, but its embedding is close to theirs
+    close = service.search_in_session("Which rug was that feline on?", None, session)
+    assert close.meta["reused_documents"] and close.documents[0].embedding == [1.0, 0.0]
+    assert close.meta["query_embedding"] is None
+
+    # Retrieved again: the session keeps the embedding of the question
+    far = service.search_in_session("Unrelated question about taxes?", None, session)
+    assert not far.meta["reused_documents"] and far.meta["query_embedding"] == [0.0, 1.0]
@@ -0,0 +1,89 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import json
+import os
+
+import pytest
+from haystack import Document
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+pytest.importorskip("pyarrow")
+
+from common.document_store import embedding_dimension
+from common.local_store import LocalDocumentStore
+from indexing.preprocessors import FastDocumentSplitter
+from indexing.snapshot import MANIFEST_FILE, export_snapshot, import_snapshot
+
+
+def make_source(tmp_path: Path):
+    storage = tmp_path / "source"
+    (storage / "uploads").mkdir(parents=True)
+    (storage / "uploads" / "notes.txt").write_text("The cat sat on the mat. Dogs bark.")
+    (storage / "guide.md").write_text("# Guide\n\nRead the notes.")
+    os.utime(storage / "guide.md", (1700000000, 1700000000))
+
+    dim = embedding_dimension()
+    notes = Document(content="The cat sat on the mat. Dogs bark.", meta={"file_path": str(storage / "uploads" / "notes.txt")})
+    chunks = FastDocumentSplitter(split_by="word", split_length=5, split_overlap=2).run(documents=[notes])["documents"]
+    for i, chunk in enumerate(chunks):
+        chunk.embedding = [0.5 / (i + 1)] * dim
+    # Near duplicates are indexed without embeddings
+    duplicate = Document(
+        content="The cat sat on the mat!", meta={**chunks[0].meta, "split_id": 9, "near_duplicate_of": chunks[0].id}
+    )
+    store = InMemoryDocumentStore()
+    store.write_documents([*chunks, duplicate])
+    return store, storage
+
+def test_snapshot_round_trip(tmp_path):
+    source_store, source_storage = make_source(tmp_path)
+    snapshot = tmp_path / "snapshot"
+
+    manifest = export_snapshot(source_store, source_storage, snapshot, batch_size=2)
+    assert manifest["chunks"] == 3 and manifest["embedded_chunks"] == 2 and manifest["files"] == 2
+
+    target_storage = tmp_path / "target"
+    target_store = LocalDocumentStore(str(tmp_path / "index"), embedding_dim=embedding_dimension())
+    summary = import_snapshot(target_store, target_storage, snapshot, batch_size=2)
+    assert summary == {"chunks": 3, "files": 2}
+
+    # Files are restored with their modification times
+    assert (target_storage / "uploads" / "notes.txt").read_text() == "The cat sat on the mat. Dogs bark."
+    assert os.stat(target_storage / "guide.md").st_mtime == 1700000000
+
+    # Chunks point to the restored files, and keep the ids their meta refers to
+    source = {doc.id: doc for doc in source_store.filter_documents()}
+    documents = {doc.id: doc for doc in target_store.filter_documents()}
+    assert documents.keys() == source.keys()
+    for doc in documents.values():
+        assert doc.meta["file_path"] == str(target_storage / "uploads" / "notes.txt")
+        assert doc.meta["source_id"] == source[doc.id].meta["source_id"]
+        assert all(overlap["doc_id"] in documents for overlap in doc.meta.get("_split_overlap", []))
+    duplicate = next(doc for doc in documents.values() if "near_duplicate_of" in doc.meta)
+    assert duplicate.embedding is None and duplicate.meta["near_duplicate_of"] in documents
+    first = documents[duplicate.meta["near_duplicate_of"]]
+    assert first.embedding[0] == pytest.approx(1 / embedding_dimension() ** 0.5)  # normalized by the local store
+
+    # Importing again overwrites the same chunks
+    assert import_snapshot(target_store, target_storage, snapshot, restore_files=False)["chunks"] == 3
+    assert target_store.count_documents() == 3
+
+def test_snapshot_without_files_and_checks(tmp_path):
+    source_store, source_storage = make_source(tmp_path)
+    snapshot = tmp_path / "snapshot"
+    export_snapshot(source_store, source_storage, snapshot, include_files=False)
+
+    target_store = InMemoryDocumentStore()
+    # Same storage path: chunks are loaded as they were
+    assert import_snapshot(target_store, source_storage, snapshot) == {"chunks": 3, "files": 0}
+    assert {doc.id for doc in target_store.filter_documents()} == {doc.id for doc in source_store.filter_documents()}
+
+    manifest = json.loads((snapshot / MANIFEST_FILE).read_text())
+    (snapshot / MANIFEST_FILE).write_text(json.dumps({**manifest, "embedding_dim": 3}))
+    with pytest.raises(ValueError, match="3-dimensional embeddings"):
+        import_snapshot(InMemoryDocumentStore(), source_storage, snapshot)
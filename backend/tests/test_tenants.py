@@ -0,0 +1,103 @@
+from pathlib import Path
+import sys
+
+# Add the src directory to the Python path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import Mock, patch
+
+from common.file_manager import FileManager
+from common.tenants import TenantCache, tenant_cache_path, tenant_index, validate_tenant_id
+from common.config import settings
+from indexing.main import app, tenant_services
+
+
+def test_validate_tenant_id():
+    assert validate_tenant_id("acme-2") == "acme-2"
+    for invalid in ["", "Acme", "-acme", "a/b", "a.b", "a" * 64]:
+        with pytest.raises(ValueError):
+            validate_tenant_id(invalid)
+
+def test_tenant_index_and_cache_path():
+    assert tenant_index(None) == "default"
+    assert tenant_index("default") == "default"
+    assert tenant_index("acme") == "tenant-acme"
+    assert tenant_cache_path(Path("/c/dups.sqlite"), "acme") == Path("/c/dups-acme.sqlite")
+    assert tenant_cache_path(Path("/c/dups.sqlite"), None) == Path("/c/dups.sqlite")
+
+def test_tenant_cache_evicts_least_recently_used():
+    factory = Mock(side_effect=lambda tenant: object())
+    cache = TenantCache(factory, max_tenants=2)
+
+    a = cache.get("a")
+    cache.get("b")
+    assert cache.get("a") is a
+    cache.get("c")
+
+    assert "a" in cache and "b" not in cache
+    assert factory.call_count == 3
+    assert cache.stats()["evicted"] == 1
+
+def test_tenant_cache_creates_tenants_concurrently():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def factory(tenant):
+        calls.append(tenant)
+        if tenant == "slow":
+            started.set()
+            assert release.wait(5)
+        return f"{tenant} services"
+
+    cache = TenantCache(factory)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        slow = [executor.submit(cache.get, "slow") for _ in range(2)]
+        assert started.wait(5)
+        # Another tenant isn't held up by the slow one being created
+        assert cache.get("fast") == "fast services"
+        release.set()
+        assert [future.result(timeout=5) for future in slow] == ["slow services"] * 2
+    assert sorted(calls) == ["fast", "slow"]
+
+    failing = TenantCache(Mock(side_effect=RuntimeError("index unavailable")))
+    with pytest.raises(RuntimeError):
+        failing.get("a")
+    assert "a" not in failing
+
+def test_default_file_manager_skips_tenant_and_index_files(tmp_path):
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "shared.txt").write_text("default")
+    (tmp_path / "tenants" / "acme" / "uploads").mkdir(parents=True)
+    (tmp_path / "tenants" / "acme" / "uploads" / "private.txt").write_text("acme")
+    (tmp_path / ".index" / "default").mkdir(parents=True)
+    (tmp_path / ".index" / "default" / "store.sqlite").write_text("")
+
+    assert FileManager(tmp_path).files == ["shared.txt"]
+    assert FileManager(tmp_path / "tenants" / "acme").files == ["private.txt"]
+
+def test_tenant_header_selects_service(monkeypatch):
+    monkeypatch.setattr(settings, "tenant_api_key_hashes", {"acme": [hashlib.sha256(b"acme-key").hexdigest()]})
+    tenant_service = Mock()
+    tenant_service.rescan_files_and_paths.return_value = ["private.txt"]
+    client = TestClient(app)
+
+    with patch.object(tenant_services, "factory", return_value=tenant_service) as factory:
+        response = client.get("/files", headers={"X-Tenant-ID": "acme", "X-API-Key": "acme-key"})
+        assert response.status_code == 200
+        assert response.json() == {"files": ["private.txt"], "total": 1}
+        factory.assert_called_once_with("acme")
+
+        # A tenant is only used with one of its keys
+        assert client.get("/files", headers={"X-Tenant-ID": "acme"}).status_code == 403
+        assert client.get("/files", headers={"X-Tenant-ID": "acme", "X-API-Key": "other"}).status_code == 403
+        assert client.get("/files", headers={"X-Tenant-ID": "other", "X-API-Key": "acme-key"}).status_code == 403
+
+        response = client.get("/files", headers={"X-Tenant-ID": "../etc"})
+        assert response.status_code == 400
@@ -78,9 +78,10 @@ app.kubernetes.io/group: {{ .group }}
 {{- end }}
 
 {{/*
-OpenSearch init container with credentials
+OpenSearch init container with credentials (none without OpenSearch, when the backend uses the local document store)
 */}}
 {{- define "common.opensearch.initContainer" -}}
+{{- if .Values.search.opensearch.enabled }}
 initContainers:
   - name: wait-for-opensearch
     image: curlimages/curl-base:8.11.0
@@ -112,3 +113,4 @@ initContainers:
           {{- end }}
           key: opensearch-password
 {{- end }}
+{{- end }}
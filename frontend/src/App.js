@@ -75,10 +75,14 @@ function App() {
     try {
       const result = await searchQuery(query);
       setResponse(result);
+      setIsLoading(false);
     } catch (error) {
+      // Replaced by a newer search, which shows its own response
+      if (error.name === 'AbortError') {
+        return;
+      }
       console.error('Error:', error);
       setResponse('An error occurred while fetching the response.');
-    } finally {
       setIsLoading(false);
     }
   };
@@ -1,10 +1,11 @@
-import { fetchFileList, searchQuery, uploadFiles } from '../services/apiCalls';
+import { clearCaches, fetchFileList, searchQuery, uploadFiles } from '../services/apiCalls';
 
 global.fetch = jest.fn();
 
 describe('API Calls', () => {
   beforeEach(() => {
-    fetch.mockClear();
+    fetch.mockReset();
+    clearCaches();
   });
 
   test('fetchFileList', async () => {
@@ -16,7 +17,24 @@ describe('API Calls', () => {
 
     const result = await fetchFileList();
     expect(result).toEqual(mockResponse.files);
-    expect(fetch).toHaveBeenCalledWith(expect.stringContaining('/files'));
+    expect(fetch).toHaveBeenCalledWith(expect.stringContaining('/files'), expect.any(Object));
+  });
+
+  test('fetchFileList pages and revalidates the list', async () => {
+    const headers = { get: () => '"v1"' };
+    fetch
+      .mockResolvedValueOnce({ ok: true, status: 200, headers, json: () => Promise.resolve({ files: ['a.txt'], total: 2 }) })
+      .mockResolvedValueOnce({ ok: true, status: 200, headers, json: () => Promise.resolve({ files: ['b.txt'], total: 2 }) })
+      .mockResolvedValueOnce({ ok: false, status: 304, headers });
+
+    expect(await fetchFileList()).toEqual(['a.txt', 'b.txt']);
+    expect(fetch).toHaveBeenLastCalledWith(expect.stringContaining('offset=1'), expect.any(Object));
+    // Unchanged list: the previous one is returned
+    expect(await fetchFileList()).toEqual(['a.txt', 'b.txt']);
+    expect(fetch).toHaveBeenLastCalledWith(
+      expect.stringContaining('offset=0'),
+      expect.objectContaining({ headers: { 'If-None-Match': '"v1"' } })
+    );
   });
 
   test('searchQuery', async () => {
@@ -43,6 +61,48 @@ describe('API Calls', () => {
     );
   });
 
+  test('searchQuery without an answer', async () => {
+    const mockResponse = {
+      degraded: ['llm'],
+      results: [{ answers: [], documents: [{ content: 'Best passage' }] }]
+    };
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      json: () => Promise.resolve(mockResponse),
+    });
+
+    const result = await searchQuery('Test query');
+    expect(result).toContain('temporarily unavailable');
+    expect(result).toContain('Best passage');
+  });
+
+  test('searchQuery shares identical searches and caches answers', async () => {
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      json: () => Promise.resolve({ degraded: [], results: [{ answers: [{ answer: 'Shared' }] }] }),
+    });
+
+    const results = await Promise.all([searchQuery('Same query'), searchQuery('Same query')]);
+    expect(results).toEqual(['Shared', 'Shared']);
+    expect(await searchQuery('Same query ')).toBe('Shared');
+    expect(fetch).toHaveBeenCalledTimes(1);
+  });
+
+  test('searchQuery aborts a stale search', async () => {
+    fetch.mockImplementationOnce((url, { signal }) => new Promise((resolve, reject) => {
+      signal.addEventListener('abort', () => reject(new DOMException('Aborted', 'AbortError')));
+    }));
+    fetch.mockResolvedValueOnce({
+      ok: true,
+      json: () => Promise.resolve({ results: [{ answers: [{ answer: 'Second' }] }] }),
+    });
+
+    const first = searchQuery('First query');
+    const second = searchQuery('Second query');
+    await expect(first).rejects.toHaveProperty('name', 'AbortError');
+    expect(await second).toBe('Second');
+  });
+
   test('uploadFiles', async () => {
     const mockResponse = { message: 'Files uploaded successfully' };
     fetch.mockResolvedValueOnce({
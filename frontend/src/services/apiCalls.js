@@ -1,27 +1,133 @@
 const API_URL = process.env.REACT_APP_HAYSTACK_API_URL || 'http://localhost:8000'
 
-export async function fetchFileList() {
-  const response = await fetch(`${API_URL}/files`);
+// Files requested per page of the file list
+const FILE_PAGE_SIZE = 500;
+// Recent answers kept, and for how long, to answer a repeated question without the backend
+const SEARCH_CACHE_SIZE = 50;
+const SEARCH_CACHE_TTL_MS = 5 * 60 * 1000;
+
+// File list of the last response, revalidated with its ETag
+let fileList = null;
+let fileListETag = null;
+
+// Searches by query: the one in flight, shared by identical submits, and recent answers
+const inflightSearches = new Map();
+const searchCache = new Map();
+// Aborts the latest search when a different one is submitted
+let searchController = null;
+
+async function checkResponse(response) {
   if (!response.ok) {
     const errorText = await response.text();
     throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
   }
+}
+
+async function fetchFilePage(offset, headers = {}) {
+  return fetch(`${API_URL}/files?offset=${offset}&limit=${FILE_PAGE_SIZE}`, { headers });
+}
+
+export async function fetchFileList() {
+  // Unchanged since the last request: the server answers 304 without the list
+  const response = await fetchFilePage(0, fileListETag ? { 'If-None-Match': fileListETag } : {});
+  if (response.status === 304 && fileList !== null) {
+    return fileList;
+  }
+  await checkResponse(response);
   const data = await response.json();
-  return data.files;
+  const files = [...data.files];
+  // The remaining pages, if the list is longer than a page
+  while (data.total !== undefined && files.length < data.total) {
+    const page = await fetchFilePage(files.length);
+    await checkResponse(page);
+    const pageData = await page.json();
+    if (pageData.files.length === 0) {
+      break;
+    }
+    files.push(...pageData.files);
+  }
+  fileList = files;
+  fileListETag = response.headers?.get('ETag') ?? null;
+  return files;
 }
 
-export async function searchQuery(query) {
+// Forgets cached answers and the file list, e.g. after new files change what a search finds
+export function clearCaches() {
+  searchCache.clear();
+  fileList = null;
+  fileListETag = null;
+}
+
+function cachedAnswer(query) {
+  const entry = searchCache.get(query);
+  if (entry === undefined) {
+    return undefined;
+  }
+  if (Date.now() - entry.time > SEARCH_CACHE_TTL_MS) {
+    searchCache.delete(query);
+    return undefined;
+  }
+  // Most recently used last
+  searchCache.delete(query);
+  searchCache.set(query, entry);
+  return entry.answer;
+}
+
+function cacheAnswer(query, answer) {
+  searchCache.set(query, { answer, time: Date.now() });
+  if (searchCache.size > SEARCH_CACHE_SIZE) {
+    searchCache.delete(searchCache.keys().next().value);
+  }
+}
+
+async function runSearch(query, signal) {
   const response = await fetch(`${API_URL}/search`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ query }),
+    signal,
   });
-  if (!response.ok) {
-    const errorText = await response.text();
-    throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
-  }
+  await checkResponse(response);
   const data = await response.json();
-  return data.results[0].answers[0].answer;
+  const result = data.results[0];
+  if (result.answers.length === 0) {
+    // Degraded search without the LLM: the best matching passage stands in for the answer
+    const passage = result.documents.length > 0 ? `\n\nMost relevant passage:\n${result.documents[0].content}` : '';
+    return `Answers are temporarily unavailable.${passage}`;
+  }
+  const answer = result.answers[0].answer;
+  // Degraded answers are not kept: the next search may get a better one
+  if (!data.degraded || data.degraded.length === 0) {
+    cacheAnswer(query, answer);
+  }
+  return answer;
+}
+
+// Rejects with an AbortError if a different search is submitted before it finishes
+export async function searchQuery(query) {
+  const key = query.trim();
+  const cached = cachedAnswer(key);
+  if (cached !== undefined) {
+    return cached;
+  }
+  // A double submit waits for the search already running
+  if (inflightSearches.has(key)) {
+    return inflightSearches.get(key);
+  }
+  // The previous search is stale: stop it, and the backend's work on it
+  if (searchController !== null) {
+    searchController.abort();
+  }
+  const controller = new AbortController();
+  searchController = controller;
+  const search = runSearch(query, controller.signal).finally(() => {
+    inflightSearches.delete(key);
+    if (searchController === controller) {
+      searchController = null;
+    }
+  });
+  inflightSearches.set(key, search);
+  return search;
 }
 
 export async function uploadFiles(files) {
@@ -33,9 +139,8 @@ export async function uploadFiles(files) {
     method: 'POST',
     body: formData,
   });
-  if (!response.ok) {
-    const errorText = await response.text();
-    throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
-  }
+  await checkResponse(response);
+  // Answers may change with the new files
+  searchCache.clear();
   return await response.json();
 }